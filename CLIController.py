@@ -96,15 +96,12 @@ class CLIController(LocalRuntimeMixin, ProjectController):
                         dump_end = max(-1, count - 10)
                     else:
                         dump_end = prev - 1
-                    for msgidx in range(count-1, dump_end, -1):
-                        message = connector.GetLogMessage(level, msgidx)
-                        if message is not None:
-                            msg, _tick, tv_sec, tv_nsec = message
-                            date = datetime.utcfromtimestamp(tv_sec + tv_nsec * 1e-9)
-                            txt = "%s at %s: %s\n" % (LogLevels[level], date.isoformat(' '), msg)
-                            new_messages.append((date,txt))
-                        else:
-                            break
+                    for message in connector.FetchLogMessages(
+                            level, count-1, count-1-dump_end):
+                        msg, _tick, tv_sec, tv_nsec = message
+                        date = datetime.utcfromtimestamp(tv_sec + tv_nsec * 1e-9)
+                        txt = "%s at %s: %s\n" % (LogLevels[level], date.isoformat(' '), msg)
+                        new_messages.append((date,txt))
                 self.previous_log_count[level] = count
             new_messages.sort()
             for date, txt in new_messages:
@@ -20,6 +20,14 @@
 // File name of the extra files list
 #define ExtraFilesList "extra_files.txt"
 
+// Largest blob chunk accepted by AppendChunkToBlob, leaving room for
+// blob ID and message header in the 6KB eRPC message buffer
+#define MaxChunkSize 4096
+
+// Matched by MatchMD5 to tell IDE that calls appended to interface
+// are known, same as in Python runtime
+#define InterfaceProbeMD5 "PLCObjectInterface:2"
+
 
 
 PLCObject::PLCObject(void)
@@ -135,6 +143,93 @@ uint32_t PLCObject::GetLogMessage(
     return 0;
 }
 
+// mBatchHead in plc_main_tail.c
+typedef struct {
+    uint32_t msgsize;
+    uint32_t tick;
+    uint32_t tv_sec;
+    uint32_t tv_nsec;
+} log_batch_head;
+
+uint32_t PLCObject::GetLogMessages(
+    uint8_t level, uint32_t msgID, uint32_t maxCount, uint32_t maxBytes,
+    list_log_message_1_t *messages)
+{
+    messages->elements = NULL;
+    messages->elementsCount = 0;
+
+    if(m_status.PLCstatus == Empty){
+        return 0;
+    }
+
+    // Batch must fit in a message, as chunks do
+    std::vector<char> buf(maxBytes < MaxChunkSize ? maxBytes : MaxChunkSize);
+    uint32_t packedLen = 0;
+    if(m_PLCSyms.GetLogMessages != NULL){
+        packedLen = m_PLCSyms.GetLogMessages(
+            level, msgID, maxCount, buf.data(), buf.size());
+    } else {
+        // PLC built before GetLogMessages, pack messages one by one
+        for (uint32_t i = 0; i < maxCount && i <= msgID; i++)
+        {
+            char msg[LOG_READ_BUFFER_SIZE];
+            log_batch_head head;
+            uint32_t msgsize = m_PLCSyms.GetLogMessage(
+                level, msgID - i, msg, LOG_READ_BUFFER_SIZE - 1,
+                &head.tick, &head.tv_sec, &head.tv_nsec);
+            if (msgsize == 0)
+                break;
+            head.msgsize = msgsize < LOG_READ_BUFFER_SIZE - 1 ?
+                           msgsize : LOG_READ_BUFFER_SIZE - 1;
+            if (packedLen + sizeof(head) + head.msgsize > buf.size())
+                break;
+            memcpy(&buf[packedLen], &head, sizeof(head));
+            memcpy(&buf[packedLen + sizeof(head)], msg, head.msgsize);
+            packedLen += sizeof(head) + head.msgsize;
+        }
+    }
+
+    // Count messages, then unpack them into eRPC message
+    uint32_t count = 0;
+    for (uint32_t pos = 0; pos < packedLen; count++)
+    {
+        log_batch_head head;
+        memcpy(&head, &buf[pos], sizeof(head));
+        pos += sizeof(head) + head.msgsize;
+    }
+
+    messages->elements = (log_message *)malloc(count * sizeof(log_message) + 1);
+    if (messages->elements == NULL)
+    {
+        return ENOMEM;
+    }
+
+    uint32_t pos = 0;
+    for (uint32_t i = 0; i < count; i++)
+    {
+        log_batch_head head;
+        log_message *message = &messages->elements[i];
+        memcpy(&head, &buf[pos], sizeof(head));
+        pos += sizeof(head);
+
+        message->msg = (char *)malloc(head.msgsize + 1);
+        if (message->msg == NULL)
+        {
+            return ENOMEM;
+        }
+        memcpy(message->msg, &buf[pos], head.msgsize);
+        message->msg[head.msgsize] = '\0';
+        pos += head.msgsize;
+
+        message->tick = head.tick;
+        message->sec = head.tv_sec;
+        message->nsec = head.tv_nsec;
+        messages->elementsCount = i + 1;
+    }
+
+    return 0;
+}
+
 uint32_t PLCObject::GetPLCID(PSKID *plcID)
 {
     // Get PSK ID
@@ -213,6 +308,12 @@ uint32_t PLCObject::GetTraceVariables(
 
 uint32_t PLCObject::MatchMD5(const char *MD5, bool *match)
 {
+    if(strcmp(MD5, InterfaceProbeMD5) == 0)
+    {
+        *match = true;
+        return 0;
+    }
+
     // an empty PLC is never considered to match
     if(m_status.PLCstatus == Empty)
     {
@@ -368,6 +469,8 @@ uint32_t PLCObject::LoadPLC(void)
 
     // Resolve shared object symbols
     FOR_EACH_PLC_SYMBOLS_DO(DLSYM);
+    m_PLCSyms.GetLogMessages = (decltype(m_PLCSyms.GetLogMessages))dlsym(m_handle, "GetLogMessages");
+    m_PLCSyms.TryGetDebugData = (decltype(m_PLCSyms.TryGetDebugData))dlsym(m_handle, "TryGetDebugData");
 
     // Set content of PLC_ID to md5sum
     m_PLCSyms.PLC_ID = (uint8_t *)malloc(md5sum.size() + 1);
@@ -391,6 +494,8 @@ uint32_t PLCObject::UnLoadPLC(void)
 {
     // Unload the shared object file
     FOR_EACH_PLC_SYMBOLS_DO(ULSYM);
+    m_PLCSyms.GetLogMessages = NULL;
+    m_PLCSyms.TryGetDebugData = NULL;
     if(m_handle != NULL)
     {
         dlclose(m_handle);
@@ -539,6 +644,10 @@ uint32_t PLCObject::SetTraceVariablesList(
     int res = m_PLCSyms.suspendDebug(0);
     if(res == 0)
     {
+        // trace ring is reset, serialize with trace thread
+        // that frees samples from it
+        m_PLClibMutex.lock();
+
         // forget about all previous debug variables
         m_PLCSyms.ResetDebugVariables();
 
@@ -548,14 +657,19 @@ uint32_t PLCObject::SetTraceVariablesList(
             trace_order *order = orders->elements + i;
             res = m_PLCSyms.RegisterDebugVariable(order->idx, order->force.data, order->force.dataLength);
             if(res != 0)
-            {
-                // if any error, disable debug
-                // since debug is already suspended, resume it first
-                m_PLCSyms.resumeDebug();
-                m_PLCSyms.suspendDebug(1);
-                *debugtoken = -res;
-                return EINVAL;
-            }
+                break;
+        }
+
+        m_PLClibMutex.unlock();
+
+        if(res != 0)
+        {
+            // if any error, disable debug
+            // since debug is already suspended, resume it first
+            m_PLCSyms.resumeDebug();
+            m_PLCSyms.suspendDebug(1);
+            *debugtoken = -res;
+            return EINVAL;
         }
 
         // old traces are not valid anymore
@@ -608,6 +722,46 @@ uint32_t PLCObject::StopPLC(bool *success)
     return res;
 }
 
+uint32_t PLCObject::NegotiateChunkSize(uint32_t chunkSize, uint32_t *negotiatedChunkSize)
+{
+    // Grant requested chunk size, up to what fits in a message
+    *negotiatedChunkSize = chunkSize < MaxChunkSize ? chunkSize : MaxChunkSize;
+
+    return 0;
+}
+
+uint32_t PLCObject::MatchCachedBlobs(const list_extra_file_1_t *blobs, binary_t *matches)
+{
+    // No persistent blob cache in this runtime : only blobs
+    // already being transferred are reported as available
+
+    matches->dataLength = blobs->elementsCount;
+    matches->data = (uint8_t *)malloc(blobs->elementsCount + 1);
+    if (matches->data == NULL)
+    {
+        return ENOMEM;
+    }
+
+    for (uint32_t i = 0; i < blobs->elementsCount; i++)
+    {
+        const binary_t *blobID = &blobs->elements[i].blobID;
+        std::vector<uint8_t> k(blobID->data, blobID->data + blobID->dataLength);
+        matches->data[i] = m_mapBlobIDToBlob.count(k) ? 1 : 0;
+    }
+
+    return 0;
+}
+
+uint32_t PLCObject::AppendDeltaToBlob(
+    const binary_t *deltaBlobID, const binary_t *blobID, binary_t *newBlobID)
+{
+    // Binary delta isn't supported, IDE falls back to full transfer
+    newBlobID->data = NULL;
+    newBlobID->dataLength = 0;
+
+    return 2;
+}
+
 uint32_t PLCObject::LogMessage(uint8_t level, std::string message)
 {
     // if PLC isn't loaded, log to stdout
@@ -636,11 +790,17 @@ void PLCObject::TraceThreadProc(void)
         // Data allocated here is meant to be freed by eRPC server code
         uint8_t* ourData = NULL;
 
+        // wait for data without library lock, since trace list
+        // can be changed meanwhile and trace ring reset
+        int res = m_PLCSyms.GetDebugData(&tick, &size, &buff);
+
         m_PLClibMutex.lock();
 
-        int res = m_PLCSyms.GetDebugData(&tick, &size, &buff);
+        // sample may have been dropped by reset while waiting
+        bool available = res == 0 && (m_PLCSyms.TryGetDebugData == NULL ||
+            m_PLCSyms.TryGetDebugData(&tick, &size, &buff) == 0);
 
-        if(res == 0)
+        if(available)
         {   
             ourData = (uint8_t *)malloc(size);
             if(ourData != NULL)
@@ -652,6 +812,11 @@ void PLCObject::TraceThreadProc(void)
 
         m_PLClibMutex.unlock();
 
+        if(res == 0 && !available)
+        {
+            continue;
+        }
+
         if(ourData == NULL)
         {
             err = res == 0 ? ENOMEM : res;
@@ -47,6 +47,10 @@ extern "C" {
         uint32_t (*GetLogCount)(uint8_t level);
         int (*LogMessage)(uint8_t level, char* buf, uint32_t size);
         uint32_t (*GetLogMessage)(uint8_t level, uint32_t msgidx, char* buf, uint32_t max_size, uint32_t* tick, uint32_t* tv_sec, uint32_t* tv_nsec);
+        // optional, missing in PLCs built before batched log retrieval
+        uint32_t (*GetLogMessages)(uint8_t level, uint32_t msgidx, uint32_t max_count, char* buf, uint32_t max_size);
+        // optional, missing in PLCs built before trace ring
+        int (*TryGetDebugData)(unsigned int *tick, unsigned int *size, void **buffer);
     } PLCSyms;
 }
 class PLCObject : public BeremizPLCObjectService_interface
@@ -71,6 +75,10 @@ class PLCObject : public BeremizPLCObjectService_interface
         uint32_t SetTraceVariablesList(const list_trace_order_1_t * orders, int32_t * debugtoken);
         uint32_t StartPLC(void);
         uint32_t StopPLC(bool * success);
+        uint32_t NegotiateChunkSize(uint32_t chunkSize, uint32_t * negotiatedChunkSize);
+        uint32_t MatchCachedBlobs(const list_extra_file_1_t * blobs, binary_t * matches);
+        uint32_t AppendDeltaToBlob(const binary_t * deltaBlobID, const binary_t * blobID, binary_t * newBlobID);
+        uint32_t GetLogMessages(uint8_t level, uint32_t msgID, uint32_t maxCount, uint32_t maxBytes, list_log_message_1_t * messages);
 
         // Public interface used by runtime
         uint32_t AutoLoad();
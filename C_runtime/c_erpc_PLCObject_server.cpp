@@ -132,6 +132,38 @@ class BeremizPLCObjectService_server: public BeremizPLCObjectService_interface
 
             return result;
         }
+
+        uint32_t NegotiateChunkSize(uint32_t chunkSize, uint32_t * negotiatedChunkSize)
+        {
+            uint32_t result;
+            result = ::NegotiateChunkSize(chunkSize, negotiatedChunkSize);
+
+            return result;
+        }
+
+        uint32_t MatchCachedBlobs(const list_extra_file_1_t * blobs, binary_t * matches)
+        {
+            uint32_t result;
+            result = ::MatchCachedBlobs(blobs, matches);
+
+            return result;
+        }
+
+        uint32_t AppendDeltaToBlob(const binary_t * deltaBlobID, const binary_t * blobID, binary_t * newBlobID)
+        {
+            uint32_t result;
+            result = ::AppendDeltaToBlob(deltaBlobID, blobID, newBlobID);
+
+            return result;
+        }
+
+        uint32_t GetLogMessages(uint8_t level, uint32_t msgID, uint32_t maxCount, uint32_t maxBytes, list_log_message_1_t * messages)
+        {
+            uint32_t result;
+            result = ::GetLogMessages(level, msgID, maxCount, maxBytes, messages);
+
+            return result;
+        }
 };
 
 ERPC_MANUALLY_CONSTRUCTED_STATIC(BeremizPLCObjectService_service, s_BeremizPLCObjectService_service);
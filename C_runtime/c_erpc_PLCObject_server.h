@@ -39,6 +39,10 @@ enum _BeremizPLCObjectService_ids
     kBeremizPLCObjectService_SetTraceVariablesList_id = 12,
     kBeremizPLCObjectService_StartPLC_id = 13,
     kBeremizPLCObjectService_StopPLC_id = 14,
+    kBeremizPLCObjectService_NegotiateChunkSize_id = 15,
+    kBeremizPLCObjectService_MatchCachedBlobs_id = 16,
+    kBeremizPLCObjectService_AppendDeltaToBlob_id = 17,
+    kBeremizPLCObjectService_GetLogMessages_id = 18,
 };
 
 //! @name BeremizPLCObjectService
@@ -70,6 +74,14 @@ uint32_t SetTraceVariablesList(const list_trace_order_1_t * orders, int32_t * de
 uint32_t StartPLC(void);
 
 uint32_t StopPLC(bool * success);
+
+uint32_t NegotiateChunkSize(uint32_t chunkSize, uint32_t * negotiatedChunkSize);
+
+uint32_t MatchCachedBlobs(const list_extra_file_1_t * blobs, binary_t * matches);
+
+uint32_t AppendDeltaToBlob(const binary_t * deltaBlobID, const binary_t * blobID, binary_t * newBlobID);
+
+uint32_t GetLogMessages(uint8_t level, uint32_t msgID, uint32_t maxCount, uint32_t maxBytes, list_log_message_1_t * messages);
 //@}
 
 
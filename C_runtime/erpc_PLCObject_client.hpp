@@ -50,6 +50,14 @@ class BeremizPLCObjectService_client: public BeremizPLCObjectService_interface
 
         virtual uint32_t StopPLC(bool * success);
 
+        virtual uint32_t NegotiateChunkSize(uint32_t chunkSize, uint32_t * negotiatedChunkSize);
+
+        virtual uint32_t MatchCachedBlobs(const list_extra_file_1_t * blobs, binary_t * matches);
+
+        virtual uint32_t AppendDeltaToBlob(const binary_t * deltaBlobID, const binary_t * blobID, binary_t * newBlobID);
+
+        virtual uint32_t GetLogMessages(uint8_t level, uint32_t msgID, uint32_t maxCount, uint32_t maxBytes, list_log_message_1_t * messages);
+
     protected:
         erpc::ClientManager *m_clientManager;
 };
@@ -45,6 +45,7 @@ typedef struct list_extra_file_1_t list_extra_file_1_t;
 typedef struct trace_order trace_order;
 typedef struct list_trace_order_1_t list_trace_order_1_t;
 typedef struct log_message log_message;
+typedef struct list_log_message_1_t list_log_message_1_t;
 
 // Structures/unions data types declarations
 struct binary_t
@@ -115,6 +116,12 @@ struct log_message
     uint32_t nsec;
 };
 
+struct list_log_message_1_t
+{
+    log_message * elements;
+    uint32_t elementsCount;
+};
+
 
 #endif // ERPC_TYPE_DEFINITIONS_ERPC_PLCOBJECT
 
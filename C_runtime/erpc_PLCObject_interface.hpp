@@ -33,6 +33,10 @@ class BeremizPLCObjectService_interface
         static const uint8_t m_SetTraceVariablesListId = 12;
         static const uint8_t m_StartPLCId = 13;
         static const uint8_t m_StopPLCId = 14;
+        static const uint8_t m_NegotiateChunkSizeId = 15;
+        static const uint8_t m_MatchCachedBlobsId = 16;
+        static const uint8_t m_AppendDeltaToBlobId = 17;
+        static const uint8_t m_GetLogMessagesId = 18;
 
         virtual ~BeremizPLCObjectService_interface(void);
 
@@ -63,6 +67,14 @@ class BeremizPLCObjectService_interface
         virtual uint32_t StartPLC(void) = 0;
 
         virtual uint32_t StopPLC(bool * success) = 0;
+
+        virtual uint32_t NegotiateChunkSize(uint32_t chunkSize, uint32_t * negotiatedChunkSize) = 0;
+
+        virtual uint32_t MatchCachedBlobs(const list_extra_file_1_t * blobs, binary_t * matches) = 0;
+
+        virtual uint32_t AppendDeltaToBlob(const binary_t * deltaBlobID, const binary_t * blobID, binary_t * newBlobID) = 0;
+
+        virtual uint32_t GetLogMessages(uint8_t level, uint32_t msgID, uint32_t maxCount, uint32_t maxBytes, list_log_message_1_t * messages) = 0;
 private:
 };
 } // erpcShim
@@ -171,6 +171,9 @@ static void write_TraceVariables_struct(erpc::Codec * codec, const TraceVariable
 //! @brief Function to write struct list_trace_sample_1_t
 static void write_list_trace_sample_1_t_struct(erpc::Codec * codec, const list_trace_sample_1_t * data);
 
+//! @brief Function to write struct list_log_message_1_t
+static void write_list_log_message_1_t_struct(erpc::Codec * codec, const list_log_message_1_t * data);
+
 
 // Write struct binary_t function implementation
 static void write_binary_t_struct(erpc::Codec * codec, const binary_t * data)
@@ -282,6 +285,21 @@ static void write_list_trace_sample_1_t_struct(erpc::Codec * codec, const list_t
     }
 }
 
+// Write struct list_log_message_1_t function implementation
+static void write_list_log_message_1_t_struct(erpc::Codec * codec, const list_log_message_1_t * data)
+{
+    if(NULL == data)
+    {
+        return;
+    }
+
+    codec->startWriteList(data->elementsCount);
+    for (uint32_t listCount = 0U; listCount < data->elementsCount; ++listCount)
+    {
+        write_log_message_struct(codec, &(data->elements[listCount]));
+    }
+}
+
 
 //! @brief Function to free space allocated inside struct binary_t
 static void free_binary_t_struct(binary_t * data);
@@ -313,6 +331,9 @@ static void free_trace_order_struct(trace_order * data);
 //! @brief Function to free space allocated inside struct list_trace_order_1_t
 static void free_list_trace_order_1_t_struct(list_trace_order_1_t * data);
 
+//! @brief Function to free space allocated inside struct list_log_message_1_t
+static void free_list_log_message_1_t_struct(list_log_message_1_t * data);
+
 
 // Free space allocated inside struct binary_t function implementation
 static void free_binary_t_struct(binary_t * data)
@@ -393,6 +414,17 @@ static void free_list_trace_order_1_t_struct(list_trace_order_1_t * data)
     erpc_free(data->elements);
 }
 
+// Free space allocated inside struct list_log_message_1_t function implementation
+static void free_list_log_message_1_t_struct(list_log_message_1_t * data)
+{
+    for (uint32_t listCount = 0; listCount < data->elementsCount; ++listCount)
+    {
+        free_log_message_struct(&data->elements[listCount]);
+    }
+
+    erpc_free(data->elements);
+}
+
 
 
 BeremizPLCObjectService_service::BeremizPLCObjectService_service(BeremizPLCObjectService_interface *_BeremizPLCObjectService_interface)
@@ -501,6 +533,30 @@ erpc_status_t BeremizPLCObjectService_service::handleInvocation(uint32_t methodI
             break;
         }
 
+        case BeremizPLCObjectService_interface::m_NegotiateChunkSizeId:
+        {
+            erpcStatus = NegotiateChunkSize_shim(codec, messageFactory, transport, sequence);
+            break;
+        }
+
+        case BeremizPLCObjectService_interface::m_MatchCachedBlobsId:
+        {
+            erpcStatus = MatchCachedBlobs_shim(codec, messageFactory, transport, sequence);
+            break;
+        }
+
+        case BeremizPLCObjectService_interface::m_AppendDeltaToBlobId:
+        {
+            erpcStatus = AppendDeltaToBlob_shim(codec, messageFactory, transport, sequence);
+            break;
+        }
+
+        case BeremizPLCObjectService_interface::m_GetLogMessagesId:
+        {
+            erpcStatus = GetLogMessages_shim(codec, messageFactory, transport, sequence);
+            break;
+        }
+
         default:
         {
             erpcStatus = kErpcStatus_InvalidArgument;
@@ -1313,3 +1369,272 @@ erpc_status_t BeremizPLCObjectService_service::StopPLC_shim(Codec * codec, Messa
 
     return err;
 }
+
+// Server shim for NegotiateChunkSize of BeremizPLCObjectService interface.
+erpc_status_t BeremizPLCObjectService_service::NegotiateChunkSize_shim(Codec * codec, MessageBufferFactory *messageFactory, Transport * transport, uint32_t sequence)
+{
+    erpc_status_t err = kErpcStatus_Success;
+
+    uint32_t chunkSize;
+    uint32_t negotiatedChunkSize;
+    uint32_t result;
+
+    // startReadMessage() was already called before this shim was invoked.
+
+    codec->read(chunkSize);
+
+    err = codec->getStatus();
+    if (err == kErpcStatus_Success)
+    {
+        // Invoke the actual served function.
+#if ERPC_NESTED_CALLS_DETECTION
+        nestingDetection = true;
+#endif
+        result = m_handler->NegotiateChunkSize(chunkSize, &negotiatedChunkSize);
+#if ERPC_NESTED_CALLS_DETECTION
+        nestingDetection = false;
+#endif
+
+        // preparing MessageBuffer for serializing data
+        err = messageFactory->prepareServerBufferForSend(codec->getBufferRef(), transport->reserveHeaderSize());
+    }
+
+    if (err == kErpcStatus_Success)
+    {
+        // preparing codec for serializing data
+        codec->reset(transport->reserveHeaderSize());
+
+        // Build response message.
+        codec->startWriteMessage(message_type_t::kReplyMessage, BeremizPLCObjectService_interface::m_serviceId, BeremizPLCObjectService_interface::m_NegotiateChunkSizeId, sequence);
+
+        codec->write(negotiatedChunkSize);
+
+        codec->write(result);
+
+        err = codec->getStatus();
+    }
+
+    return err;
+}
+
+// Server shim for MatchCachedBlobs of BeremizPLCObjectService interface.
+erpc_status_t BeremizPLCObjectService_service::MatchCachedBlobs_shim(Codec * codec, MessageBufferFactory *messageFactory, Transport * transport, uint32_t sequence)
+{
+    erpc_status_t err = kErpcStatus_Success;
+
+    list_extra_file_1_t *blobs = NULL;
+    blobs = (list_extra_file_1_t *) erpc_malloc(sizeof(list_extra_file_1_t));
+    if (blobs == NULL)
+    {
+        codec->updateStatus(kErpcStatus_MemoryError);
+    }
+    binary_t *matches = NULL;
+    uint32_t result;
+
+    // startReadMessage() was already called before this shim was invoked.
+
+    read_list_extra_file_1_t_struct(codec, blobs);
+
+    matches = (binary_t *) erpc_malloc(sizeof(binary_t));
+    if (matches == NULL)
+    {
+        codec->updateStatus(kErpcStatus_MemoryError);
+    }
+
+    err = codec->getStatus();
+    if (err == kErpcStatus_Success)
+    {
+        // Invoke the actual served function.
+#if ERPC_NESTED_CALLS_DETECTION
+        nestingDetection = true;
+#endif
+        result = m_handler->MatchCachedBlobs(blobs, matches);
+#if ERPC_NESTED_CALLS_DETECTION
+        nestingDetection = false;
+#endif
+
+        // preparing MessageBuffer for serializing data
+        err = messageFactory->prepareServerBufferForSend(codec->getBufferRef(), transport->reserveHeaderSize());
+    }
+
+    if (err == kErpcStatus_Success)
+    {
+        // preparing codec for serializing data
+        codec->reset(transport->reserveHeaderSize());
+
+        // Build response message.
+        codec->startWriteMessage(message_type_t::kReplyMessage, BeremizPLCObjectService_interface::m_serviceId, BeremizPLCObjectService_interface::m_MatchCachedBlobsId, sequence);
+
+        write_binary_t_struct(codec, matches);
+
+        codec->write(result);
+
+        err = codec->getStatus();
+    }
+
+    if (blobs)
+    {
+        free_list_extra_file_1_t_struct(blobs);
+    }
+    erpc_free(blobs);
+
+    if (matches)
+    {
+        free_binary_t_struct(matches);
+    }
+    erpc_free(matches);
+
+    return err;
+}
+
+// Server shim for AppendDeltaToBlob of BeremizPLCObjectService interface.
+erpc_status_t BeremizPLCObjectService_service::AppendDeltaToBlob_shim(Codec * codec, MessageBufferFactory *messageFactory, Transport * transport, uint32_t sequence)
+{
+    erpc_status_t err = kErpcStatus_Success;
+
+    binary_t *deltaBlobID = NULL;
+    deltaBlobID = (binary_t *) erpc_malloc(sizeof(binary_t));
+    if (deltaBlobID == NULL)
+    {
+        codec->updateStatus(kErpcStatus_MemoryError);
+    }
+    binary_t *blobID = NULL;
+    blobID = (binary_t *) erpc_malloc(sizeof(binary_t));
+    if (blobID == NULL)
+    {
+        codec->updateStatus(kErpcStatus_MemoryError);
+    }
+    binary_t *newBlobID = NULL;
+    uint32_t result;
+
+    // startReadMessage() was already called before this shim was invoked.
+
+    read_binary_t_struct(codec, deltaBlobID);
+
+    read_binary_t_struct(codec, blobID);
+
+    newBlobID = (binary_t *) erpc_malloc(sizeof(binary_t));
+    if (newBlobID == NULL)
+    {
+        codec->updateStatus(kErpcStatus_MemoryError);
+    }
+
+    err = codec->getStatus();
+    if (err == kErpcStatus_Success)
+    {
+        // Invoke the actual served function.
+#if ERPC_NESTED_CALLS_DETECTION
+        nestingDetection = true;
+#endif
+        result = m_handler->AppendDeltaToBlob(deltaBlobID, blobID, newBlobID);
+#if ERPC_NESTED_CALLS_DETECTION
+        nestingDetection = false;
+#endif
+
+        // preparing MessageBuffer for serializing data
+        err = messageFactory->prepareServerBufferForSend(codec->getBufferRef(), transport->reserveHeaderSize());
+    }
+
+    if (err == kErpcStatus_Success)
+    {
+        // preparing codec for serializing data
+        codec->reset(transport->reserveHeaderSize());
+
+        // Build response message.
+        codec->startWriteMessage(message_type_t::kReplyMessage, BeremizPLCObjectService_interface::m_serviceId, BeremizPLCObjectService_interface::m_AppendDeltaToBlobId, sequence);
+
+        write_binary_t_struct(codec, newBlobID);
+
+        codec->write(result);
+
+        err = codec->getStatus();
+    }
+
+    if (deltaBlobID)
+    {
+        free_binary_t_struct(deltaBlobID);
+    }
+    erpc_free(deltaBlobID);
+
+    if (blobID)
+    {
+        free_binary_t_struct(blobID);
+    }
+    erpc_free(blobID);
+
+    if (newBlobID)
+    {
+        free_binary_t_struct(newBlobID);
+    }
+    erpc_free(newBlobID);
+
+    return err;
+}
+
+// Server shim for GetLogMessages of BeremizPLCObjectService interface.
+erpc_status_t BeremizPLCObjectService_service::GetLogMessages_shim(Codec * codec, MessageBufferFactory *messageFactory, Transport * transport, uint32_t sequence)
+{
+    erpc_status_t err = kErpcStatus_Success;
+
+    uint8_t level;
+    uint32_t msgID;
+    uint32_t maxCount;
+    uint32_t maxBytes;
+    list_log_message_1_t *messages = NULL;
+    uint32_t result;
+
+    // startReadMessage() was already called before this shim was invoked.
+
+    codec->read(level);
+
+    codec->read(msgID);
+
+    codec->read(maxCount);
+
+    codec->read(maxBytes);
+
+    messages = (list_log_message_1_t *) erpc_malloc(sizeof(list_log_message_1_t));
+    if (messages == NULL)
+    {
+        codec->updateStatus(kErpcStatus_MemoryError);
+    }
+
+    err = codec->getStatus();
+    if (err == kErpcStatus_Success)
+    {
+        // Invoke the actual served function.
+#if ERPC_NESTED_CALLS_DETECTION
+        nestingDetection = true;
+#endif
+        result = m_handler->GetLogMessages(level, msgID, maxCount, maxBytes, messages);
+#if ERPC_NESTED_CALLS_DETECTION
+        nestingDetection = false;
+#endif
+
+        // preparing MessageBuffer for serializing data
+        err = messageFactory->prepareServerBufferForSend(codec->getBufferRef(), transport->reserveHeaderSize());
+    }
+
+    if (err == kErpcStatus_Success)
+    {
+        // preparing codec for serializing data
+        codec->reset(transport->reserveHeaderSize());
+
+        // Build response message.
+        codec->startWriteMessage(message_type_t::kReplyMessage, BeremizPLCObjectService_interface::m_serviceId, BeremizPLCObjectService_interface::m_GetLogMessagesId, sequence);
+
+        write_list_log_message_1_t_struct(codec, messages);
+
+        codec->write(result);
+
+        err = codec->getStatus();
+    }
+
+    if (messages)
+    {
+        free_list_log_message_1_t_struct(messages);
+    }
+    erpc_free(messages);
+
+    return err;
+}
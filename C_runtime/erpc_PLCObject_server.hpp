@@ -80,6 +80,18 @@ private:
 
     /*! @brief Server shim for StopPLC of BeremizPLCObjectService interface. */
     erpc_status_t StopPLC_shim(erpc::Codec * codec, erpc::MessageBufferFactory *messageFactory, erpc::Transport * transport, uint32_t sequence);
+
+    /*! @brief Server shim for NegotiateChunkSize of BeremizPLCObjectService interface. */
+    erpc_status_t NegotiateChunkSize_shim(erpc::Codec * codec, erpc::MessageBufferFactory *messageFactory, erpc::Transport * transport, uint32_t sequence);
+
+    /*! @brief Server shim for MatchCachedBlobs of BeremizPLCObjectService interface. */
+    erpc_status_t MatchCachedBlobs_shim(erpc::Codec * codec, erpc::MessageBufferFactory *messageFactory, erpc::Transport * transport, uint32_t sequence);
+
+    /*! @brief Server shim for AppendDeltaToBlob of BeremizPLCObjectService interface. */
+    erpc_status_t AppendDeltaToBlob_shim(erpc::Codec * codec, erpc::MessageBufferFactory *messageFactory, erpc::Transport * transport, uint32_t sequence);
+
+    /*! @brief Server shim for GetLogMessages of BeremizPLCObjectService interface. */
+    erpc_status_t GetLogMessages_shim(erpc::Codec * codec, erpc::MessageBufferFactory *messageFactory, erpc::Transport * transport, uint32_t sequence);
 };
 
 } // erpcShim
@@ -31,8 +31,11 @@ import datetime
 from time import localtime
 from functools import reduce
 
+from lxml import etree
+
 import util.paths as paths
 from plcopen import *
+from plcopen.plcopen import PLCOpen_XPath
 from plcopen.types_enums import *
 from plcopen.InstancesPathCollector import InstancesPathCollector
 from plcopen.POUVariablesCollector import POUVariablesCollector
@@ -50,6 +53,15 @@ ScriptDirectory = paths.AbsDir(__file__)
 # Length of the buffer
 UNDO_BUFFER_LENGTH = 20
 
+# Memory used by project undo buffer, oldest states are dropped beyond
+UNDO_BUFFER_MEMORY = 64 * 1024 * 1024
+
+# Project elements whose children are stored separately in undo buffer
+PROJECT_SPLIT_CONTAINERS = [
+    PLCOpen_XPath("ppx:types/ppx:dataTypes"),
+    PLCOpen_XPath("ppx:types/ppx:pous"),
+    PLCOpen_XPath("ppx:instances/ppx:configurations")]
+
 
 class UndoBuffer(object):
     """
@@ -134,6 +146,201 @@ class UndoBuffer(object):
         return self.LastSave == self.CurrentIndex
 
 
+class ProjectUndoBuffer(UndoBuffer):
+    """
+    Undo Buffer for PLCopen project
+    States are snapshots of project split in data types, POUs and
+    configurations, plus a skeleton with everything else. Identical
+    pieces are shared among states, so that memory is mostly used by
+    what changed. Restoring a state only parses pieces that differ from
+    current project.
+    Serialized pieces of project elements are kept until elements are
+    touched, so that only elements changed by an edit are serialized again.
+    """
+
+    def __init__(self, project, issaved=False):
+        # serialized pieces shared among states : piece -> [piece, refcount]
+        self.Pieces = {}
+        self.Size = 0
+        # pieces of current project elements not touched since serialized
+        self.Clean = {}
+        # last serialized skeleton, and content it was serialized from
+        self.Skeleton = None
+        self.SkeletonKey = None
+        state = self.Snapshot(project)
+        UndoBuffer.__init__(self, state, issaved)
+        self._Acquire(state)
+
+    def _Pieces(self, state):
+        skeleton, containers = state
+        yield skeleton
+        for pieces in containers:
+            yield from pieces
+
+    def _Acquire(self, state):
+        for piece in self._Pieces(state):
+            entry = self.Pieces.setdefault(piece, [piece, 0])
+            if entry[1] == 0:
+                self.Size += len(piece)
+            entry[1] += 1
+
+    def _Release(self, state):
+        if state is None:
+            return
+        for piece in self._Pieces(state):
+            entry = self.Pieces[piece]
+            entry[1] -= 1
+            if entry[1] == 0:
+                self.Size -= len(piece)
+                self.Pieces.pop(piece)
+
+    def _Intern(self, piece):
+        entry = self.Pieces.get(piece)
+        return piece if entry is None else entry[0]
+
+    def Touch(self, element=None):
+        """
+        Tell that element, or any element it contains, changed.
+        Whole project changed if element is None.
+        """
+        if element is None:
+            self.Clean.clear()
+            return
+        # find project element containing element
+        while element is not None and element not in self.Clean:
+            element = element.getparent()
+        self.Clean.pop(element, None)
+
+    def Snapshot(self, project):
+        """
+        Return state of project, to be given to Buffering
+        """
+        containers = [find(project) for find in PROJECT_SPLIT_CONTAINERS]
+        children = [list(container[0]) if container else []
+                    for container in containers]
+        # only serialize elements touched since last snapshot
+        clean = {}
+        pieces = []
+        for elements in children:
+            container_pieces = []
+            for child in elements:
+                piece = self.Clean.get(child)
+                if piece is None:
+                    piece = self._Intern(PLCOpenParser.Dumps(child))
+                clean[child] = piece
+                container_pieces.append(piece)
+            pieces.append(tuple(container_pieces))
+        pieces = tuple(pieces)
+        self.Clean = clean
+        # skeleton is serialized without children already in pieces,
+        # only if changed, since children moved back are walked through
+        key = self._SkeletonKey(project, [
+            container[0] for container in containers if container])
+        if key != self.SkeletonKey:
+            try:
+                for container in containers:
+                    if container:
+                        del container[0][:]
+                self.Skeleton = PLCOpenParser.Dumps(project)
+            finally:
+                for container, elements in zip(containers, children):
+                    if container:
+                        container[0].extend(elements)
+            self.SkeletonKey = key
+        skeleton = self._Intern(self.Skeleton)
+        return skeleton, pieces
+
+    def _SkeletonKey(self, project, containers):
+        """
+        Return content of project elements outside containers, telling
+        if skeleton changed
+        """
+        containers = set(containers)
+        path = set()
+        for container in containers:
+            path.update(container.iterancestors())
+
+        def ElementKey(element):
+            if element in containers:
+                return element.tag, tuple(element.attrib.items()), element.text
+            elif element in path:
+                return (element.tag, tuple(element.attrib.items()),
+                        tuple(element.nsmap.items()), element.text, element.tail,
+                        tuple(ElementKey(child) for child in element))
+            return PLCOpenParser.Dumps(element)
+
+        return ElementKey(project)
+
+    def Restore(self, project, state):
+        """
+        Return project corresponding to given state, reusing elements of
+        current project that didn't change
+        """
+        if state is None:
+            return project
+        current_skeleton, current_pieces = self.Snapshot(project)
+        skeleton, pieces = state
+        if skeleton != current_skeleton:
+            new_project = PLCOpenParser.Loads(skeleton)
+        else:
+            new_project = project
+
+        for find, current, target in zip(
+                PROJECT_SPLIT_CONTAINERS, current_pieces, pieces):
+            if new_project is project and current == target:
+                continue
+            containers = find(project)
+            new_containers = find(new_project)
+            if not new_containers:
+                continue
+            new_container = new_containers[0]
+
+            # elements of current project, by serialized content
+            available = {}
+            if containers:
+                for piece, element in zip(current, containers[0]):
+                    available.setdefault(piece, []).append(element)
+
+            missing = [piece for piece in target if not available.get(piece)]
+            if missing:
+                # parse all missing elements at once, in a container with
+                # same tag for element classes to be found
+                tag = etree.QName(new_container.tag)
+                wrapper = PLCOpenParser.Loads(
+                    ('<ns:%s xmlns:ns="%s">' % (tag.localname, tag.namespace)).encode() +
+                    b"".join(missing) +
+                    ('</ns:%s>' % tag.localname).encode())
+                for piece, element in zip(missing, list(wrapper)):
+                    available.setdefault(piece, []).append(element)
+
+            elements = [available[piece].pop(0) for piece in target]
+            del new_container[:]
+            new_container.extend(elements)
+            self.Clean.update(zip(elements, target))
+
+        return new_project
+
+    def Buffering(self, currentstate):
+        # states that could have been redone are lost
+        index = self.CurrentIndex
+        while index != self.MaxIndex:
+            index = (index + 1) % UNDO_BUFFER_LENGTH
+            self._Release(self.Buffer[index])
+            self.Buffer[index] = None
+        # state overwritten when buffer is full
+        self._Release(self.Buffer[(self.CurrentIndex + 1) % UNDO_BUFFER_LENGTH])
+        UndoBuffer.Buffering(self, currentstate)
+        self._Acquire(currentstate)
+
+        # drop oldest states if buffer uses too much memory
+        while self.Size > UNDO_BUFFER_MEMORY and self.MinIndex != self.CurrentIndex:
+            self._Release(self.Buffer[self.MinIndex])
+            self.Buffer[self.MinIndex] = None
+            if self.LastSave == self.MinIndex:
+                self.LastSave = -1
+            self.MinIndex = (self.MinIndex + 1) % UNDO_BUFFER_LENGTH
+
+
 class PLCControler(object):
     """
     Controler for PLCOpenEditor
@@ -160,6 +367,7 @@ class PLCControler(object):
         self.FilePath = ""
         self.FileName = ""
         self.ProgramChunks = []
+        self.ProgramChunksCache = {}
         self.ProgramOffset = 0
         self.NextCompiledProject = None
         self.CurrentCompiledProject = None
@@ -188,6 +396,7 @@ class PLCControler(object):
     # Create a new project by replacing the current one
     def CreateNewProject(self, properties):
         # Create the project
+        ReleaseIndexedBodies(self.Project)
         self.Project = PLCOpenParser.CreateRoot()
         properties["creationDateTime"] = datetime.datetime(*localtime()[:6])
         self.Project.setfileHeader(properties)
@@ -450,7 +659,9 @@ class PLCControler(object):
         warnings = []
         if self.Project is not None:
             try:
-                self.ProgramChunks = GenerateCurrentProgram(self, self.Project, errors, warnings,**kwargs)
+                self.ProgramChunks = GenerateCurrentProgram(
+                    self, self.Project, errors, warnings,
+                    cache=self.ProgramChunksCache, **kwargs)
                 self.NextCompiledProject = self.Copy(self.Project)
                 program_text = "".join([item[0] for item in self.ProgramChunks])
                 if filepath is not None:
@@ -638,6 +849,7 @@ class PLCControler(object):
             if resource_name is None:
                 resource_name = self.GenerateNewName(None, None, "resource%d")
             self.Project.addconfigurationResource(config_name, resource_name)
+            self.TouchProjectElement(self.Project.getconfiguration(config_name))
             self.BufferProject()
             return ComputeConfigurationResourceName(config_name, resource_name)
         return None
@@ -646,6 +858,7 @@ class PLCControler(object):
     def ProjectRemoveConfigurationResource(self, config_name, resource_name):
         if self.Project is not None:
             self.Project.removeconfigurationResource(config_name, resource_name)
+            self.TouchProjectElement(self.Project.getconfiguration(config_name))
             self.BufferProject()
 
     # Add a Transition to a Project Pou
@@ -654,6 +867,7 @@ class PLCControler(object):
             pou = self.Project.getpou(pou_name)
             if pou is not None:
                 pou.addtransition(transition_name, transition_type)
+                self.TouchProjectElement(pou)
                 self.BufferProject()
                 return ComputePouTransitionName(pou_name, transition_name)
         return None
@@ -665,6 +879,7 @@ class PLCControler(object):
             pou = self.Project.getpou(pou_name)
             if pou is not None:
                 pou.removetransition(transition_name)
+                self.TouchProjectElement(pou)
                 self.BufferProject()
 
     # Add an Action to a Project Pou
@@ -673,6 +888,7 @@ class PLCControler(object):
             pou = self.Project.getpou(pou_name)
             if pou is not None:
                 pou.addaction(action_name, action_type)
+                self.TouchProjectElement(pou)
                 self.BufferProject()
                 return ComputePouActionName(pou_name, action_name)
         return None
@@ -684,6 +900,7 @@ class PLCControler(object):
             pou = self.Project.getpou(pou_name)
             if pou is not None:
                 pou.removeaction(action_name)
+                self.TouchProjectElement(pou)
                 self.BufferProject()
 
     # Change the name of a pou
@@ -694,6 +911,7 @@ class PLCControler(object):
             if datatype is not None:
                 datatype.setname(new_name)
                 self.Project.updateElementName(old_name, new_name)
+                self.TouchProjectElement()
                 self.BufferProject()
 
     # Change the name of a pou
@@ -704,6 +922,7 @@ class PLCControler(object):
             if pou is not None:
                 pou.setname(new_name)
                 self.Project.updateElementName(old_name, new_name)
+                self.TouchProjectElement()
                 self.BufferProject()
 
     # Change the name of a pou transition
@@ -716,6 +935,7 @@ class PLCControler(object):
                 if transition is not None:
                     transition.setname(new_name)
                     pou.updateElementName(old_name, new_name)
+                    self.TouchProjectElement(pou)
                     self.BufferProject()
 
     # Change the name of a pou action
@@ -728,6 +948,7 @@ class PLCControler(object):
                 if action is not None:
                     action.setname(new_name)
                     pou.updateElementName(old_name, new_name)
+                    self.TouchProjectElement(pou)
                     self.BufferProject()
 
     # Change the name of a pou variable
@@ -740,6 +961,7 @@ class PLCControler(object):
                     for var in varlist.getvariable():
                         if var.getname() == old_name:
                             var.setname(new_name)
+                self.TouchProjectElement(pou)
                 self.BufferProject()
 
     # Change the name of a configuration
@@ -749,6 +971,7 @@ class PLCControler(object):
             configuration = self.Project.getconfiguration(old_name)
             if configuration is not None:
                 configuration.setname(new_name)
+                self.TouchProjectElement(configuration)
                 self.BufferProject()
 
     # Change the name of a configuration resource
@@ -758,6 +981,7 @@ class PLCControler(object):
             resource = self.Project.getconfigurationResource(config_name, old_name)
             if resource is not None:
                 resource.setname(new_name)
+                self.TouchProjectElement(resource)
                 self.BufferProject()
 
     # Return the description of the pou given by its name
@@ -778,6 +1002,7 @@ class PLCControler(object):
             pou = project.getpou(name)
             if pou is not None:
                 pou.setdescription(description)
+                self.TouchProjectElement(pou)
                 self.BufferProject()
 
     # Return the type of the pou given by its name
@@ -960,6 +1185,7 @@ class PLCControler(object):
                 configuration.addglobalVar(
                     self.GetVarTypeObject(var_type),
                     var_name, location, description)
+                self.TouchProjectElement(configuration)
 
     # Replace the configuration globalvars by those given
     def SetConfigurationGlobalVars(self, name, vars):
@@ -971,6 +1197,7 @@ class PLCControler(object):
                 configuration.setglobalVars([
                     varlist for _vartype, varlist
                     in self.ExtractVarLists(vars)])
+                self.TouchProjectElement(configuration)
 
     # Return the configuration globalvars
     def GetConfigurationGlobalVars(self, name, debug=False):
@@ -1009,6 +1236,7 @@ class PLCControler(object):
                 resource.setglobalVars([
                     varlist for _vartype, varlist
                     in self.ExtractVarLists(vars)])
+                self.TouchProjectElement(resource)
 
     # Return the resource globalvars
     def GetConfigurationResourceGlobalVars(self, config_name, name, debug=False):
@@ -1059,6 +1287,7 @@ class PLCControler(object):
                     pou.interface = PLCOpenParser.CreateElement("interface", "pou")
                 # Set Pou interface
                 pou.setvars([varlist for _varlist_type, varlist in self.ExtractVarLists(vars)])
+                self.TouchProjectElement(pou)
 
     # Replace the return type of the pou given by its name (only for functions)
     def SetPouInterfaceReturnType(self, name, return_type):
@@ -1082,10 +1311,12 @@ class PLCControler(object):
                     derived_type = PLCOpenParser.CreateElement("derived", "dataType")
                     derived_type.setname(return_type)
                     return_type_obj.setcontent(derived_type)
+                self.TouchProjectElement(pou)
 
     def UpdateProjectUsedPous(self, old_name, new_name):
         if self.Project is not None:
             self.Project.updateElementName(old_name, new_name)
+            self.TouchProjectElement()
 
     def UpdateEditedElementUsedVariable(self, tagname, old_name, new_name):
         pou = self.GetEditedElement(tagname)
@@ -1574,6 +1805,7 @@ class PLCControler(object):
         words = tagname.split("::")
         if self.Project is not None and words[0] == "D":
             datatype = self.Project.getdataType(words[1])
+            self.TouchProjectElement(datatype)
             if infos["type"] == "Directly":
                 if infos["base_type"] in self.GetBaseTypes():
                     datatype.baseType.setcontent(PLCOpenParser.CreateElement(
@@ -1693,27 +1925,30 @@ class PLCControler(object):
     #                       Project opened Pous management functions
     # -------------------------------------------------------------------------------
 
-    # Return edited element
+    # Return edited element, considered changed by caller if not debug
     def GetEditedElement(self, tagname, debug=False):
+        element = None
         project = self.GetProject(debug)
         if project is not None:
             words = tagname.split("::")
             if words[0] == "D":
-                return project.getdataType(words[1])
+                element = project.getdataType(words[1])
             elif words[0] == "P":
-                return project.getpou(words[1])
+                element = project.getpou(words[1])
             elif words[0] in ['T', 'A']:
                 pou = project.getpou(words[1])
                 if pou is not None:
                     if words[0] == 'T':
-                        return pou.gettransition(words[2])
+                        element = pou.gettransition(words[2])
                     elif words[0] == 'A':
-                        return pou.getaction(words[2])
+                        element = pou.getaction(words[2])
             elif words[0] == 'C':
-                return project.getconfiguration(words[1])
+                element = project.getconfiguration(words[1])
             elif words[0] == 'R':
-                return project.getconfigurationResource(words[1], words[2])
-        return None
+                element = project.getconfigurationResource(words[1], words[2])
+        if element is not None and not debug:
+            self.TouchProjectElement(element)
+        return element
 
     # Return edited element name
     def GetEditedElementName(self, tagname):
@@ -2053,6 +2288,7 @@ class PLCControler(object):
                     pou.addpouLocalVar(
                         self.GetVarTypeObject(var_type),
                         name, **args)
+                    self.TouchProjectElement(pou)
 
     def AddEditedElementPouExternalVar(self, tagname, var_type, name, **args):
         if self.Project is not None:
@@ -2063,6 +2299,7 @@ class PLCControler(object):
                     pou.addpouExternalVar(
                         self.GetVarTypeObject(var_type),
                         name, **args)
+                    self.TouchProjectElement(pou)
 
     def ChangeEditedElementPouVar(self, tagname, old_type, old_name, new_type, new_name):
         if self.Project is not None:
@@ -2071,6 +2308,7 @@ class PLCControler(object):
                 pou = self.Project.getpou(words[1])
                 if pou is not None:
                     pou.changepouVar(old_type, old_name, new_type, new_name)
+                    self.TouchProjectElement(pou)
 
     def RemoveEditedElementPouVar(self, tagname, type, name):
         if self.Project is not None:
@@ -2079,6 +2317,7 @@ class PLCControler(object):
                 pou = self.Project.getpou(words[1])
                 if pou is not None:
                     pou.removepouVar(type, name)
+                    self.TouchProjectElement(pou)
 
     def AddEditedElementBlock(self, tagname, id, blocktype, blockname=None):
         element = self.GetEditedElement(tagname)
@@ -2739,6 +2978,7 @@ class PLCControler(object):
             return tasks_data, instances_data
 
     def OpenXMLFile(self, filepath):
+        ReleaseIndexedBodies(self.Project)
         self.Project, error = LoadProject(filepath)
         if self.Project is None:
             return _("Project file syntax error:\n\n") + error
@@ -2801,7 +3041,7 @@ class PLCControler(object):
 
     def CreateProjectBuffer(self, saved):
         if self.ProjectBufferEnabled:
-            self.ProjectBuffer = UndoBuffer(PLCOpenParser.Dumps(self.Project), saved)
+            self.ProjectBuffer = ProjectUndoBuffer(self.Project, saved)
         else:
             self.ProjectBuffer = None
             self.ProjectSaved = saved
@@ -2818,9 +3058,18 @@ class PLCControler(object):
                 current_saved = self.ProjectBuffer.IsCurrentSaved()
             self.CreateProjectBuffer(current_saved)
 
+    def TouchProjectElement(self, element=None):
+        """
+        Tell undo buffer that element changed, whole project if None.
+        Must be called by any change not done through GetEditedElement.
+        """
+        if self.ProjectBuffer is not None:
+            self.ProjectBuffer.Touch(element)
+
     def BufferProject(self):
         if self.ProjectBuffer is not None:
-            self.ProjectBuffer.Buffering(PLCOpenParser.Dumps(self.Project))
+            self.ProjectBuffer.Buffering(
+                self.ProjectBuffer.Snapshot(self.Project))
         else:
             self.ProjectSaved = False
 
@@ -2832,7 +3081,8 @@ class PLCControler(object):
 
     def EndBuffering(self):
         if self.ProjectBuffer is not None and self.Buffering:
-            self.ProjectBuffer.Buffering(PLCOpenParser.Dumps(self.Project))
+            self.ProjectBuffer.Buffering(
+                self.ProjectBuffer.Snapshot(self.Project))
             self.Buffering = False
 
     def MarkProjectAsSaved(self):
@@ -2852,11 +3102,18 @@ class PLCControler(object):
     def LoadPrevious(self):
         self.EndBuffering()
         if self.ProjectBuffer is not None:
-            self.Project = PLCOpenParser.Loads(self.ProjectBuffer.Previous())
+            self.SetRestoredProject(self.ProjectBuffer.Restore(
+                self.Project, self.ProjectBuffer.Previous()))
 
     def LoadNext(self):
         if self.ProjectBuffer is not None:
-            self.Project = PLCOpenParser.Loads(self.ProjectBuffer.Next())
+            self.SetRestoredProject(self.ProjectBuffer.Restore(
+                self.Project, self.ProjectBuffer.Next()))
+
+    def SetRestoredProject(self, project):
+        if project is not self.Project:
+            ReleaseIndexedBodies(self.Project)
+            self.Project = project
 
     def GetBufferState(self):
         if self.ProjectBuffer is not None:
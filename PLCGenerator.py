@@ -26,8 +26,12 @@
 from functools import cmp_to_key
 from operator import eq
 import re
+import hashlib
+import uuid
 from functools import reduce
 
+from lxml import etree
+
 from plcopen import PLCOpenParser
 from plcopen.structures import *
 from plcopen.types_enums import *
@@ -100,6 +104,41 @@ class PLCGenException(Exception):
     pass
 
 
+# -------------------------------------------------------------------------------
+#                     Cache of data types and POUs programs
+# -------------------------------------------------------------------------------
+
+
+class GenerationRecord(object):
+    """
+    Record what generation of a data type or a POU did besides producing
+    its own program : other data types and POUs it asked to generate, and
+    warnings it raised, in order, so that it can be replayed from cache.
+    """
+
+    def __init__(self, key, warnings):
+        self.Key = key
+        self.Warnings = warnings
+        self.WarningsCount = len(warnings)
+        self.Events = []
+        self.UsesPouNames = False
+
+    def FlushWarnings(self):
+        for warning in self.Warnings[self.WarningsCount:]:
+            self.Events.append(("warning", warning))
+        self.WarningsCount = len(self.Warnings)
+
+    def AddDependency(self, kind, name):
+        # functions refer to themselves for their result
+        if (kind, name) != self.Key:
+            self.FlushWarnings()
+            self.Events.append(("dependency", kind, name))
+
+    def GetDependencies(self):
+        return [event[1:] for event in self.Events
+                if event[0] == "dependency"]
+
+
 # -------------------------------------------------------------------------------
 #                           Generator of PLC program
 # -------------------------------------------------------------------------------
@@ -108,7 +147,7 @@ class PLCGenException(Exception):
 class ProgramGenerator(object):
 
     # Create a new PCL program generator
-    def __init__(self, controler, project, errors, warnings):
+    def __init__(self, controler, project, errors, warnings, cache=None):
         # Keep reference of the controler and project
         self.Controler = controler
         self.Project = project
@@ -116,8 +155,108 @@ class ProgramGenerator(object):
         self.Program = []
         self.DatatypeComputed = {}
         self.PouComputed = {}
+        self.PouNameModels = {}
         self.Errors = errors
         self.Warnings = warnings
+        # Programs of data types and POUs from previous generation, indexed
+        # by (kind, name), and the ones of this generation
+        self.Cache = cache
+        self.NewCache = {}
+        self.CacheHits = 0
+        self.Records = []
+        self.ElementDigests = {}
+        self.ContextDigests = None
+
+    # Return digests of what can change generated programs outside of
+    # project data types and POUs : confnodes libraries and POU names
+    def GetContextDigests(self):
+        if self.ContextDigests is None:
+            libraries = hashlib.md5()
+            for confnodetypes in self.Controler.ConfNodeTypes:
+                libraries.update(etree.tostring(confnodetypes["types"]))
+            names = hashlib.md5()
+            for pou in self.Project.getpous():
+                names.update(pou.getname().encode() + b"\0")
+            self.ContextDigests = (libraries.digest(), names.digest())
+        return self.ContextDigests
+
+    # Return digest of a data type or a POU model, of the context and of
+    # the data types and POUs it depends on, recursively, according to the
+    # dependencies recorded by its last generation
+    def GetElementDigest(self, kind, name):
+        key = (kind, name)
+        digest = self.ElementDigests.get(key)
+        if digest is None:
+            # dependency cycle, element can't be cached
+            self.ElementDigests[key] = uuid.uuid4().hex
+            if kind == "pou":
+                element = self.Project.getpou(name)
+            else:
+                element = self.Project.getdataType(name)
+            libraries_digest, names_digest = self.GetContextDigests()
+            hasher = hashlib.md5()
+            hasher.update(("%s %s\0" % key).encode())
+            hasher.update(libraries_digest)
+            if element is not None:
+                hasher.update(etree.tostring(element))
+            entry = self.NewCache.get(key)
+            if entry is None and self.Cache is not None:
+                entry = self.Cache.get(key)
+            if entry is not None:
+                if entry["uses_pou_names"]:
+                    hasher.update(names_digest)
+                for dependency in entry["dependencies"]:
+                    hasher.update(self.GetElementDigest(*dependency).encode())
+            digest = hasher.hexdigest()
+            self.ElementDigests[key] = digest
+        return digest
+
+    # Generate a data type or a POU program, or replay its generation from
+    # cache if neither its model nor its dependencies changed
+    def GenerateElement(self, kind, name, computed, compute):
+        if self.Records:
+            self.Records[-1].AddDependency(kind, name)
+        # Verify that element hasn't been generated yet
+        if not computed.get(name, True):
+            # If not mark element as computed
+            computed[name] = True
+            if self.Cache is None:
+                self.Program += compute(name)
+                return
+
+            key = (kind, name)
+            entry = self.Cache.get(key)
+            record = GenerationRecord(key, self.Warnings)
+            self.Records.append(record)
+            try:
+                if entry is not None and \
+                   entry["digest"] == self.GetElementDigest(kind, name):
+                    self.CacheHits += 1
+                    for event in entry["events"]:
+                        if event[0] == "warning":
+                            self.Warnings.append(event[1])
+                        elif event[1] == "pou":
+                            self.GeneratePouProgram(event[2])
+                        else:
+                            self.GenerateDataType(event[2])
+                    self.NewCache[key] = entry
+                else:
+                    program = compute(name)
+                    record.FlushWarnings()
+                    entry = {"events": record.Events,
+                             "dependencies": record.GetDependencies(),
+                             "uses_pou_names": record.UsesPouNames,
+                             "program": program}
+                    self.NewCache[key] = entry
+                    # digest now depends on dependencies of this generation
+                    self.ElementDigests.pop(key, None)
+                    entry["digest"] = self.GetElementDigest(kind, name)
+            finally:
+                self.Records.pop()
+            self.Program += entry["program"]
+        if self.Records:
+            # warnings raised until now belong to dependency
+            self.Records[-1].WarningsCount = len(self.Warnings)
 
     # Compute value according to type given
     def ComputeValue(self, value, var_type):
@@ -130,142 +269,149 @@ class ProgramGenerator(object):
 
     # Generate a data type from its name
     def GenerateDataType(self, datatype_name):
-        # Verify that data type hasn't been generated yet
-        if not self.DatatypeComputed.get(datatype_name, True):
-            # If not mark data type as computed
-            self.DatatypeComputed[datatype_name] = True
-
-            # Getting datatype model from project
-            datatype = self.Project.getdataType(datatype_name)
-            tagname = ComputeDataTypeName(datatype.getname())
-            datatype_def = [("  ", ()),
-                            (datatype.getname(), (tagname, "name")),
-                            (" : ", ())]
-            basetype_content = datatype.baseType.getcontent()
-            basetype_content_type = basetype_content.getLocalTag()
-            # Data type derived directly from a user defined type
-            if basetype_content_type == "derived":
-                basetype_name = basetype_content.getname()
+        self.GenerateElement("datatype", datatype_name,
+                             self.DatatypeComputed, self.ComputeDataType)
+
+    # Compute data type declaration program from its name
+    def ComputeDataType(self, datatype_name):
+        # Getting datatype model from project
+        datatype = self.Project.getdataType(datatype_name)
+        tagname = ComputeDataTypeName(datatype.getname())
+        datatype_def = [("  ", ()),
+                        (datatype.getname(), (tagname, "name")),
+                        (" : ", ())]
+        basetype_content = datatype.baseType.getcontent()
+        basetype_content_type = basetype_content.getLocalTag()
+        # Data type derived directly from a user defined type
+        if basetype_content_type == "derived":
+            basetype_name = basetype_content.getname()
+            self.GenerateDataType(basetype_name)
+            datatype_def += [(basetype_name, (tagname, "base"))]
+        # Data type is a subrange
+        elif basetype_content_type in ["subrangeSigned", "subrangeUnsigned"]:
+            base_type = basetype_content.baseType.getcontent()
+            base_type_type = base_type.getLocalTag()
+            # Subrange derived directly from a user defined type
+            if base_type_type == "derived":
+                basetype_name = base_type_type.getname()
                 self.GenerateDataType(basetype_name)
-                datatype_def += [(basetype_name, (tagname, "base"))]
-            # Data type is a subrange
-            elif basetype_content_type in ["subrangeSigned", "subrangeUnsigned"]:
-                base_type = basetype_content.baseType.getcontent()
-                base_type_type = base_type.getLocalTag()
-                # Subrange derived directly from a user defined type
-                if base_type_type == "derived":
-                    basetype_name = base_type_type.getname()
-                    self.GenerateDataType(basetype_name)
-                # Subrange derived directly from an elementary type
-                else:
-                    basetype_name = base_type_type
-                min_value = basetype_content.range.getlower()
-                max_value = basetype_content.range.getupper()
-                datatype_def += [(basetype_name, (tagname, "base")),
-                                 (" (", ()),
-                                 ("%s" % min_value, (tagname, "lower")),
-                                 ("..", ()),
-                                 ("%s" % max_value, (tagname, "upper")),
-                                 (")", ())]
-            # Data type is an enumerated type
-            elif basetype_content_type == "enum":
-                values = [[(value.getname(), (tagname, "value", i))]
-                          for i, value in enumerate(
-                              basetype_content.xpath("ppx:values/ppx:value",
-                                                     namespaces=PLCOpenParser.NSMAP))]
-                datatype_def += [("(", ())]
-                datatype_def += JoinList([(", ", ())], values)
-                datatype_def += [(")", ())]
-            # Data type is an array
-            elif basetype_content_type == "array":
-                base_type = basetype_content.baseType.getcontent()
-                base_type_type = base_type.getLocalTag()
-                # Array derived directly from a user defined type
-                if base_type_type == "derived":
-                    basetype_name = base_type.getname()
-                    self.GenerateDataType(basetype_name)
-                # Array derived directly from an elementary type
-                else:
-                    basetype_name = base_type_type.upper()
-                dimensions = [[("%s" % dimension.getlower(), (tagname, "range", i, "lower")),
-                               ("..", ()),
-                               ("%s" % dimension.getupper(), (tagname, "range", i, "upper"))]
-                              for i, dimension in enumerate(basetype_content.getdimension())]
-                datatype_def += [("ARRAY [", ())]
-                datatype_def += JoinList([(",", ())], dimensions)
-                datatype_def += [("] OF ", ()),
-                                 (basetype_name, (tagname, "base"))]
-            # Data type is a structure
-            elif basetype_content_type == "struct":
-                elements = []
-                for i, element in enumerate(basetype_content.getvariable()):
-                    element_type = element.type.getcontent()
-                    element_type_type = element_type.getLocalTag()
-                    # Structure element derived directly from a user defined type
-                    if element_type_type == "derived":
-                        elementtype_name = element_type.getname()
-                        self.GenerateDataType(elementtype_name)
-                    elif element_type_type == "array":
-                        base_type = element_type.baseType.getcontent()
-                        base_type_type = base_type.getLocalTag()
-                        # Array derived directly from a user defined type
-                        if base_type_type == "derived":
-                            basetype_name = base_type.getname()
-                            self.GenerateDataType(basetype_name)
-                        # Array derived directly from an elementary type
-                        else:
-                            basetype_name = base_type_type.upper()
-                        dimensions = ["%s..%s" % (dimension.getlower(), dimension.getupper())
-                                      for dimension in element_type.getdimension()]
-                        elementtype_name = "ARRAY [%s] OF %s" % (",".join(dimensions), basetype_name)
-                    # Structure element derived directly from an elementary type
-                    else:
-                        elementtype_name = element_type_type.upper()
-                    element_text = [("\n    ", ()),
-                                    (element.getname(), (tagname, "struct", i, "name")),
-                                    (" : ", ()),
-                                    (elementtype_name, (tagname, "struct", i, "type"))]
-                    if element.initialValue is not None:
-                        element_text.extend([(" := ", ()),
-                                             (self.ComputeValue(element.initialValue.getvalue(), elementtype_name), (tagname, "struct", i, "initial value"))])
-                    element_text.append((";", ()))
-                    elements.append(element_text)
-                datatype_def += [("STRUCT", ())]
-                datatype_def += JoinList([("", ())], elements)
-                datatype_def += [("\n  END_STRUCT", ())]
-            # Data type derived directly from a elementary type
+            # Subrange derived directly from an elementary type
+            else:
+                basetype_name = base_type_type
+            min_value = basetype_content.range.getlower()
+            max_value = basetype_content.range.getupper()
+            datatype_def += [(basetype_name, (tagname, "base")),
+                             (" (", ()),
+                             ("%s" % min_value, (tagname, "lower")),
+                             ("..", ()),
+                             ("%s" % max_value, (tagname, "upper")),
+                             (")", ())]
+        # Data type is an enumerated type
+        elif basetype_content_type == "enum":
+            values = [[(value.getname(), (tagname, "value", i))]
+                      for i, value in enumerate(
+                          basetype_content.xpath("ppx:values/ppx:value",
+                                                 namespaces=PLCOpenParser.NSMAP))]
+            datatype_def += [("(", ())]
+            datatype_def += JoinList([(", ", ())], values)
+            datatype_def += [(")", ())]
+        # Data type is an array
+        elif basetype_content_type == "array":
+            base_type = basetype_content.baseType.getcontent()
+            base_type_type = base_type.getLocalTag()
+            # Array derived directly from a user defined type
+            if base_type_type == "derived":
+                basetype_name = base_type.getname()
+                self.GenerateDataType(basetype_name)
+            # Array derived directly from an elementary type
             else:
-                datatype_def += [(basetype_content_type.upper(), (tagname, "base"))]
-            # Data type has an initial value
-            if datatype.initialValue is not None:
-                datatype_def += [(" := ", ()),
-                                 (self.ComputeValue(datatype.initialValue.getvalue(), datatype_name), (tagname, "initial value"))]
-            datatype_def += [(";\n", ())]
-            self.Program += datatype_def
+                basetype_name = base_type_type.upper()
+            dimensions = [[("%s" % dimension.getlower(), (tagname, "range", i, "lower")),
+                           ("..", ()),
+                           ("%s" % dimension.getupper(), (tagname, "range", i, "upper"))]
+                          for i, dimension in enumerate(basetype_content.getdimension())]
+            datatype_def += [("ARRAY [", ())]
+            datatype_def += JoinList([(",", ())], dimensions)
+            datatype_def += [("] OF ", ()),
+                             (basetype_name, (tagname, "base"))]
+        # Data type is a structure
+        elif basetype_content_type == "struct":
+            elements = []
+            for i, element in enumerate(basetype_content.getvariable()):
+                element_type = element.type.getcontent()
+                element_type_type = element_type.getLocalTag()
+                # Structure element derived directly from a user defined type
+                if element_type_type == "derived":
+                    elementtype_name = element_type.getname()
+                    self.GenerateDataType(elementtype_name)
+                elif element_type_type == "array":
+                    base_type = element_type.baseType.getcontent()
+                    base_type_type = base_type.getLocalTag()
+                    # Array derived directly from a user defined type
+                    if base_type_type == "derived":
+                        basetype_name = base_type.getname()
+                        self.GenerateDataType(basetype_name)
+                    # Array derived directly from an elementary type
+                    else:
+                        basetype_name = base_type_type.upper()
+                    dimensions = ["%s..%s" % (dimension.getlower(), dimension.getupper())
+                                  for dimension in element_type.getdimension()]
+                    elementtype_name = "ARRAY [%s] OF %s" % (",".join(dimensions), basetype_name)
+                # Structure element derived directly from an elementary type
+                else:
+                    elementtype_name = element_type_type.upper()
+                element_text = [("\n    ", ()),
+                                (element.getname(), (tagname, "struct", i, "name")),
+                                (" : ", ()),
+                                (elementtype_name, (tagname, "struct", i, "type"))]
+                if element.initialValue is not None:
+                    element_text.extend([(" := ", ()),
+                                         (self.ComputeValue(element.initialValue.getvalue(), elementtype_name), (tagname, "struct", i, "initial value"))])
+                element_text.append((";", ()))
+                elements.append(element_text)
+            datatype_def += [("STRUCT", ())]
+            datatype_def += JoinList([("", ())], elements)
+            datatype_def += [("\n  END_STRUCT", ())]
+        # Data type derived directly from a elementary type
+        else:
+            datatype_def += [(basetype_content_type.upper(), (tagname, "base"))]
+        # Data type has an initial value
+        if datatype.initialValue is not None:
+            datatype_def += [(" := ", ()),
+                             (self.ComputeValue(datatype.initialValue.getvalue(), datatype_name), (tagname, "initial value"))]
+        datatype_def += [(";\n", ())]
+        return datatype_def
 
     # Generate a POU from its name
     def GeneratePouProgram(self, pou_name):
-        # Verify that POU hasn't been generated yet
-        if not self.PouComputed.get(pou_name, True):
-            # If not mark POU as computed
-            self.PouComputed[pou_name] = True
-
-            # Getting POU model from project
-            pou = self.Project.getpou(pou_name)
-            pou_type = pou.getpouType()
-            # Verify that POU type exists
-            if pou_type in pouTypeNames:
-                # Create a POU program generator
-                pou_program = PouProgramGenerator(self, pou.getname(), pouTypeNames[pou_type], self.Errors, self.Warnings)
-                program = pou_program.GenerateProgram(pou)
-                self.Program += program
-            else:
-                raise PLCGenException(_("Undefined pou type \"%s\"") % pou_type)
+        self.GenerateElement("pou", pou_name,
+                             self.PouComputed, self.ComputePouProgram)
+
+    # Compute POU program from its name
+    def ComputePouProgram(self, pou_name):
+        # Getting POU model from project
+        pou = self.Project.getpou(pou_name)
+        pou_type = pou.getpouType()
+        # Verify that POU type exists
+        if pou_type in pouTypeNames:
+            # Create a POU program generator
+            pou_program = PouProgramGenerator(self, pou.getname(), pouTypeNames[pou_type], self.Errors, self.Warnings)
+            return pou_program.GenerateProgram(pou)
+        else:
+            raise PLCGenException(_("Undefined pou type \"%s\"") % pou_type)
 
     # Generate a POU defined and used in text
     def GeneratePouProgramInText(self, text):
+        # generated program now depends on the names of all POUs
+        if self.Records:
+            self.Records[-1].UsesPouNames = True
         for pou_name in list(self.PouComputed.keys()):
-            model = re.compile("(?:^|[^0-9^A-Z])%s(?:$|[^0-9^A-Z])" % pou_name.upper())
+            model = self.PouNameModels.get(pou_name)
+            if model is None:
+                # compiled once, since with many POUs, patterns don't
+                # stay in re module cache
+                model = re.compile("(?:^|[^0-9^A-Z])%s(?:$|[^0-9^A-Z])" % pou_name.upper())
+                self.PouNameModels[pou_name] = model
             if model.search(text) is not None:
                 self.GeneratePouProgram(pou_name)
 
@@ -480,6 +626,13 @@ class ProgramGenerator(object):
         for pou_name in list(self.PouComputed.keys()):
             log("Generate POU %s"%pou_name)
             self.GeneratePouProgram(pou_name)
+        if self.Cache is not None:
+            log("Reused %d of %d data types and POUs from cache" % (
+                self.CacheHits,
+                len(self.DatatypeComputed) + len(self.PouComputed)))
+            # keep only programs of this generation
+            self.Cache.clear()
+            self.Cache.update(self.NewCache)
         if noconfig:
             return
         # Generate every configurations defined
@@ -536,7 +689,9 @@ class PouProgramGenerator(object):
         self.ComputedBlocks = {}
         self.ComputedConnectors = {}
         self.ConnectionTypes = {}
-        self.RelatedConnections = []
+        # connection -> groups of connections whose type is still
+        # undefined but must be the same, in insertion order
+        self.RelatedConnections = {}
         self.SFCNetworks = {"Steps": {}, "Transitions": {}, "Actions": {}}
         self.SFCComputedBlocks = []
         self.ActionNumber = 0
@@ -640,11 +795,23 @@ class PouProgramGenerator(object):
                         return outputconnection
         return None
 
+    def AddRelatedConnections(self, related):
+        for connection in related:
+            self.RelatedConnections.setdefault(connection, []).append(related)
+
     def ExtractRelatedConnections(self, connection):
-        for i, related in enumerate(self.RelatedConnections):
-            if connection in related:
-                return self.RelatedConnections.pop(i)
-        return [connection]
+        groups = self.RelatedConnections.get(connection)
+        if not groups:
+            return [connection]
+        related = groups[0]
+        for connection in related:
+            groups = [group for group in self.RelatedConnections[connection]
+                      if group is not related]
+            if groups:
+                self.RelatedConnections[connection] = groups
+            else:
+                self.RelatedConnections.pop(connection)
+        return related
 
     def ComputeInterface(self, pou):
         interface = pou.getinterface()
@@ -816,7 +983,7 @@ class PouProgramGenerator(object):
                             else:
                                 related.extend(self.ExtractRelatedConnections(connection))
                         if var_type.startswith("ANY") and len(related) > 0:
-                            self.RelatedConnections.append(related)
+                            self.AddRelatedConnections(related)
                         else:
                             for connection in related:
                                 self.ConnectionTypes[connection] = var_type
@@ -839,7 +1006,7 @@ class PouProgramGenerator(object):
                                 else:
                                     related = self.ExtractRelatedConnections(connected)
                                     related.append(variable.connectionPointIn)
-                                    self.RelatedConnections.append(related)
+                                    self.AddRelatedConnections(related)
                         undefined_blocks.append(instance)
             for instance in undefined_blocks:
                 block_infos = self.GetBlockType(instance.gettypeName(), tuple([self.ConnectionTypes.get(variable.connectionPointIn, "ANY") for variable in instance.inputVariables.getvariable() if variable.getformalParameter() != "EN"]))
@@ -904,7 +1071,7 @@ class PouProgramGenerator(object):
                 else:
                     related.extend(self.ExtractRelatedConnections(connection))
             if var_type.startswith("ANY") and len(related) > 0:
-                self.RelatedConnections.append(related)
+                self.AddRelatedConnections(related)
             else:
                 for connection in related:
                     self.ConnectionTypes[connection] = var_type
@@ -1767,8 +1934,8 @@ class PouProgramGenerator(object):
         return program
 
 
-def GenerateCurrentProgram(controler, project, errors, warnings, **kwargs):
-    generator = ProgramGenerator(controler, project, errors, warnings)
+def GenerateCurrentProgram(controler, project, errors, warnings, cache=None, **kwargs):
+    generator = ProgramGenerator(controler, project, errors, warnings, cache)
     if hasattr(controler, "logger"):
         def log(txt):
             controler.logger.write("    "+txt+"\n")
@@ -51,6 +51,7 @@ from util.misc import CheckPathPerm, GetClassImporter
 from util.MiniTextControler import MiniTextControler
 from util.ProcessLogger import ProcessLogger
 from util.BitmapLibrary import GetBitmap
+from util.POUsCSplitter import SplitPOUsCode
 from editors.FileManagementPanel import FileManagementPanel
 from editors.ProjectNodeEditor import ProjectNodeEditor
 from editors.IECCodeViewer import IECCodeViewer
@@ -60,13 +61,22 @@ from PLCControler import PLCControler
 from plcopen.structures import IEC_KEYWORDS
 from plcopen.types_enums import ComputeConfigurationResourceName, ITEM_CONFNODE
 import targets
-from runtime.typemapping import DebugTypesSize, UnpackDebugBuffer, ValueToIECBytes
+from runtime.typemapping import DebugTypesSize, DebugBufferDecoder, ValueToIECBytes
 from runtime import PlcStatus
 from ConfigTreeNode import ConfigTreeNode, XSDSchemaErrorMessage
 from POULibrary import UserAddressedException
 
 base_folder = paths.AbsParentDir(__file__)
 
+DEBUGGER_DEFAULT_SETTINGS = {
+    "TraceBufferSize": 4096,
+    "TraceListSize": 1024,
+    "TracePaging": False,
+    "TraceDelta": False,
+    "TraceRingSlots": 4,
+    "ForceBufferSize": 1024,
+    "ForceListSize": 256}
+
 MATIEC_ERROR_MODEL = re.compile(
     r".*\.st:(\d+)-(\d+)\.\.(\d+)-(\d+): (?:error)|(?:warning) : (.*)$")
 
@@ -208,9 +218,66 @@ def GetProjectControllerXSD():
                                for libname, _lib, default in features.libraries]) + """
               </xsd:complexType>
             </xsd:element>""") if len(features.libraries) > 0 else '') + """
+            <xsd:element name="Debugger" minOccurs="0">
+              <xsd:complexType>
+                <xsd:attribute name="TraceBufferSize" use="optional" default="4096">
+                  <xsd:simpleType>
+                    <xsd:restriction base="xsd:integer">
+                      <xsd:minInclusive value="256"/>
+                      <xsd:maxInclusive value="61440"/>
+                    </xsd:restriction>
+                  </xsd:simpleType>
+                </xsd:attribute>
+                <xsd:attribute name="TraceListSize" use="optional" default="1024">
+                  <xsd:simpleType>
+                    <xsd:restriction base="xsd:integer">
+                      <xsd:minInclusive value="1"/>
+                    </xsd:restriction>
+                  </xsd:simpleType>
+                </xsd:attribute>
+                <xsd:attribute name="TracePaging" type="xsd:boolean" use="optional" default="false"/>
+                <xsd:attribute name="TraceDelta" type="xsd:boolean" use="optional" default="false"/>
+                <xsd:attribute name="TraceRingSlots" use="optional" default="4">
+                  <xsd:simpleType>
+                    <xsd:restriction base="xsd:integer">
+                      <xsd:minInclusive value="1"/>
+                    </xsd:restriction>
+                  </xsd:simpleType>
+                </xsd:attribute>
+                <xsd:attribute name="ForceBufferSize" use="optional" default="1024">
+                  <xsd:simpleType>
+                    <xsd:restriction base="xsd:integer">
+                      <xsd:minInclusive value="8"/>
+                    </xsd:restriction>
+                  </xsd:simpleType>
+                </xsd:attribute>
+                <xsd:attribute name="ForceListSize" use="optional" default="256">
+                  <xsd:simpleType>
+                    <xsd:restriction base="xsd:integer">
+                      <xsd:minInclusive value="1"/>
+                    </xsd:restriction>
+                  </xsd:simpleType>
+                </xsd:attribute>
+              </xsd:complexType>
+            </xsd:element>
+            <xsd:element name="PythonEval" minOccurs="0">
+              <xsd:complexType>
+                <xsd:attribute name="ThreadPoolSize" use="optional" default="0">
+                  <xsd:annotation>
+                    <xsd:documentation>Threads evaluating python_eval FBs concurrently, 0 for sequential evaluation</xsd:documentation>
+                  </xsd:annotation>
+                  <xsd:simpleType>
+                    <xsd:restriction base="xsd:integer">
+                      <xsd:minInclusive value="0"/>
+                    </xsd:restriction>
+                  </xsd:simpleType>
+                </xsd:attribute>
+              </xsd:complexType>
+            </xsd:element>
           </xsd:sequence>
           <xsd:attribute name="URI_location" type="xsd:string" use="optional" default=""/>
           <xsd:attribute name="Disable_Extensions" type="xsd:boolean" use="optional" default="false"/>
+          <xsd:attribute name="Split_POUs_C_Code" type="xsd:boolean" use="optional" default="false"/>
         </xsd:complexType>
       </xsd:element>
     </xsd:schema>
@@ -236,6 +303,8 @@ class ProjectController(ConfigTreeNode, PLCControler):
     XSD = GetProjectControllerXSD()
     EditorType = ProjectNodeEditor
     iec2c_cfg = None
+    # number of previously transferred PLC binaries kept as delta bases
+    TransferredBinariesKept = 4
 
     def __init__(self, frame, logger):
         PLCControler.__init__(self)
@@ -680,6 +749,7 @@ class ProjectController(ConfigTreeNode, PLCControler):
     # Update a PLCOpenEditor Pou variable location
     def UpdateProjectVariableLocation(self, old_leading, new_leading):
         self.Project.updateElementAddress(old_leading, new_leading)
+        self.TouchProjectElement()
         self.BufferProject()
         if self.AppFrame is not None:
             self.AppFrame.RefreshTitle()
@@ -739,6 +809,9 @@ class ProjectController(ConfigTreeNode, PLCControler):
     def _getExtraFilesPath(self):
         return os.path.join(self._getBuildPath(), "extra_files")
 
+    def _getTransferredBinariesPath(self):
+        return os.path.join(self._getBuildPath(), "transferred")
+
     def _getIECcodepath(self):
         # define name for IEC code file
         return os.path.join(self._getBuildPath(), "plc.st")
@@ -842,6 +915,9 @@ class ProjectController(ConfigTreeNode, PLCControler):
         hasher = hashlib.md5()
         hasher.update(IECCodeContent.encode())
         hasher.update(POUsIECCodeContent.encode())
+        # generated C files also depend on POUs C code split setting
+        if self.BeremizRoot.getSplit_POUs_C_Code():
+            hasher.update(b"Split_POUs_C_Code")
         self.IECcodeDigest = hasher.hexdigest()
 
         return True
@@ -921,6 +997,10 @@ class ProjectController(ConfigTreeNode, PLCControler):
             return False
         # transform those base names to full names with path
         C_files = [os.path.join(buildpath, filename) for filename in C_files]
+        if self.BeremizRoot.getSplit_POUs_C_Code():
+            POUs_C_files = self._Split_POUs_C_Code(buildpath, C_files)
+            if POUs_C_files is not None:
+                C_files = POUs_C_files + C_files
 
         # prepend beremiz include to configuration header
         H_files = [fname for fname in result.splitlines() if fname[
@@ -946,6 +1026,64 @@ class ProjectController(ConfigTreeNode, PLCControler):
 
         return True
 
+    def _Split_POUs_C_Code(self, buildpath, C_files):
+        """
+        Move C code of each POU from POUS.c, that resources include, to its
+        own C file, so that only POUs whose code changed are compiled again.
+        @return: list of POUs C files, or None if POUS.c can't be split
+        """
+        with open(os.path.join(buildpath, "POUS.c"), "r") as f:
+            POUs_code = f.read()
+        try:
+            POUs = SplitPOUsCode(POUs_code)
+        except ValueError as e:
+            self.logger.write_warning(
+                _("POUs C code can't be split (%s), compiling it as a whole.\n") % str(e))
+            return None
+
+        include = '#include "POUS.c"'
+        resources = []
+        for C_file in C_files:
+            with open(C_file, "r") as f:
+                lines = f.readlines()
+            if include in [line.strip() for line in lines]:
+                resources.append((C_file, lines))
+        if not resources:
+            self.logger.write_warning(
+                _("POUS.c isn't included by any resource, compiling it as a whole.\n"))
+            return None
+
+        # POUs are compiled in the same context as in resource, that is
+        # with what precedes include of POUS.c
+        _C_file, lines = resources[0]
+        preamble = "".join(
+            lines[:[line.strip() for line in lines].index(include)])
+
+        POUs_C_files = []
+        for POU_name, code in POUs:
+            C_file = os.path.join(buildpath, "POUS_%s.c" % POU_name)
+            content = preamble + code
+            # keep unchanged files as is
+            if os.path.exists(C_file):
+                with open(C_file, "r") as f:
+                    if f.read() == content:
+                        POUs_C_files.append(C_file)
+                        continue
+            with open(C_file, "w") as f:
+                f.write(content)
+            POUs_C_files.append(C_file)
+
+        # keep line numbers of resources unchanged
+        for C_file, lines in resources:
+            with open(C_file, "w") as f:
+                for line in lines:
+                    if line.strip() == include:
+                        line = "/* POUs C code compiled separately */\n"
+                    f.write(line)
+
+        self.logger.write(_("POUs C code split into %d files.\n") % len(POUs_C_files))
+        return POUs_C_files
+
     def GetBuilder(self):
         """
         Return a Builder (compile C code into machine code)
@@ -989,8 +1127,10 @@ class ProjectController(ConfigTreeNode, PLCControler):
         self._DbgVariablesList = None
         self._IECPathToIdx = {}
         self._Ticktime = 0
+        self._TraceMode = None
         self.TracedIECPath = []
         self.TracedIECTypes = []
+        self.TraceDecoder = DebugBufferDecoder([])
 
     def GetIECProgramsAndVariables(self):
         """
@@ -1077,11 +1217,48 @@ class ProjectController(ConfigTreeNode, PLCControler):
 
         return True
 
+    def GetDebuggerSettings(self):
+        """
+        Return debugger buffers sizes and trace paging mode
+        as set in project's BeremizRoot.Debugger
+        """
+        settings = DEBUGGER_DEFAULT_SETTINGS.copy()
+        debugger = self.BeremizRoot.Debugger
+        if debugger is not None:
+            for name in settings:
+                value = getattr(debugger, name)
+                if value is not None:
+                    settings[name] = value
+        # delta encoding needs whole list in each sample
+        if settings["TracePaging"]:
+            settings["TraceDelta"] = False
+        return settings
+
+    def _getTraceModePath(self):
+        return os.path.join(self._getBuildPath(), "TRACE_MODE")
+
+    def GetBuildTraceMode(self):
+        """
+        Return (paging, delta) trace encoding the PLC was built with,
+        as recorded in build directory by Generate_plc_debugger.
+        Current project settings may have changed since that build.
+        """
+        if self._TraceMode is None:
+            try:
+                with open(self._getTraceModePath(), 'r') as f:
+                    paging, delta = f.read().strip().split(';')
+                self._TraceMode = (paging == "1", delta == "1")
+            except Exception:
+                # build predates trace modes, decode plain samples
+                self._TraceMode = (False, False)
+        return self._TraceMode
+
     def Generate_plc_debugger(self):
         """
         Generate trace/debug code out of PLC variable list
         """
         self.GetIECProgramsAndVariables()
+        settings = self.GetDebuggerSettings()
 
         # prepare debug code
         variable_decl_array = []
@@ -1116,9 +1293,21 @@ class ProjectController(ConfigTreeNode, PLCControler):
                 for v in self._VariablesList if v["C_path"].find('.') < 0]),
             "variable_decl_array": ",\n".join(variable_decl_array),
             "retain_vardsc_index_array": ",\n".join(retain_indexes),
-            "var_access_code": targets.GetCode("var_access.c")
+            "var_access_code": targets.GetCode("var_access.c"),
+            "trace_buffer_size": settings["TraceBufferSize"],
+            "trace_list_size": settings["TraceListSize"],
+            "trace_paging": "#define TRACE_PAGING" if settings["TracePaging"] else "",
+            "trace_delta": "#define TRACE_DELTA" if settings["TraceDelta"] else "",
+            "trace_ring_slots": settings["TraceRingSlots"],
+            "force_buffer_size": settings["ForceBufferSize"],
+            "force_list_size": settings["ForceListSize"]
         }
 
+        # keep trace encoding along with build, for decoder to follow
+        self._TraceMode = (settings["TracePaging"], settings["TraceDelta"])
+        with open(self._getTraceModePath(), 'w') as f:
+            f.write("%d;%d\n" % self._TraceMode)
+
         return debug_code
 
     def Generate_plc_main(self):
@@ -1549,10 +1738,11 @@ class ProjectController(ConfigTreeNode, PLCControler):
         return updated
 
     def ShowPLCProgress(self, status="", progress=0):
-        self.AppFrame.ProgressStatusBar.Show()
-        self.AppFrame.ConnectionStatusBar.SetStatusText(
-            _(status), 1)
-        self.AppFrame.ProgressStatusBar.SetValue(progress)
+        if self.AppFrame is not None:
+            self.AppFrame.ProgressStatusBar.Show()
+            self.AppFrame.ConnectionStatusBar.SetStatusText(
+                _(status), 1)
+            self.AppFrame.ProgressStatusBar.SetValue(progress)
 
     def HidePLCProgress(self):
         # clear previous_plcstate to restore status
@@ -1573,34 +1763,34 @@ class ProjectController(ConfigTreeNode, PLCControler):
             # self.IECdebug_datas.items()]
             if debug_status == PlcStatus.Started:
                 if len(Traces) > 0:
-                    for debug_tick, debug_buff in Traces:
-                        debug_vars = UnpackDebugBuffer(
-                            debug_buff, self.TracedIECTypes)
-                        if debug_vars is not None:
-                            for IECPath, values_buffer, value in zip(
-                                    self.TracedIECPath,
-                                    self.DebugValuesBuffers,
-                                    debug_vars):
-                                IECdebug_data = self.IECdebug_datas.get(
-                                    IECPath, None)
-                                if IECdebug_data is not None and value is not None:
-                                    forced = (IECdebug_data[2] == "Forced") \
-                                        and (value is not None) and \
-                                        (IECdebug_data[3] is not None)
-
-                                    if not IECdebug_data[4] and len(values_buffer) > 0:
-                                        values_buffer[-1] = (value, forced)
-                                    else:
-                                        values_buffer.append((value, forced))
-                            self.DebugTicks.append(debug_tick)
-                        else:
-                            # complain if trace is incomplete, but only once per debug session
-                            if self.LastComplainDebugToken != self.DebugToken :
-                                self.logger.write_warning(
-                                    _("Debug: target couldn't trace all requested variables.\n"))
-                                self.LastComplainDebugToken = self.DebugToken
-
-
+                    debug_ticks, debug_buffs = list(zip(*Traces))
+                    valid, columns, errors = self.TraceDecoder.DecodeSamples(debug_buffs)
+                    if valid:
+                        for IECPath, values_buffer, values in zip(
+                                self.TracedIECPath,
+                                self.DebugValuesBuffers,
+                                columns):
+                            IECdebug_data = self.IECdebug_datas.get(
+                                IECPath, None)
+                            if IECdebug_data is not None:
+                                forced = (IECdebug_data[2] == "Forced") \
+                                    and (IECdebug_data[3] is not None)
+
+                                if IECdebug_data[4]:
+                                    values_buffer.extend(
+                                        [(value, forced) for value in values])
+                                elif len(values_buffer) > 0:
+                                    values_buffer[-1] = (values[-1], forced)
+                                else:
+                                    values_buffer.append((values[-1], forced))
+                        self.DebugTicks.extend(
+                            [debug_ticks[i] for i in valid])
+                    if errors:
+                        # complain if trace is incomplete, but only once per debug session
+                        if self.LastComplainDebugToken != self.DebugToken :
+                            self.logger.write_warning(
+                                _("Debug: target couldn't trace all requested variables.\n"))
+                            self.LastComplainDebugToken = self.DebugToken
 
         buffers, self.DebugValuesBuffers = (self.DebugValuesBuffers,
                                             [list() for dummy in range(len(self.TracedIECPath))])
@@ -1613,21 +1803,24 @@ class ProjectController(ConfigTreeNode, PLCControler):
         # Connector only can return None
         None : _("Debug: connection problem.\n"),
         # TRACE_LIST_OVERFLOW
-        1 : _("Debug: Too many variables traced. Max 1024.\n"),
+        1 : _("Debug: Too many variables traced. Max {TraceListSize}.\n"),
         # FORCE_LIST_OVERFLOW
-        2 : _("Debug: Too many variables forced. Max 256.\n"),
+        2 : _("Debug: Too many variables forced. Max {ForceListSize}.\n"),
         # FORCE_BUFFER_OVERFLOW
-        3 : _("Debug: Cumulated forced variables size too large. Max 1KB.\n"),
+        3 : _("Debug: Cumulated forced variables size too large. Max {ForceBufferSize} bytes.\n"),
         # FORCE_INVALID
-        3 : _("Debug: Invalid forced value.\n"),
+        4 : _("Debug: Invalid forced value.\n"),
         # DEBUG_SUSPENDED
-        5 : _("Debug: suspended.\n")
+        5 : _("Debug: suspended.\n"),
+        # TRACE_SHADOW_OVERFLOW
+        6 : _("Debug: Traced variables too large for delta mode. Max {TraceBufferSize} bytes.\n")
     }
 
     def RegisterDebugVarToConnector(self):
         Idxs = []
         self.TracedIECPath = []
         self.TracedIECTypes = []
+        self.TraceDecoder = DebugBufferDecoder([])
         if self._connector is not None and self.debug_status != PlcStatus.Broken:
             IECPathsToPop = []
             for IECPath, data_tuple in self.IECdebug_datas.items():
@@ -1657,6 +1850,9 @@ class ProjectController(ConfigTreeNode, PLCControler):
             if Idxs:
                 Idxs.sort()
                 Idxs, self.TracedIECTypes, self.TracedIECPath, Fvalues, = list(zip(*Idxs))
+                paging, delta = self.GetBuildTraceMode()
+                self.TraceDecoder = DebugBufferDecoder(
+                    self.TracedIECTypes, paging, delta)
                 res = self._connector.SetTraceVariablesList(list(zip(Idxs, Fvalues)))
                 if res is not None and res > 0:
                     self.DebugToken = res
@@ -1665,7 +1861,8 @@ class ProjectController(ConfigTreeNode, PLCControler):
                     self.logger.write_warning(
                         self.RegisterDebugVariableErrorCodes.get(
                             -res if res is not None else None,
-                            _("Debug: Unknown error")))
+                            _("Debug: Unknown error")).format(
+                                **self.GetDebuggerSettings()))
             else:
                 self.TracedIECPath = []
                 self._connector.SetTraceVariablesList([])
@@ -1989,24 +2186,53 @@ class ProjectController(ConfigTreeNode, PLCControler):
         # note: this would abord any runing transfer with error
         self._connector.PurgeBlobs()
 
+        def TransferProgress(name):
+            def progress(sent, total, rate):
+                status = _("Transfer {name} : {rate:.1f} KB/s").format(
+                    name=name, rate=rate / 1024)
+                self.ShowPLCProgress(status, sent * 100 // total if total else 100)
+                # let IDE refresh or CLI print progress
+                self.logger.progress(status)
+            return progress
+
         try:
-            # transfer extra files
-            extrafiles = []
-            for extrafilespath in [self._getExtraFilesPath(),
-                                   self._getProjectFilesPath()]:
-
-                for name in os.listdir(extrafilespath):
-                    extrafiles.append((
-                        name,
-                        self._connector.BlobFromFile(
-                            # use file name as a seed to avoid collisions
-                            # with files having same content
-                            os.path.join(extrafilespath, name), name)))
-
-            # Send PLC on target
+            # extra files, using file name as a seed to avoid collisions
+            # with files having same content
+            files = [(os.path.join(extrafilespath, name), name)
+                     for extrafilespath in [self._getExtraFilesPath(),
+                                            self._getProjectFilesPath()]
+                     for name in os.listdir(extrafilespath)]
+
+            # PLC itself, arbitrarily using MD5 as a seed, could be any string
             object_path = builder.GetBinaryPath()
-            # arbitrarily use MD5 as a seed, could be any string
-            object_blob = self._connector.BlobFromFile(object_path, MD5)
+            files.append((object_path, MD5))
+
+            # only send files that target doesn't already have in cache
+            blobs = self._connector.MatchBlobsFromFiles(files)
+            cached = len(files) - blobs.count(None)
+            if cached:
+                self.logger.write(
+                    _("{cached} of {total} files already on target.\n").format(
+                        cached=cached, total=len(files)))
+            # PLC binary is sent as binary delta if target runs
+            # a PLC that was transferred from here
+            if blobs[-1] is None:
+                base = self._FindTransferredBinary(MD5)
+                if base is not None:
+                    basepath, basemd5 = base
+                    blobs[-1] = self._connector.DeltaBlobFromFile(
+                        object_path, MD5, basepath, basemd5,
+                        TransferProgress(_("binary delta")))
+                    if blobs[-1] is not None:
+                        self.logger.write(_("PLC sent as binary delta.\n"))
+
+            for i, ((path, seed), blob) in enumerate(zip(files, blobs)):
+                if blob is None:
+                    blobs[i] = self._connector.BlobFromFile(
+                        path, seed, TransferProgress(os.path.basename(path)))
+
+            object_blob = blobs.pop()
+            extrafiles = [(seed, blob) for (_path, seed), blob in zip(files, blobs)]
         except IOError as e:
             self.HidePLCProgress()
             self.logger.write_error(repr(e))
@@ -2015,6 +2241,7 @@ class ProjectController(ConfigTreeNode, PLCControler):
             self.logger.write(_("PLC data transfered successfully.\n"))
 
             if self._connector.NewPLC(MD5, object_blob, extrafiles):
+                self._KeepTransferredBinary(object_path, MD5)
                 if self.GetIECProgramsAndVariables():
                     self.UnsubscribeAllDebugIECVariable()
                     self.ProgramTransferred()
@@ -2032,6 +2259,45 @@ class ProjectController(ConfigTreeNode, PLCControler):
         wx.CallAfter(self.UpdateMethodsFromPLCStatus)
         return success
 
+    def _FindTransferredBinary(self, MD5):
+        """
+        Look for local copy of PLC binary currently installed on target,
+        among the ones previously transferred.
+        Return (path, md5) or None.
+        """
+        transferred_path = self._getTransferredBinariesPath()
+        if not os.path.isdir(transferred_path):
+            return None
+        candidates = sorted(
+            (entry for entry in os.scandir(transferred_path)
+             if not entry.name.startswith(MD5)),
+            key=lambda entry: entry.stat().st_mtime, reverse=True)
+        for entry in candidates:
+            candidate_md5 = os.path.splitext(entry.name)[0]
+            if self._connector.MatchMD5(candidate_md5):
+                return entry.path, candidate_md5
+        return None
+
+    def _KeepTransferredBinary(self, object_path, MD5):
+        """
+        Keep a copy of installed PLC binary, for next transfer to be sent
+        as a binary delta. Only a few most recent copies are kept.
+        """
+        transferred_path = self._getTransferredBinariesPath()
+        try:
+            if not os.path.isdir(transferred_path):
+                os.mkdir(transferred_path)
+            shutil.copy(object_path, os.path.join(
+                transferred_path, MD5 + os.path.splitext(object_path)[1]))
+            entries = sorted(os.scandir(transferred_path),
+                             key=lambda entry: entry.stat().st_mtime,
+                             reverse=True)
+            for entry in entries[self.TransferredBinariesKept:]:
+                os.remove(entry.path)
+        except OSError:
+            self.logger.write_warning(
+                _("Couldn't keep copy of transferred PLC binary.\n"))
+
     def _Repair(self):
         dialog = wx.MessageDialog(
             self.AppFrame,
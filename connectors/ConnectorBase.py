@@ -4,31 +4,201 @@
 # See COPYING file for copyrights details.
 
 
+import os
 import hashlib
+from tempfile import mkstemp
+from time import time
 from runtime import PlcStatus
+from runtime import blobdelta
 
 
 class ConnectorBase(object):
 
-    chuncksize = 0xfff # 4KB
+    chuncksize = 0xfff # 4KB, used when runtime can't negotiate
+    preferred_chuncksize = 0xf000 # 60KB
+    window = 16 # chunks in flight during blob transfer
 
     PLCObjDefaults = {
         "StartPLC": False,
         "GetTraceVariables": (PlcStatus.Broken, None),
         "GetPLCstatus": (PlcStatus.Broken, None),
         "RemoteExec": (-1, "RemoteExec script failed!"),
-        "GetVersions": "*** Unknown ***"
+        "GetVersions": "*** Unknown ***",
+        "NegotiateChunkSize": None,
+        "MatchCachedBlobs": None,
+        "AppendDeltaToBlob": None,
+        "GetLogMessages": None
     }
 
-    def BlobFromFile(self, filepath, seed):
+    # matched by runtimes that know calls appended to PLCObject interface,
+    # see InterfaceProbeMD5 in runtime/PLCObject.py
+    InterfaceProbeMD5 = "PLCObjectInterface:2"
+    extended_interface = None
+
+    negotiated_chuncksize = None
+
+    log_batch_size = 0xf000 # 60KB, fits in one eRPC message
+
+    def HasExtendedInterface(self):
+        """
+        Tell if runtime knows calls appended to PLCObject interface, that
+        are NegotiateChunkSize, MatchCachedBlobs, AppendDeltaToBlob and
+        GetLogMessages. Older eRPC runtimes can't report an unknown call,
+        so those are only made once runtime matched InterfaceProbeMD5.
+        Asked once per connection, unless call fails.
+        """
+        if self.extended_interface is None:
+            match = self.MatchMD5(self.InterfaceProbeMD5)
+            if match is None:
+                return False
+            self.extended_interface = match
+        return self.extended_interface
+
+    def GetChunkSize(self):
+        """
+        Ask runtime for the biggest chunk it accepts, once per connection.
+        Older runtimes get default chunk size.
+        """
+        if self.negotiated_chuncksize is None:
+            size = None
+            if self.HasExtendedInterface():
+                size = self.NegotiateChunkSize(self.preferred_chuncksize)
+            if not size:
+                return self.chuncksize
+            self.negotiated_chuncksize = size
+        return self.negotiated_chuncksize
+
+    def FetchLogMessages(self, level, msgid, count):
+        """
+        Return up to count log messages of given level, from message msgid
+        backward, newest first, as (msg, tick, tv_sec, tv_nsec). Stops at
+        first message not available anymore, or at first failed call.
+        Messages are fetched in batches, or one by one with older runtimes.
+        """
+        messages = []
+        batched = self.HasExtendedInterface()
+        while len(messages) < count and len(messages) <= msgid:
+            if batched:
+                batch = self.GetLogMessages(
+                    level, msgid - len(messages), count - len(messages),
+                    self.log_batch_size)
+                if batch is None:
+                    # failed call, already reported by connector
+                    break
+            else:
+                message = self.GetLogMessage(level, msgid - len(messages))
+                batch = [] if message is None else [message]
+            if not batch:
+                break
+            messages.extend(batch)
+        return messages
+
+    def AppendChunksToBlob(self, chunks, blobIDs):
+        """
+        Append each chunk to the blob whose ID is at same position in
+        blobIDs, and return resulting blob IDs. Since blobIDs are predicted
+        by caller, connectors able to send several requests before reading
+        replies override this to pipeline the transfer.
+        """
+        newBlobIDs = []
+        for chunk, blobID in zip(chunks, blobIDs):
+            if newBlobIDs and newBlobIDs[-1] != blobID:
+                break
+            newBlobIDs.append(self.AppendChunkToBlob(chunk, blobID))
+        return newBlobIDs
+
+    def MatchBlobsFromFiles(self, files):
+        """
+        Ask runtime in one call if it already has blobs for the given
+        (filepath, seed) files. Return list of blob IDs, with None in
+        place of blobs that still have to be transferred.
+        """
+        if not self.HasExtendedInterface():
+            return [None] * len(files)
+        blobIDs = []
+        for filepath, seed in files:
+            s = hashlib.new('md5')
+            s.update(seed.encode())
+            with open(filepath, "rb") as f:
+                for chunk in iter(lambda: f.read(0x10000), b""):
+                    s.update(chunk)
+            blobIDs.append(s.digest())
+        matches = self.MatchCachedBlobs(
+            [(os.path.basename(filepath), blobID)
+             for (filepath, _seed), blobID in zip(files, blobIDs)])
+        if not matches:
+            return [None] * len(files)
+        return [blobID if match else None
+                for blobID, match in zip(blobIDs, matches)]
+
+    def BlobFromFile(self, filepath, seed, progress=None):
         s = hashlib.new('md5')
         s.update(seed.encode())
         blobID = self.SeedBlob(seed.encode())
+        chunksize = self.GetChunkSize()
         with open(filepath, "rb") as f:
+            f.seek(0, 2)
+            total = f.tell()
+            f.seek(0)
+            sent = 0
+            start = time()
             while blobID == s.digest():
-                chunk = f.read(self.chuncksize)
-                if len(chunk) == 0:
+                # read a window of chunks and compute expected blob IDs
+                # so that chunks can be sent without waiting for replies
+                chunks = []
+                expected = []
+                for _i in range(self.window):
+                    chunk = f.read(chunksize)
+                    if len(chunk) == 0:
+                        break
+                    s.update(chunk)
+                    chunks.append(chunk)
+                    expected.append(s.digest())
+                if not chunks:
                     return blobID
-                blobID = self.AppendChunkToBlob(chunk, blobID)
-                s.update(chunk)
+                blobIDs = self.AppendChunksToBlob(
+                    chunks, [blobID] + expected[:-1])
+                if blobIDs != expected:
+                    break
+                blobID = blobIDs[-1]
+                sent += sum(map(len, chunks))
+                if progress is not None:
+                    elapsed = time() - start
+                    progress(sent, total, sent / elapsed if elapsed else 0)
         raise IOError("Data corrupted during transfer or connection lost")
+
+    def DeltaBlobFromFile(self, filepath, seed, basepath, basemd5, progress=None):
+        """
+        Transfer file as a binary delta against basepath, a local copy of
+        file identified by basemd5 and installed on runtime.
+        Return blob ID, or None if delta isn't worth it or failed.
+        """
+        if not self.HasExtendedInterface():
+            return None
+        with open(basepath, "rb") as f:
+            base = f.read()
+        with open(filepath, "rb") as f:
+            data = f.read()
+        delta = blobdelta.Diff(basemd5, base, data)
+        if len(delta) > len(data) // 2:
+            return None
+
+        fd, deltapath = mkstemp()
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(delta)
+            deltaBlobID = self.BlobFromFile(deltapath, "delta" + seed, progress)
+        finally:
+            os.remove(deltapath)
+
+        s = hashlib.new('md5')
+        s.update(seed.encode())
+        blobID = self.SeedBlob(seed.encode())
+        if blobID != s.digest():
+            return None
+        s.update(data)
+        # runtime rebuilds file and computes blob ID from rebuilt data,
+        # so that checking it validates the whole file end to end
+        if self.AppendDeltaToBlob(deltaBlobID, blobID) != s.digest():
+            return None
+        return s.digest()
@@ -47,8 +47,11 @@ def TranslatedReturnAsLastOutput(translator):
 
 ReturnWrappers = {
     "AppendChunkToBlob":ReturnAsLastOutput,
+    "AppendDeltaToBlob":ReturnAsLastOutput,
     "GetLogMessage":TranslatedReturnAsLastOutput(
         lambda res:(res.msg, res.tick, res.sec, res.nsec)),
+    "GetLogMessages":TranslatedReturnAsLastOutput(
+        lambda res:[(m.msg, m.tick, m.sec, m.nsec) for m in res]),
     "GetPLCID":TranslatedReturnAsLastOutput(
         lambda res:(res.ID, res.PSK)),
     "GetPLCstatus":TranslatedReturnAsLastOutput(
@@ -56,7 +59,9 @@ ReturnWrappers = {
     "GetTraceVariables":TranslatedReturnAsLastOutput(
         lambda res:(enum_to_PLCstatus[res.PLCstatus],
                     [(sample.tick, bytes(sample.TraceBuffer)) for sample in res.traces])),
+    "MatchCachedBlobs":TranslatedReturnAsLastOutput(bytes),
     "MatchMD5":ReturnAsLastOutput,
+    "NegotiateChunkSize":ReturnAsLastOutput,
     "NewPLC":ReturnAsLastOutput,
     "SeedBlob":ReturnAsLastOutput,
     "SetTraceVariablesList": ReturnAsLastOutput,
@@ -64,6 +69,8 @@ ReturnWrappers = {
 }
 
 ArgsWrappers = {
+    "MatchCachedBlobs":
+        lambda blobs: ([extra_file(*f) for f in blobs],),
     "NewPLC":
         lambda md5sum, plcObjectBlobID, extrafiles: (
             md5sum, plcObjectBlobID, [extra_file(*f) for f in extrafiles]),
@@ -108,16 +115,10 @@ def ERPC_connector_factory(uri, confnodesroot):
             'Malformed URI "%s": %s\n' % (uri, str(e)))
         return None
 
-    def rpc_wrapper(method_name):
-        client_method = getattr(BeremizPLCObjectServiceClient, method_name)
-        return_wrapper = ReturnWrappers.get(
-            method_name, 
-            lambda client_method, obj, args_wrapper, *args: client_method(obj, *args_wrapper(*args)))
-        args_wrapper = ArgsWrappers.get(method_name, lambda *x:x)
-
-        def exception_wrapper(self, *args):
+    def exception_wrapper(method_name, func):
+        def wrapper(self, *args):
             try:
-                return return_wrapper(client_method, self, args_wrapper, *args)
+                return func(self, *args)
             except erpc.transport.ConnectionClosed as e:
                 confnodesroot._SetConnector(None)
                 confnodesroot.logger.write_error(_("Connection lost!\n"))
@@ -134,14 +135,69 @@ def ERPC_connector_factory(uri, confnodesroot):
                 confnodesroot._SetConnector(None)
 
             return self.PLCObjDefaults.get(method_name)
-        return exception_wrapper
+        return wrapper
+
+    def rpc_wrapper(method_name):
+        client_method = getattr(BeremizPLCObjectServiceClient, method_name)
+        return_wrapper = ReturnWrappers.get(
+            method_name, 
+            lambda client_method, obj, args_wrapper, *args: client_method(obj, *args_wrapper(*args)))
+        args_wrapper = ArgsWrappers.get(method_name, lambda *x:x)
 
+        return exception_wrapper(
+            method_name,
+            lambda self, *args: return_wrapper(client_method, self, args_wrapper, *args))
+
+    def AppendChunksToBlob(self, chunks, blobIDs):
+        """
+        Pipelined AppendChunkToBlob : all requests are sent before
+        reading any reply, so that transfer isn't bound by latency.
+        Requests are encoded the same way erpcgen generated client does.
+        """
+        manager = self._clientManager
+        requests = []
+        for chunk, blobID in zip(chunks, blobIDs):
+            request = manager.create_request()
+            codec = request.codec
+            codec.start_write_message(erpc.codec.MessageInfo(
+                    type=erpc.codec.MessageType.kInvocationMessage,
+                    service=self.SERVICE_ID,
+                    request=self.APPENDCHUNKTOBLOB_ID,
+                    sequence=request.sequence))
+            codec.write_binary(chunk)
+            codec.write_binary(blobID)
+            manager.transport.send(codec.buffer)
+            requests.append(request)
+
+        # all replies are read, even after a failure, to keep stream in sync
+        newBlobIDs = []
+        failed = None
+        for request in requests:
+            codec = request.codec
+            codec.buffer = manager.transport.receive()
+            info = codec.start_read_message()
+            if info.type != erpc.codec.MessageType.kReplyMessage:
+                raise erpc.client.RequestError("invalid reply message type")
+            if info.sequence != request.sequence:
+                raise erpc.client.RequestError(
+                    "unexpected sequence number in reply (was %d, expected %d)"
+                    % (info.sequence, request.sequence))
+            newBlobID = codec.read_binary()
+            ret = codec.read_uint32()
+            if ret != 0 and failed is None:
+                failed = ret
+            newBlobIDs.append(newBlobID)
+        if failed is not None:
+            raise ExceptionFromERPCReturn(failed)("AppendChunkToBlob")
+        return newBlobIDs
 
     PLCObjectERPCProxy = type(
         "PLCObjectERPCProxy",
         (ConnectorBase, BeremizPLCObjectServiceClient),
-        {name: rpc_wrapper(name)
-            for name,_func in getmembers(IBeremizPLCObjectService, isfunction)})
+        dict({name: rpc_wrapper(name)
+                for name,_func in getmembers(IBeremizPLCObjectService, isfunction)},
+             AppendChunksToBlob=exception_wrapper(
+                "AppendChunksToBlob", AppendChunksToBlob)))
 
     try:
         if IDhash:
@@ -402,6 +402,13 @@ class LogViewer(DebugViewer, wx.Panel):
                 return LogMessage(tv_sec, tv_nsec, level, self.LevelIcons[level], msg)
         return None
 
+    def GetLogMessagesFromSource(self, msgidx, count, level):
+        if self.LogSource is not None:
+            return [LogMessage(tv_sec, tv_nsec, level, self.LevelIcons[level], msg)
+                    for msg, _tick, tv_sec, tv_nsec
+                    in self.LogSource.FetchLogMessages(level, msgidx, count)]
+        return []
+
     def ResetLogCounters(self):
         self.previous_log_count = [None]*LogLevelsCount
 
@@ -414,12 +421,8 @@ class LogViewer(DebugViewer, wx.Panel):
                     oldest_message = (-1, None)
                 else:
                     dump_end = prev - 1
-                for msgidx in range(count-1, dump_end, -1):
-                    new_message = self.GetLogMessageFromSource(msgidx, level)
-                    if new_message is None:
-                        if prev is None:
-                            oldest_message = (-1, None)
-                        break
+                fetched = self.GetLogMessagesFromSource(count-1, count-1-dump_end, level)
+                for msgidx, new_message in zip(range(count-1, dump_end, -1), fetched):
                     if prev is None:
                         oldest_message = (msgidx, new_message)
                         if len(new_messages) == 0:
@@ -428,6 +431,9 @@ class LogViewer(DebugViewer, wx.Panel):
                             new_messages.insert(0, new_message)
                     else:
                         new_messages.insert(0, new_message)
+                if prev is None and len(fetched) < count-1-dump_end:
+                    # older messages aren't available anymore
+                    oldest_message = (-1, None)
                 if prev is None and len(self.OldestMessages) <= level:
                     self.OldestMessages.append(oldest_message)
                 self.previous_log_count[level] = count
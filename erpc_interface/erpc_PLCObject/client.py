@@ -292,4 +292,109 @@ class BeremizPLCObjectServiceClient(interface.IBeremizPLCObjectService):
         _result = codec.read_uint32()
         return _result
 
+    def NegotiateChunkSize(self, chunkSize, negotiatedChunkSize):
+        assert type(negotiatedChunkSize) is erpc.Reference, "out parameter must be a Reference object"
+
+        # Build remote function invocation message.
+        request = self._clientManager.create_request()
+        codec = request.codec
+        codec.start_write_message(erpc.codec.MessageInfo(
+                type=erpc.codec.MessageType.kInvocationMessage,
+                service=self.SERVICE_ID,
+                request=self.NEGOTIATECHUNKSIZE_ID,
+                sequence=request.sequence))
+        if chunkSize is None:
+            raise ValueError("chunkSize is None")
+        codec.write_uint32(chunkSize)
+
+        # Send request and process reply.
+        self._clientManager.perform_request(request)
+        negotiatedChunkSize.value = codec.read_uint32()
+        _result = codec.read_uint32()
+        return _result
+
+    def MatchCachedBlobs(self, blobs, matches):
+        assert type(matches) is erpc.Reference, "out parameter must be a Reference object"
+
+        # Build remote function invocation message.
+        request = self._clientManager.create_request()
+        codec = request.codec
+        codec.start_write_message(erpc.codec.MessageInfo(
+                type=erpc.codec.MessageType.kInvocationMessage,
+                service=self.SERVICE_ID,
+                request=self.MATCHCACHEDBLOBS_ID,
+                sequence=request.sequence))
+        if blobs is None:
+            raise ValueError("blobs is None")
+        codec.start_write_list(len(blobs))
+        for _i0 in blobs:
+            _i0._write(codec)
+
+
+        # Send request and process reply.
+        self._clientManager.perform_request(request)
+        matches.value = codec.read_binary()
+        _result = codec.read_uint32()
+        return _result
+
+    def AppendDeltaToBlob(self, deltaBlobID, blobID, newBlobID):
+        assert type(newBlobID) is erpc.Reference, "out parameter must be a Reference object"
+
+        # Build remote function invocation message.
+        request = self._clientManager.create_request()
+        codec = request.codec
+        codec.start_write_message(erpc.codec.MessageInfo(
+                type=erpc.codec.MessageType.kInvocationMessage,
+                service=self.SERVICE_ID,
+                request=self.APPENDDELTATOBLOB_ID,
+                sequence=request.sequence))
+        if deltaBlobID is None:
+            raise ValueError("deltaBlobID is None")
+        codec.write_binary(deltaBlobID)
+        if blobID is None:
+            raise ValueError("blobID is None")
+        codec.write_binary(blobID)
+
+        # Send request and process reply.
+        self._clientManager.perform_request(request)
+        newBlobID.value = codec.read_binary()
+        _result = codec.read_uint32()
+        return _result
+
+
+    def GetLogMessages(self, level, msgID, maxCount, maxBytes, messages):
+        assert type(messages) is erpc.Reference, "out parameter must be a Reference object"
+
+        # Build remote function invocation message.
+        request = self._clientManager.create_request()
+        codec = request.codec
+        codec.start_write_message(erpc.codec.MessageInfo(
+                type=erpc.codec.MessageType.kInvocationMessage,
+                service=self.SERVICE_ID,
+                request=self.GETLOGMESSAGES_ID,
+                sequence=request.sequence))
+        if level is None:
+            raise ValueError("level is None")
+        codec.write_uint8(level)
+        if msgID is None:
+            raise ValueError("msgID is None")
+        codec.write_uint32(msgID)
+        if maxCount is None:
+            raise ValueError("maxCount is None")
+        codec.write_uint32(maxCount)
+        if maxBytes is None:
+            raise ValueError("maxBytes is None")
+        codec.write_uint32(maxBytes)
+
+        # Send request and process reply.
+        self._clientManager.perform_request(request)
+        _n0 = codec.start_read_list()
+        messages.value = []
+        for _i0 in range(_n0):
+            _v0 = common.log_message()._read(codec)
+            messages.value.append(_v0)
+
+        _result = codec.read_uint32()
+        return _result
+
 
@@ -21,6 +21,10 @@ class IBeremizPLCObjectService(object):
     SETTRACEVARIABLESLIST_ID = 12
     STARTPLC_ID = 13
     STOPPLC_ID = 14
+    NEGOTIATECHUNKSIZE_ID = 15
+    MATCHCACHEDBLOBS_ID = 16
+    APPENDDELTATOBLOB_ID = 17
+    GETLOGMESSAGES_ID = 18
 
     def AppendChunkToBlob(self, data, blobID, newBlobID):
         raise NotImplementedError()
@@ -64,4 +68,16 @@ class IBeremizPLCObjectService(object):
     def StopPLC(self, success):
         raise NotImplementedError()
 
+    def NegotiateChunkSize(self, chunkSize, negotiatedChunkSize):
+        raise NotImplementedError()
+
+    def MatchCachedBlobs(self, blobs, matches):
+        raise NotImplementedError()
+
+    def AppendDeltaToBlob(self, deltaBlobID, blobID, newBlobID):
+        raise NotImplementedError()
+
+    def GetLogMessages(self, level, msgID, maxCount, maxBytes, messages):
+        raise NotImplementedError()
+
 
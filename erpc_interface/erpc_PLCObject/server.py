@@ -27,6 +27,10 @@ class BeremizPLCObjectServiceService(erpc.server.Service):
                 interface.IBeremizPLCObjectService.SETTRACEVARIABLESLIST_ID: self._handle_SetTraceVariablesList,
                 interface.IBeremizPLCObjectService.STARTPLC_ID: self._handle_StartPLC,
                 interface.IBeremizPLCObjectService.STOPPLC_ID: self._handle_StopPLC,
+                interface.IBeremizPLCObjectService.NEGOTIATECHUNKSIZE_ID: self._handle_NegotiateChunkSize,
+                interface.IBeremizPLCObjectService.MATCHCACHEDBLOBS_ID: self._handle_MatchCachedBlobs,
+                interface.IBeremizPLCObjectService.APPENDDELTATOBLOB_ID: self._handle_AppendDeltaToBlob,
+                interface.IBeremizPLCObjectService.GETLOGMESSAGES_ID: self._handle_GetLogMessages,
             }
 
     def _handle_AppendChunkToBlob(self, sequence, codec):
@@ -348,4 +352,113 @@ class BeremizPLCObjectServiceService(erpc.server.Service):
         codec.write_bool(success.value)
         codec.write_uint32(_result)
 
+    def _handle_NegotiateChunkSize(self, sequence, codec):
+        # Create reference objects to pass into handler for out/inout parameters.
+        negotiatedChunkSize = erpc.Reference()
+
+        # Read incoming parameters.
+        chunkSize = codec.read_uint32()
+
+        # Invoke user implementation of remote function.
+        _result = self._handler.NegotiateChunkSize(chunkSize, negotiatedChunkSize)
+
+        # Prepare codec for reply message.
+        codec.reset()
+
+        # Construct reply message.
+        codec.start_write_message(erpc.codec.MessageInfo(
+            type=erpc.codec.MessageType.kReplyMessage,
+            service=interface.IBeremizPLCObjectService.SERVICE_ID,
+            request=interface.IBeremizPLCObjectService.NEGOTIATECHUNKSIZE_ID,
+            sequence=sequence))
+        if negotiatedChunkSize.value is None:
+            raise ValueError("negotiatedChunkSize.value is None")
+        codec.write_uint32(negotiatedChunkSize.value)
+        codec.write_uint32(_result)
+
+    def _handle_MatchCachedBlobs(self, sequence, codec):
+        # Create reference objects to pass into handler for out/inout parameters.
+        matches = erpc.Reference()
+
+        # Read incoming parameters.
+        _n0 = codec.start_read_list()
+        blobs = []
+        for _i0 in range(_n0):
+            _v0 = common.extra_file()._read(codec)
+            blobs.append(_v0)
+
+
+        # Invoke user implementation of remote function.
+        _result = self._handler.MatchCachedBlobs(blobs, matches)
+
+        # Prepare codec for reply message.
+        codec.reset()
+
+        # Construct reply message.
+        codec.start_write_message(erpc.codec.MessageInfo(
+            type=erpc.codec.MessageType.kReplyMessage,
+            service=interface.IBeremizPLCObjectService.SERVICE_ID,
+            request=interface.IBeremizPLCObjectService.MATCHCACHEDBLOBS_ID,
+            sequence=sequence))
+        if matches.value is None:
+            raise ValueError("matches.value is None")
+        codec.write_binary(matches.value)
+        codec.write_uint32(_result)
+
+    def _handle_AppendDeltaToBlob(self, sequence, codec):
+        # Create reference objects to pass into handler for out/inout parameters.
+        newBlobID = erpc.Reference()
+
+        # Read incoming parameters.
+        deltaBlobID = codec.read_binary()
+        blobID = codec.read_binary()
+
+        # Invoke user implementation of remote function.
+        _result = self._handler.AppendDeltaToBlob(deltaBlobID, blobID, newBlobID)
+
+        # Prepare codec for reply message.
+        codec.reset()
+
+        # Construct reply message.
+        codec.start_write_message(erpc.codec.MessageInfo(
+            type=erpc.codec.MessageType.kReplyMessage,
+            service=interface.IBeremizPLCObjectService.SERVICE_ID,
+            request=interface.IBeremizPLCObjectService.APPENDDELTATOBLOB_ID,
+            sequence=sequence))
+        if newBlobID.value is None:
+            raise ValueError("newBlobID.value is None")
+        codec.write_binary(newBlobID.value)
+        codec.write_uint32(_result)
+
+
+    def _handle_GetLogMessages(self, sequence, codec):
+        # Create reference objects to pass into handler for out/inout parameters.
+        messages = erpc.Reference()
+
+        # Read incoming parameters.
+        level = codec.read_uint8()
+        msgID = codec.read_uint32()
+        maxCount = codec.read_uint32()
+        maxBytes = codec.read_uint32()
+
+        # Invoke user implementation of remote function.
+        _result = self._handler.GetLogMessages(level, msgID, maxCount, maxBytes, messages)
+
+        # Prepare codec for reply message.
+        codec.reset()
+
+        # Construct reply message.
+        codec.start_write_message(erpc.codec.MessageInfo(
+            type=erpc.codec.MessageType.kReplyMessage,
+            service=interface.IBeremizPLCObjectService.SERVICE_ID,
+            request=interface.IBeremizPLCObjectService.GETLOGMESSAGES_ID,
+            sequence=sequence))
+        if messages.value is None:
+            raise ValueError("messages.value is None")
+        codec.start_write_list(len(messages.value))
+        for _i0 in messages.value:
+            _i0._write(codec)
+
+        codec.write_uint32(_result)
+
 
@@ -81,6 +81,22 @@ class OPCUAClient(object):
                 </xsd:choice>
               </xsd:complexType>
             </xsd:element>
+            <xsd:element name="ExchangeMode" minOccurs="0">
+              <xsd:annotation>
+                <xsd:documentation>Default to PerVariable if not specified</xsd:documentation>
+              </xsd:annotation>
+              <xsd:complexType>
+                <xsd:choice minOccurs="0">
+                  <xsd:element name="PerVariable"/>
+                  <xsd:element name="Batched"/>
+                  <xsd:element name="Subscription">
+                    <xsd:complexType>
+                      <xsd:attribute name="PublishingInterval" type="xsd:integer" use="optional" default="100"/>
+                    </xsd:complexType>
+                  </xsd:element>
+                </xsd:choice>
+              </xsd:complexType>
+            </xsd:element>
           </xsd:sequence>
           <xsd:attribute name="Server_URI" type="xsd:string" use="optional" default="opc.tcp://"""+OPCUA_DEFAULT_HOST+""":4840"/>
         </xsd:complexType>
@@ -125,6 +141,11 @@ class OPCUAClient(object):
                     value = os.path.join(self.GetCTRoot()._getProjectFilesPath(), value)
                 res[name] = value
 
+        ExchangeMode = cfg("ExchangeMode")
+        res["ExchangeMode"] = ExchangeMode
+        if ExchangeMode == "Subscription":
+            res["PublishingInterval"] = cfg("ExchangeMode.PublishingInterval")
+
         return res
 
     def GetFileName(self):
@@ -618,19 +618,6 @@ loadFile(const char *const path) {{
 static UA_Client *client;
 static UA_ClientConfig *cc;
 
-#define DECL_VAR(ua_type, C_type, c_loc_name)                                                       \\
-static UA_Variant c_loc_name##_variant;                                                             \\
-static C_type c_loc_name##_buf = 0;                                                                 \\
-C_type *c_loc_name = &c_loc_name##_buf;
-
-{decl}
-
-void __cleanup_{locstr}(void)
-{{
-    UA_Client_disconnect(client);
-    UA_Client_delete(client);
-}}
-
 #define INIT_NoAuth()                                                                              \\
     LogInfo("OPC-UA Init no auth");                                                                \\
     UA_ClientConfig_setDefault(cc);                                                                \\
@@ -684,6 +671,21 @@ void __cleanup_{locstr}(void)
     UA_ClientConfig_setDefault(cc);                                                                \\
     retval = UA_Client_connectUsername(client, uri, User, Password);
 
+"""
+
+        per_variable_template = """#define DECL_VAR(ua_type, C_type, c_loc_name)                                                       \\
+static UA_Variant c_loc_name##_variant;                                                             \\
+static C_type c_loc_name##_buf = 0;                                                                 \\
+C_type *c_loc_name = &c_loc_name##_buf;
+
+{decl}
+
+void __cleanup_{locstr}(void)
+{{
+    UA_Client_disconnect(client);
+    UA_Client_delete(client);
+}}
+
 #define INIT_READ_VARIANT(ua_type, c_loc_name)                                                     \\
     UA_Variant_init(&c_loc_name##_variant);
 
@@ -731,7 +733,304 @@ void __publish_{locstr}(void)
 }}
 
 """
-        
+
+        # Batched and Subscription modes : OPC-UA services are invoked by a
+        # client thread, woken up at the end of each PLC cycle. Values are
+        # exchanged with PLC through a double buffered area, "_buf" being
+        # PLC side and "_net" being client thread side, each direction
+        # being locked with AtomicCompareExchange. PLC thread never waits
+        # for lock : exchange is postponed to next cycle if client thread
+        # owns it.
+        exchange_template = """#include <pthread.h>
+#include <open62541/client_subscriptions.h>
+
+#define SUBSCRIPTION_MODE {subscription_mode}
+#define PUBLISHING_INTERVAL {publishing_interval}
+#define INPUTS_COUNT {inputs_count}
+#define OUTPUTS_COUNT {outputs_count}
+
+static long input_lock = 0;
+static long output_lock = 0;
+static int inputs_fresh = 0;
+static int outputs_dirty = 0;
+
+#define LOCK_FROM_PLC(lock) (AtomicCompareExchange(&lock, 0, 1) == 0)
+#define LOCK_FROM_CLIENT(lock) while(AtomicCompareExchange(&lock, 0, 1)) nRT_reschedule();
+#define UNLOCK(lock) AtomicCompareExchange(&lock, 1, 0);
+
+static pthread_t client_thread;
+static pthread_mutex_t wakeup_mutex = PTHREAD_MUTEX_INITIALIZER;
+static pthread_cond_t wakeup_cond = PTHREAD_COND_INITIALIZER;
+static int wakeup_pending = 0;
+static int client_running = 0;
+
+static UA_ReadValueId read_ids[{inputs_size}];
+static UA_MonitoredItemCreateRequest monitored_items[{inputs_size}];
+static UA_Client_DataChangeNotificationCallback datachange_callbacks[{inputs_size}];
+static void *datachange_contexts[{inputs_size}];
+static UA_Client_DeleteMonitoredItemCallback delete_callbacks[{inputs_size}];
+
+static UA_WriteValue write_values[{outputs_size}];
+static int output_changed[{outputs_size}];
+
+#define STORE_VALUE(ua_type, ua_type_enum, c_loc_name, data_value)                                 \\
+    if((data_value)->hasValue && UA_Variant_isScalar(&(data_value)->value) &&                      \\
+       (data_value)->value.type == &UA_TYPES[ua_type_enum]) {{                                     \\
+        c_loc_name##_net = *(ua_type*)(data_value)->value.data;                                    \\
+    }}
+
+#define DECL_INPUT(ua_type, ua_type_enum, C_type, c_loc_name)                                      \\
+static C_type c_loc_name##_buf = 0;                                                                \\
+static C_type c_loc_name##_net = 0;                                                                \\
+C_type *c_loc_name = &c_loc_name##_buf;                                                            \\
+static void c_loc_name##_datachange(UA_Client *_client, UA_UInt32 subId, void *subContext,         \\
+                                    UA_UInt32 monId, void *monContext, UA_DataValue *value) {{     \\
+    LOCK_FROM_CLIENT(input_lock)                                                                   \\
+    STORE_VALUE(ua_type, ua_type_enum, c_loc_name, value)                                          \\
+    inputs_fresh = 1;                                                                              \\
+    UNLOCK(input_lock)                                                                             \\
+}}
+
+#define DECL_OUTPUT(ua_type, C_type, c_loc_name)                                                   \\
+static C_type c_loc_name##_buf = 0;                                                                \\
+static C_type c_loc_name##_net = 0;                                                                \\
+C_type *c_loc_name = &c_loc_name##_buf;
+
+{decl}
+
+#define INIT_INPUT(index, c_loc_name, ua_nodeid_type, ua_nsidx, ua_node_id)                        \\
+    UA_ReadValueId_init(&read_ids[index]);                                                         \\
+    read_ids[index].nodeId = ua_nodeid_type(ua_nsidx, ua_node_id);                                 \\
+    read_ids[index].attributeId = UA_ATTRIBUTEID_VALUE;                                            \\
+    monitored_items[index] = UA_MonitoredItemCreateRequest_default(read_ids[index].nodeId);        \\
+    monitored_items[index].requestedParameters.samplingInterval = PUBLISHING_INTERVAL;             \\
+    datachange_callbacks[index] = c_loc_name##_datachange;
+
+#define INIT_OUTPUT(index, ua_type, ua_type_enum, c_loc_name, ua_nodeid_type, ua_nsidx, ua_node_id) \\
+    UA_WriteValue_init(&write_values[index]);                                                      \\
+    write_values[index].nodeId = ua_nodeid_type(ua_nsidx, ua_node_id);                             \\
+    write_values[index].attributeId = UA_ATTRIBUTEID_VALUE;                                        \\
+    write_values[index].value.hasValue = true;                                                     \\
+    UA_Variant_setScalar(&write_values[index].value.value, &c_loc_name##_net,                      \\
+                         &UA_TYPES[ua_type_enum]);                                                 \\
+    /* initial value is written even if PLC doesn't change it */                                   \\
+    output_changed[index] = 1;                                                                     \\
+    outputs_dirty = 1;
+
+/* Single Read service request for all inputs */
+static void read_inputs(void)
+{{
+    UA_ReadRequest request;
+    UA_ReadResponse response;
+
+    if(INPUTS_COUNT == 0)
+        return;
+
+    UA_ReadRequest_init(&request);
+    request.nodesToRead = read_ids;
+    request.nodesToReadSize = INPUTS_COUNT;
+    request.timestampsToReturn = UA_TIMESTAMPSTORETURN_NEITHER;
+    response = UA_Client_Service_read(client, request);
+
+    if(response.responseHeader.serviceResult == UA_STATUSCODE_GOOD &&
+       response.resultsSize == INPUTS_COUNT) {{
+        UA_DataValue *results = response.results;
+        LOCK_FROM_CLIENT(input_lock)
+{store}
+        inputs_fresh = 1;
+        UNLOCK(input_lock)
+    }}
+    UA_ReadResponse_clear(&response);
+}}
+
+/* Single subscription with one MonitoredItem per input */
+static UA_StatusCode subscribe_inputs(void)
+{{
+    UA_StatusCode retval;
+    UA_CreateSubscriptionRequest sub_request;
+    UA_CreateSubscriptionResponse sub_response;
+    UA_CreateMonitoredItemsRequest request;
+    UA_CreateMonitoredItemsResponse response;
+    size_t i;
+
+    if(INPUTS_COUNT == 0)
+        return UA_STATUSCODE_GOOD;
+
+    sub_request = UA_CreateSubscriptionRequest_default();
+    sub_request.requestedPublishingInterval = PUBLISHING_INTERVAL;
+    sub_response = UA_Client_Subscriptions_create(client, sub_request, NULL, NULL, NULL);
+    retval = sub_response.responseHeader.serviceResult;
+    if(retval != UA_STATUSCODE_GOOD)
+        return retval;
+
+    UA_CreateMonitoredItemsRequest_init(&request);
+    request.subscriptionId = sub_response.subscriptionId;
+    request.timestampsToReturn = UA_TIMESTAMPSTORETURN_NEITHER;
+    request.itemsToCreate = monitored_items;
+    request.itemsToCreateSize = INPUTS_COUNT;
+    response = UA_Client_MonitoredItems_createDataChanges(
+        client, request, datachange_contexts, datachange_callbacks, delete_callbacks);
+
+    retval = response.responseHeader.serviceResult;
+    if(retval == UA_STATUSCODE_GOOD) {{
+        for(i = 0; i < response.resultsSize; i++) {{
+            if(response.results[i].statusCode != UA_STATUSCODE_GOOD)
+                LogWarning("OPC-UA could not monitor input %d : %s", (int)i,
+                           UA_StatusCode_name(response.results[i].statusCode));
+        }}
+    }}
+    UA_CreateMonitoredItemsResponse_clear(&response);
+    return retval;
+}}
+
+/* Single Write service request for all outputs changed by PLC */
+static void write_outputs(void)
+{{
+    UA_WriteValue to_write[{outputs_size}];
+    int written[{outputs_size}];
+    size_t count = 0;
+    size_t i;
+
+    LOCK_FROM_CLIENT(output_lock)
+    if(outputs_dirty) {{
+        for(i = 0; i < OUTPUTS_COUNT; i++) {{
+            if(output_changed[i]) {{
+                written[count] = i;
+                to_write[count++] = write_values[i];
+                output_changed[i] = 0;
+            }}
+        }}
+        outputs_dirty = 0;
+    }}
+    if(count) {{
+        UA_WriteRequest request;
+        UA_WriteResponse response;
+
+        UA_WriteRequest_init(&request);
+        request.nodesToWrite = to_write;
+        request.nodesToWriteSize = count;
+        /* "_net" values are referenced by request, lock is kept meanwhile */
+        response = UA_Client_Service_write(client, request);
+        if(response.responseHeader.serviceResult != UA_STATUSCODE_GOOD) {{
+            /* try again on next cycle */
+            for(i = 0; i < count; i++)
+                output_changed[written[i]] = 1;
+            outputs_dirty = 1;
+        }}
+        UA_WriteResponse_clear(&response);
+    }}
+    UNLOCK(output_lock)
+}}
+
+static void *client_thread_proc(void *arg)
+{{
+    pthread_mutex_lock(&wakeup_mutex);
+    while(client_running) {{
+        if(!wakeup_pending) {{
+            pthread_cond_wait(&wakeup_cond, &wakeup_mutex);
+            continue;
+        }}
+        wakeup_pending = 0;
+        pthread_mutex_unlock(&wakeup_mutex);
+
+        if(SUBSCRIPTION_MODE)
+            /* process publish responses, data change callbacks are called */
+            UA_Client_run_iterate(client, 0);
+        else
+            read_inputs();
+        write_outputs();
+
+        pthread_mutex_lock(&wakeup_mutex);
+    }}
+    pthread_mutex_unlock(&wakeup_mutex);
+    return NULL;
+}}
+
+void __cleanup_{locstr}(void)
+{{
+    if(client_running) {{
+        pthread_mutex_lock(&wakeup_mutex);
+        client_running = 0;
+        pthread_cond_signal(&wakeup_cond);
+        pthread_mutex_unlock(&wakeup_mutex);
+        pthread_join(client_thread, NULL);
+    }}
+    UA_Client_disconnect(client);
+    UA_Client_delete(client);
+}}
+
+int __init_{locstr}(int argc,char **argv)
+{{
+    UA_StatusCode retval;
+    client = UA_Client_new();
+    cc = UA_Client_getConfig(client);
+    char *uri = "{uri}";
+{init}
+
+    if(retval == UA_STATUSCODE_GOOD && SUBSCRIPTION_MODE)
+        retval = subscribe_inputs();
+
+    if(retval != UA_STATUSCODE_GOOD) {{
+        LogError("OPC-UA Init Failed %d", retval);
+        UA_Client_delete(client);
+        return EXIT_FAILURE;
+    }}
+
+    client_running = 1;
+    if(pthread_create(&client_thread, NULL, client_thread_proc, NULL)) {{
+        LogError("OPC-UA could not create client thread");
+        client_running = 0;
+        UA_Client_disconnect(client);
+        UA_Client_delete(client);
+        return EXIT_FAILURE;
+    }}
+    return 0;
+}}
+
+#define RETRIEVE_VALUE(c_loc_name)                                                                 \\
+    c_loc_name##_buf = c_loc_name##_net;
+
+void __retrieve_{locstr}(void)
+{{
+    if(LOCK_FROM_PLC(input_lock)) {{
+        if(inputs_fresh) {{
+{retrieve}
+            inputs_fresh = 0;
+        }}
+        UNLOCK(input_lock)
+    }}
+}}
+
+#define PUBLISH_VALUE(index, c_loc_name)                                                           \\
+    if(c_loc_name##_net != c_loc_name##_buf) {{                                                    \\
+        c_loc_name##_net = c_loc_name##_buf;                                                       \\
+        output_changed[index] = 1;                                                                 \\
+        outputs_dirty = 1;                                                                         \\
+    }}
+
+void __publish_{locstr}(void)
+{{
+    if(LOCK_FROM_PLC(output_lock)) {{
+{publish}
+        UNLOCK(output_lock)
+    }}
+
+    /* wake up client thread without blocking, wakeup is
+       postponed to next cycle if client thread owns mutex */
+    if(pthread_mutex_trylock(&wakeup_mutex) == 0) {{
+        wakeup_pending = 1;
+        pthread_cond_signal(&wakeup_cond);
+        pthread_mutex_unlock(&wakeup_mutex);
+    }}
+}}
+
+"""
+
+        ExchangeMode = config.get("ExchangeMode")
+        exchanged = ExchangeMode in ["Batched", "Subscription"]
+        inputs_count = len(self["input"])
+        outputs_count = len(self["output"])
+
         formatdict = dict(
             locstr   = locstr,
             uri      = config["URI"],
@@ -739,7 +1038,15 @@ void __publish_{locstr}(void)
             cleanup  = "",
             init     = "",
             retrieve = "",
-            publish  = "" 
+            publish  = "",
+            store    = "",
+            subscription_mode   = int(ExchangeMode == "Subscription"),
+            publishing_interval = config.get("PublishingInterval") or 100,
+            inputs_count  = inputs_count,
+            outputs_count = outputs_count,
+            # avoid zero length arrays
+            inputs_size   = max(inputs_count, 1),
+            outputs_size  = max(outputs_count, 1)
         )
 
         AuthType = config["AuthType"]
@@ -756,13 +1063,34 @@ void __publish_{locstr}(void)
 
         for direction, data in self.items():
             iec_direction_prefix = {"input": "__I", "output": "__Q"}[direction]
-            for row in data:
+            for index, row in enumerate(data):
                 name, ua_nsidx, ua_nodeid_type, _ua_node_id, ua_type, iec_number = row
                 iec_type, C_type, iec_size_prefix, ua_type_enum, ua_type = UA_IEC_types[ua_type]
                 c_loc_name = iec_direction_prefix + iec_size_prefix + locstr + "_" + str(iec_number)
                 ua_nodeid_type, id_formating = UA_NODE_ID_types[ua_nodeid_type]
                 ua_node_id = id_formating.format(_ua_node_id)
 
+                if exchanged:
+                    if direction == "input":
+                        formatdict["decl"] += """
+DECL_INPUT({ua_type}, {ua_type_enum}, {C_type}, {c_loc_name})""".format(**locals())
+                        formatdict["init"] += """
+    INIT_INPUT({index}, {c_loc_name}, {ua_nodeid_type}, {ua_nsidx}, {ua_node_id})""".format(**locals())
+                        formatdict["store"] += """
+        STORE_VALUE({ua_type}, {ua_type_enum}, {c_loc_name}, &results[{index}])""".format(**locals())
+                        formatdict["retrieve"] += """
+            RETRIEVE_VALUE({c_loc_name})""".format(**locals())
+
+                    if direction == "output":
+                        formatdict["decl"] += """
+DECL_OUTPUT({ua_type}, {C_type}, {c_loc_name})""".format(**locals())
+                        formatdict["init"] += """
+    INIT_OUTPUT({index}, {ua_type}, {ua_type_enum}, {c_loc_name}, {ua_nodeid_type}, {ua_nsidx}, {ua_node_id})""".format(**locals())
+                        formatdict["publish"] += """
+        PUBLISH_VALUE({index}, {c_loc_name})""".format(**locals())
+
+                    continue
+
                 formatdict["decl"] += """
 DECL_VAR({ua_type}, {C_type}, {c_loc_name})""".format(**locals())
 
@@ -778,6 +1106,8 @@ DECL_VAR({ua_type}, {C_type}, {c_loc_name})""".format(**locals())
                     formatdict["publish"] += """
     WRITE_VALUE({ua_type}, {c_loc_name}, {ua_nodeid_type}, {ua_nsidx}, {ua_node_id})""".format(**locals())
 
+        template += exchange_template if exchanged else per_variable_template
+
         Ccode = template.format(**formatdict)
         
         return Ccode
@@ -29,4 +29,4 @@
 
 from . plcopen import \
     PLCOpenParser, LoadProject, SaveProject, LoadPou, \
-    LoadPouInstances, VarOrder, QualifierList, rect
+    LoadPouInstances, VarOrder, QualifierList, rect, ReleaseIndexedBodies
@@ -25,7 +25,8 @@
 
 
 import re
-from collections import OrderedDict
+from collections import OrderedDict, deque
+from weakref import WeakKeyDictionary
 
 from lxml import etree
 
@@ -1817,9 +1818,27 @@ if cls:
 # ----------------------------------------------------------------------
 
 
+# lxml returns the same python proxy for an element as long as that proxy
+# is alive. Last indexed bodies of a document are kept alive so that their
+# localId index survives between editing calls, that each get body from
+# project again. They are held by document root proxy, and released with it
+# when project is closed or reloaded.
+indexed_bodies = WeakKeyDictionary()
+
+
+def ReleaseIndexedBodies(root):
+    """
+    Release bodies kept alive for their localId index, in document of root
+    """
+    if root is not None:
+        indexed_bodies.pop(root, None)
+
+
 def _updateBodyClass(cls):
     cls.currentExecutionOrderId = 0
     cls.checkedBlocksDict = {}
+    # localId -> instance index, lives as long as body element proxy
+    cls.instancesByIdIndex = None
 
     def resetcurrentExecutionOrderId(self):
         object.__setattr__(self, "currentExecutionOrderId", 0)
@@ -1900,6 +1919,7 @@ def _updateBodyClass(cls):
     def appendcontentInstance(self, instance):
         if self.content.getLocalTag() in ["LD", "FBD", "SFC"]:
             self.content.appendcontent(instance)
+            self.resetcontentInstancesIndex()
         else:
             raise TypeError(_("%s body don't have instances!") % self.content.getLocalTag())
     setattr(cls, "appendcontentInstance", appendcontentInstance)
@@ -1911,15 +1931,45 @@ def _updateBodyClass(cls):
             raise TypeError(_("%s body don't have instances!") % self.content.getLocalTag())
     setattr(cls, "getcontentInstances", getcontentInstances)
 
-    instance_by_id_xpath = PLCOpen_XPath("*[@localId=$localId]")
     instance_by_name_xpath = PLCOpen_XPath("ppx:block[@instanceName=$name]")
 
+    def resetcontentInstancesIndex(self):
+        object.__setattr__(self, "instancesByIdIndex", None)
+    setattr(cls, "resetcontentInstancesIndex", resetcontentInstancesIndex)
+
+    def buildcontentInstancesIndex(self):
+        content = self.content
+        index = {}
+        for instance in content:
+            index.setdefault(instance.getlocalId(), instance)
+        # instances count tells if index may miss some instances
+        index = (index, len(content))
+        object.__setattr__(self, "instancesByIdIndex", index)
+        root = self.getroottree().getroot()
+        bodies = indexed_bodies.get(root)
+        if bodies is None:
+            bodies = indexed_bodies[root] = deque(maxlen=16)
+        if self not in bodies:
+            bodies.append(self)
+        return index
+    setattr(cls, "buildcontentInstancesIndex", buildcontentInstancesIndex)
+
     def getcontentInstance(self, local_id):
         if self.content.getLocalTag() in ["LD", "FBD", "SFC"]:
-            instance = instance_by_id_xpath(self.content, localId=local_id)
-            if len(instance) > 0:
-                return instance[0]
-            return None
+            index = self.instancesByIdIndex
+            if index is None:
+                index = self.buildcontentInstancesIndex()
+            instances, count = index
+            instance = instances.get(local_id)
+            if instance is not None:
+                # instance may have been removed or renumbered since
+                if instance.getparent() is self.content and \
+                   instance.getlocalId() == local_id:
+                    return instance
+            elif count == len(self.content):
+                return None
+            instances, count = self.buildcontentInstancesIndex()
+            return instances.get(local_id)
         else:
             raise TypeError(_("%s body don't have instances!") % self.content.getLocalTag())
     setattr(cls, "getcontentInstance", getcontentInstance)
@@ -1944,9 +1994,10 @@ def _updateBodyClass(cls):
 
     def removecontentInstance(self, local_id):
         if self.content.getLocalTag() in ["LD", "FBD", "SFC"]:
-            instance = instance_by_id_xpath(self.content, localId=local_id)
-            if len(instance) > 0:
-                self.content.remove(instance[0])
+            instance = self.getcontentInstance(local_id)
+            if instance is not None:
+                self.content.remove(instance)
+                self.resetcontentInstancesIndex()
             else:
                 raise ValueError(_("Instance with id %d doesn't exist!") % id)
         else:
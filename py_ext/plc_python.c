@@ -43,6 +43,11 @@ int TryLockPython(void);
 void UnLockPython(void);
 void LockPython(void);
 
+/* Number of threads runtime uses to evaluate python code concurrently,
+ * with PythonEvalFetch and PythonEvalAnswer. 0 means sequential
+ * evaluation, in fifo order, with PythonIterator */
+int PythonEvalPoolSize = %(python_eval_pool_size)d;
+
 int __init_py_ext()
 {
 	int i;
@@ -156,42 +161,33 @@ void __PythonEvalFB(int poll, PYTHON_EVAL* data__)
 	}
 }
 
-char* PythonIterator(char* result, void** id)
+/* Store evaluation result in FB buffer, python mutex must be owned */
+static void StorePythonResult(PYTHON_EVAL* data__, char* result)
 {
-	char* next_command;
-	PYTHON_EVAL* data__;
-	//printf("PythonIterator result %%s\n", result);
-    /*emergency exit*/
-    if(PythonState & PYTHON_FINISHED) return NULL;
-	/* take python mutex to prevent changing PLC data while PLC running */
-	LockPython();
-	/* Get current FB */
-	data__ = EvalFBs[Current_Python_EvalFB];
-	if(data__ && /* may be null at first run */
-	    __GET_VAR(data__->STATE) == PYTHON_FB_PROCESSING){ /* some answer awaited*/
-	   	/* If result not None */
-	   	if(result){
-			/* Get results len */
-	   	    __SET_VAR(data__->, BUFFER, .len, strlen(result));
-			/* prevent results overrun */
-			if(__GET_VAR(data__->BUFFER, .len) > STR_MAX_LEN)
-			{
-			    __SET_VAR(data__->, BUFFER, .len, STR_MAX_LEN);
-				/* TODO : signal error */
-			}
-			/* Copy results to buffer */
-			strncpy((char*)__GET_VAR(data__->BUFFER, .body), result, __GET_VAR(data__->BUFFER,.len));
-	   	}else{
-	   	    __SET_VAR(data__->, BUFFER, .len, 0);
-	   	}
-		/* remove block from fifo*/
-		EvalFBs[Current_Python_EvalFB] = NULL;
-		/* Mark block as answered */
-		__SET_VAR(data__->, STATE,, PYTHON_FB_ANSWERED);
-		/* Get a new line */
-		Current_Python_EvalFB = (Current_Python_EvalFB + 1) %% %(python_eval_fb_count)d;
-		//printf("PythonIterator ++ Current_Python_EvalFB %%d\n", Current_Python_EvalFB);
+	/* If result not None */
+	if(result){
+		/* Get results len */
+		__SET_VAR(data__->, BUFFER, .len, strlen(result));
+		/* prevent results overrun */
+		if(__GET_VAR(data__->BUFFER, .len) > STR_MAX_LEN)
+		{
+		    __SET_VAR(data__->, BUFFER, .len, STR_MAX_LEN);
+			/* TODO : signal error */
+		}
+		/* Copy results to buffer */
+		strncpy((char*)__GET_VAR(data__->BUFFER, .body), result, __GET_VAR(data__->BUFFER,.len));
+	}else{
+	    __SET_VAR(data__->, BUFFER, .len, 0);
 	}
+	/* Mark block as answered */
+	__SET_VAR(data__->, STATE,, PYTHON_FB_ANSWERED);
+}
+
+/* Wait for next FB to eval and mark it as processing.
+ * Python mutex is owned when returning FB, not when returning NULL */
+static PYTHON_EVAL* WaitPythonRequest(void)
+{
+	PYTHON_EVAL* data__;
 	/* while next slot is empty */
 	while(((data__ = EvalFBs[Current_Python_EvalFB]) == NULL) ||
 	 	  /* or doesn't contain command */
@@ -210,6 +206,31 @@ char* PythonIterator(char* result, void** id)
 	//printf("PythonIterator\n");
 	/* make BUFFER a null terminated string */
 	__SET_VAR(data__->, BUFFER, .body[__GET_VAR(data__->BUFFER, .len)], 0);
+	return data__;
+}
+
+char* PythonIterator(char* result, void** id)
+{
+	char* next_command;
+	PYTHON_EVAL* data__;
+	//printf("PythonIterator result %%s\n", result);
+    /*emergency exit*/
+    if(PythonState & PYTHON_FINISHED) return NULL;
+	/* take python mutex to prevent changing PLC data while PLC running */
+	LockPython();
+	/* Get current FB */
+	data__ = EvalFBs[Current_Python_EvalFB];
+	if(data__ && /* may be null at first run */
+	    __GET_VAR(data__->STATE) == PYTHON_FB_PROCESSING){ /* some answer awaited*/
+		StorePythonResult(data__, result);
+		/* remove block from fifo*/
+		EvalFBs[Current_Python_EvalFB] = NULL;
+		/* Get a new line */
+		Current_Python_EvalFB = (Current_Python_EvalFB + 1) %% %(python_eval_fb_count)d;
+		//printf("PythonIterator ++ Current_Python_EvalFB %%d\n", Current_Python_EvalFB);
+	}
+	data__ = WaitPythonRequest();
+	if(data__ == NULL) return NULL;
 	/* next command is BUFFER */
 	next_command = (char*)__GET_VAR(data__->BUFFER, .body);
 	*id=data__;
@@ -219,3 +240,42 @@ char* PythonIterator(char* result, void** id)
 	return next_command;
 }
 
+/**
+ * Concurrent evaluation : wait for next command to eval.
+ * Unlike with PythonIterator, FB is removed from fifo as soon as its
+ * command is fetched, and result is given back with PythonEvalAnswer,
+ * in any order.
+ */
+char* PythonEvalFetch(void** id)
+{
+	char* next_command;
+	PYTHON_EVAL* data__;
+    /*emergency exit*/
+    if(PythonState & PYTHON_FINISHED) return NULL;
+	LockPython();
+	data__ = WaitPythonRequest();
+	if(data__ == NULL) return NULL;
+	/* remove block from fifo, FB isn't requested again until answered */
+	EvalFBs[Current_Python_EvalFB] = NULL;
+	Current_Python_EvalFB = (Current_Python_EvalFB + 1) %% %(python_eval_fb_count)d;
+	/* next command is BUFFER, left untouched by PLC until answered */
+	next_command = (char*)__GET_VAR(data__->BUFFER, .body);
+	*id=data__;
+	UnLockPython();
+	return next_command;
+}
+
+/**
+ * Concurrent evaluation : give result of command fetched with
+ * PythonEvalFetch back to FB
+ */
+void PythonEvalAnswer(char* result, void* id)
+{
+	/* emergency exit, answer arriving once PLC stopped is dropped */
+	if(PythonState & PYTHON_FINISHED) return;
+	LockPython();
+	if(!(PythonState & PYTHON_FINISHED))
+		StorePythonResult((PYTHON_EVAL*)id, result);
+	UnLockPython();
+}
+
@@ -140,9 +140,14 @@ class PythonLibrary(POULibrary):
                 python_eval_fb_list.append(v)
         python_eval_fb_count = max(1, len(python_eval_fb_list))
 
+        # optional concurrent evaluation, as set in project's BeremizRoot
+        python_eval = self.GetCTR().BeremizRoot.PythonEval
+        python_eval_pool_size = 0 if python_eval is None else python_eval.getThreadPoolSize()
+
         # prepare python code
         plc_python_code = plc_python_code % {
-            "python_eval_fb_count": python_eval_fb_count}
+            "python_eval_fb_count": python_eval_fb_count,
+            "python_eval_pool_size": python_eval_pool_size}
 
         Gen_Pythonfile_path = os.path.join(buildpath, "py_ext.c")
         pythonfile = open(Gen_Pythonfile_path, 'w')
@@ -24,6 +24,7 @@
 
 from threading import Thread, Lock, Event, Condition
 import ctypes
+import struct
 import os
 import sys
 import traceback
@@ -36,11 +37,13 @@ from functools import wraps, partial
 import _ctypes
 
 from runtime.typemapping import TypeTranslator
-from runtime.loglevels import LogLevelsDefault, LogLevelsCount
+from runtime.loglevels import LogLevelsDefault, LogLevelsCount, LogLevelsDict
 from runtime.Stunnel import getPSKID
 from runtime import PlcStatus
 from runtime import MainWorker
 from runtime import default_evaluator
+from runtime import blobdelta
+from runtime.PyEvalPool import PyEvalPool, PyEvalStatistics
 
 if os.name in ("nt", "ce"):
     dlopen = _ctypes.LoadLibrary
@@ -61,6 +64,29 @@ lib_ext = {
     "win32":  ".dll",
 }.get(sys.platform, "")
 
+# Transferred files are kept in blob cache, keyed by blob ID, so that
+# they don't need to be uploaded again. Oldest are evicted beyond that size.
+BlobCacheMaxSize = 64 * 1024 * 1024
+
+LogReadBufferSize = 1 << 14  # 16K
+# eRPC framed transport limits messages to 64KB
+LogBatchMaxSize = 0xf000
+# mBatchHead in plc_main_tail.c : msgsize, tick, tv_sec, tv_nsec
+LogBatchHead = struct.Struct("=4I")
+
+# Not an MD5 digest, so that only runtimes knowing calls appended to
+# PLCObject interface (NegotiateChunkSize and later) match it in MatchMD5.
+# See ConnectorBase.HasExtendedInterface
+InterfaceProbeMD5 = "PLCObjectInterface:2"
+
+# Statistics returned by GetRetainStatistics, in order given by PLC library
+RetainStatistics = [
+    "Snapshots", "Superseded",
+    "SnapshotLastTime", "SnapshotMaxTime", "SnapshotTotalTime",
+    "Writes", "WriteErrors",
+    "WriteLastTime", "WriteMaxTime",
+    "BytesWritten", "LastBytesWritten"]
+
 
 def PLCprint(message):
     if sys.stdout:
@@ -75,6 +101,17 @@ def RunInMain(func):
     return func_wrapper
 
 
+def RunShared(func):
+    """
+    For read-only queries, that can run concurrently in caller's thread,
+    but not while PLC is being loaded or unloaded by main worker.
+    """
+    @wraps(func)
+    def func_wrapper(*args, **kwargs):
+        return MainWorker.call_shared(func, *args, **kwargs)
+    return func_wrapper
+
+
 class PLCObject(object):
     def __init__(self, WorkingDir, argv, statuschange, evaluator, pyruntimevars):
         self.workingdir = WorkingDir  # must exits already
@@ -82,6 +119,9 @@ class PLCObject(object):
         if os.path.exists(self.tmpdir):
             shutil.rmtree(self.tmpdir)
         os.mkdir(self.tmpdir)
+        self.blobcachedir = os.path.join(WorkingDir, 'blobcache')
+        if not os.path.exists(self.blobcachedir):
+            os.mkdir(self.blobcachedir)
         self.argv = []
         self.statuschange = statuschange
         self.evaluator = evaluator
@@ -93,10 +133,13 @@ class PLCObject(object):
         self._InitPLCStubCalls()
         self._loading_error = None
         self.python_runtime_vars = None
+        self.PythonEvalStatistics = PyEvalStatistics()
+        self.PythonEvalPool = None
         self.TraceThread = None
         self.TraceLock = Lock()
         self.Traces = []
         self.DebugToken = 0
+        self.DebugDroppedSamples = 0
 
         # Event to signal when PLC is stopped.
         self.PlcStopped = Event()
@@ -154,25 +197,62 @@ class PLCObject(object):
             return 1
         return 0
 
-    @RunInMain
+    @RunShared
     def GetLogMessage(self, level, msgid):
         tick = ctypes.c_uint32()
         tv_sec = ctypes.c_uint32()
         tv_nsec = ctypes.c_uint32()
         if self._GetLogMessage is not None:
-            maxsz = len(self._log_read_buffer)-1
+            # buffer per call, since calls can be concurrent
+            log_read_buffer = ctypes.create_string_buffer(LogReadBufferSize)
+            maxsz = len(log_read_buffer)-1
             sz = self._GetLogMessage(level, msgid,
-                                     self._log_read_buffer, maxsz,
+                                     log_read_buffer, maxsz,
                                      ctypes.byref(tick),
                                      ctypes.byref(tv_sec),
                                      ctypes.byref(tv_nsec))
             if sz and sz <= maxsz:
-                return (self._log_read_buffer[:sz].decode(), tick.value,
+                return (log_read_buffer[:sz].decode(), tick.value,
                         tv_sec.value, tv_nsec.value)
         elif self._loading_error is not None and level == 0:
             return self._loading_error, 0, 0, 0
         return None
 
+    @RunShared
+    def GetLogMessages(self, level, msgid, max_count, max_bytes):
+        """
+        Return up to max_count log messages of given level, from message
+        msgid backward, newest first, as (msg, tick, tv_sec, tv_nsec).
+        List stops at first message not available anymore, or when packed
+        messages would exceed max_bytes.
+        """
+        if self._GetLogMessages is None:
+            # PLC built before GetLogMessages, or not loaded
+            messages = []
+            packed = 0
+            while len(messages) < max_count and len(messages) <= msgid:
+                message = self.GetLogMessage(level, msgid - len(messages))
+                if message is None:
+                    break
+                packed += LogBatchHead.size + len(message[0].encode())
+                if packed > max_bytes and messages:
+                    break
+                messages.append(message)
+            return messages
+        # buffer per call, since calls can be concurrent
+        buf = ctypes.create_string_buffer(min(max_bytes, LogBatchMaxSize))
+        sz = self._GetLogMessages(level, msgid, max_count, buf, len(buf))
+        messages = []
+        pos = 0
+        while pos < sz:
+            msgsize, tick, tv_sec, tv_nsec = LogBatchHead.unpack_from(buf, pos)
+            pos += LogBatchHead.size
+            # first message may be truncated, in the middle of a character
+            messages.append((buf[pos:pos + msgsize].decode(errors="replace"),
+                             tick, tv_sec, tv_nsec))
+            pos += msgsize
+        return messages
+
     def _GetMD5FileName(self):
         return os.path.join(self.workingdir, "lasttransferedPLC.md5")
 
@@ -206,6 +286,22 @@ class PLCObject(object):
                 self._PythonIterator.restype = ctypes.c_char_p
                 self._PythonIterator.argtypes = [ctypes.c_char_p, ctypes.POINTER(ctypes.c_void_p)]
 
+                # concurrent evaluation, if enabled in project settings
+                try:
+                    self.PythonEvalPoolSize = ctypes.c_int.in_dll(
+                        self.PLClibraryHandle, "PythonEvalPoolSize").value
+                except ValueError:
+                    # PLC built before concurrent evaluation was available
+                    self.PythonEvalPoolSize = 0
+                if self.PythonEvalPoolSize > 0:
+                    self._PythonEvalFetch = self.PLClibraryHandle.PythonEvalFetch
+                    self._PythonEvalFetch.restype = ctypes.c_char_p
+                    self._PythonEvalFetch.argtypes = [ctypes.POINTER(ctypes.c_void_p)]
+
+                    self._PythonEvalAnswer = self.PLClibraryHandle.PythonEvalAnswer
+                    self._PythonEvalAnswer.restype = None
+                    self._PythonEvalAnswer.argtypes = [ctypes.c_char_p, ctypes.c_void_p]
+
                 self._stopPLC = self._stopPLC_real
             else:
                 # If python confnode is not enabled, we reuse _PythonIterator
@@ -237,6 +333,13 @@ class PLCObject(object):
             self._GetDebugData.restype = ctypes.c_int
             self._GetDebugData.argtypes = [ctypes.POINTER(ctypes.c_uint32), ctypes.POINTER(ctypes.c_uint32), ctypes.POINTER(ctypes.c_void_p)]
 
+            self._TryGetDebugData = self.PLClibraryHandle.TryGetDebugData
+            self._TryGetDebugData.restype = ctypes.c_int
+            self._TryGetDebugData.argtypes = [ctypes.POINTER(ctypes.c_uint32), ctypes.POINTER(ctypes.c_uint32), ctypes.POINTER(ctypes.c_void_p)]
+
+            self._GetDebugDroppedSamples = self.PLClibraryHandle.GetDebugDroppedSamples
+            self._GetDebugDroppedSamples.restype = ctypes.c_uint32
+
             self._suspendDebug = self.PLClibraryHandle.suspendDebug
             self._suspendDebug.restype = ctypes.c_int
             self._suspendDebug.argtypes = [ctypes.c_int]
@@ -255,11 +358,22 @@ class PLCObject(object):
             self._LogMessage.restype = ctypes.c_int
             self._LogMessage.argtypes = [ctypes.c_uint8, ctypes.c_char_p, ctypes.c_uint32]
 
-            self._log_read_buffer = ctypes.create_string_buffer(1 << 14)  # 16K
             self._GetLogMessage = self.PLClibraryHandle.GetLogMessage
             self._GetLogMessage.restype = ctypes.c_uint32
             self._GetLogMessage.argtypes = [ctypes.c_uint8, ctypes.c_uint32, ctypes.c_char_p, ctypes.c_uint32, ctypes.POINTER(ctypes.c_uint32), ctypes.POINTER(ctypes.c_uint32), ctypes.POINTER(ctypes.c_uint32)]
 
+            # missing in PLCs built before batched log retrieval
+            self._GetLogMessages = getattr(self.PLClibraryHandle, "GetLogMessages", None)
+            if self._GetLogMessages is not None:
+                self._GetLogMessages.restype = ctypes.c_uint32
+                self._GetLogMessages.argtypes = [ctypes.c_uint8, ctypes.c_uint32, ctypes.c_uint32, ctypes.c_char_p, ctypes.c_uint32]
+
+            # provided by targets with asynchronous retain persistence
+            self._GetRetainStatistics = getattr(self.PLClibraryHandle, "GetRetainStatistics", None)
+            if self._GetRetainStatistics is not None:
+                self._GetRetainStatistics.restype = ctypes.c_uint
+                self._GetRetainStatistics.argtypes = [ctypes.POINTER(ctypes.c_uint64), ctypes.c_uint]
+
             self._loading_error = None
 
         except Exception:
@@ -302,12 +416,19 @@ class PLCObject(object):
         self._IterDebugData = lambda x, y: None
         self._FreeDebugData = lambda: None
         self._GetDebugData = lambda: -1
+        self._TryGetDebugData = lambda x, y, z: -1
+        self._GetDebugDroppedSamples = lambda: 0
         self._suspendDebug = lambda x: -1
         self._resumeDebug = lambda: None
         self._PythonIterator = lambda: ""
+        self.PythonEvalPoolSize = 0
+        self._PythonEvalFetch = lambda x: None
+        self._PythonEvalAnswer = lambda x, y: None
         self._GetLogCount = None
         self._LogMessage = None
         self._GetLogMessage = None
+        self._GetLogMessages = None
+        self._GetRetainStatistics = None
         self._PLClibraryHandle = None
         self.PLClibraryHandle = None
 
@@ -425,7 +546,37 @@ class PLCObject(object):
 
         self.python_runtime_vars = None
 
+    def _PythonEval(self, FBID, cmd, compile_cache, evaluator, concurrent=False):
+        """
+        Evaluate python_eval FB code, return (result, exc_info)
+        """
+        ccmd, AST = compile_cache.get(FBID, (None, None))
+        if ccmd is None or ccmd != cmd:
+            AST = compile(cmd, '<plc>', 'eval')
+            compile_cache[FBID] = (cmd, AST)
+        if concurrent:
+            # global FBID would be shared by concurrent evaluations,
+            # evaluated code gets its own as a local
+            return evaluator(eval, AST, self.python_runtime_vars, {"FBID": FBID})
+        self.python_runtime_vars["FBID"] = FBID
+        res = evaluator(eval, AST, self.python_runtime_vars)
+        self.python_runtime_vars["FBID"] = None
+        return res
+
+    def _PythonEvalResult(self, FBID, cmd, result, exp):
+        """
+        Format result given back to python_eval FB
+        """
+        if exp is not None:
+            self.LogMessage(1, ('PyEval@0x%x(Code="%s") Exception "%s"') % (
+                FBID, cmd, '\n'.join(traceback.format_exception(*exp))))
+            return "#EXCEPTION : "+str(exp[1])
+        return str(result)
+
     def PythonThreadLoop(self):
+        if self.PythonEvalPoolSize > 0:
+            self.PythonThreadPoolLoop()
+            return
         res, cmd, blkid = "None", "None", ctypes.c_void_p()
         compile_cache = {}
         while True:
@@ -434,23 +585,82 @@ class PLCObject(object):
             if cmd is None:
                 break
             cmd = cmd.decode()
+            start = time()
             try:
-                self.python_runtime_vars["FBID"] = FBID
-                ccmd, AST = compile_cache.get(FBID, (None, None))
-                if ccmd is None or ccmd != cmd:
-                    AST = compile(cmd, '<plc>', 'eval')
-                    compile_cache[FBID] = (cmd, AST)
-                result, exp = self.evaluator(eval, AST, self.python_runtime_vars)
-                if exp is not None:
-                    res = "#EXCEPTION : "+str(exp[1])
-                    self.LogMessage(1, ('PyEval@0x%x(Code="%s") Exception "%s"') % (
-                        FBID, cmd, '\n'.join(traceback.format_exception(*exp))))
-                else:
-                    res = str(result)
-                self.python_runtime_vars["FBID"] = None
+                result, exp = self._PythonEval(FBID, cmd, compile_cache, self.evaluator)
+                res = self._PythonEvalResult(FBID, cmd, result, exp)
             except Exception as e:
                 res = "#EXCEPTION : "+str(e)
                 self.LogMessage(1, ('PyEval@0x%x(Code="%s") Exception "%s"') % (FBID, cmd, str(e)))
+            self.PythonEvalStatistics.Record(FBID, cmd, time() - start)
+
+    def PythonThreadPoolLoop(self):
+        """
+        Evaluate python_eval FBs code concurrently in a thread pool,
+        results being given back to FBs as soon as available.
+        Code isn't evaluated by runtime's evaluator, i.e. not in main thread.
+        """
+        blkid = ctypes.c_void_p()
+        compile_cache = {}
+
+        def evaluate(FBID, cmd):
+            try:
+                return self._PythonEval(FBID, cmd, compile_cache, default_evaluator, True)
+            except Exception:
+                return None, sys.exc_info()
+
+        def answer(FBID, cmd, result, exp, duration):
+            res = self._PythonEvalResult(FBID, cmd, result, exp)
+            self.PythonEvalStatistics.Record(FBID, cmd, duration)
+            self._PythonEvalAnswer(res.encode(), FBID)
+
+        pool = self.PythonEvalPool = PyEvalPool(
+            self.PythonEvalPoolSize, evaluate, answer)
+        try:
+            while True:
+                cmd = self._PythonEvalFetch(blkid)
+                if cmd is None:
+                    break
+                pool.Submit(blkid.value, cmd.decode())
+        finally:
+            # no answer must be given once PLC library is unloaded,
+            # evaluations still running after timeout are abandoned
+            abandoned = pool.Shutdown()
+            self.PythonEvalPool = None
+            if abandoned:
+                self.LogMessage(1, "PyEval: %d evaluation(s) abandoned on stop" % abandoned)
+
+    def GetPythonEvalStatistics(self):
+        """
+        Return execution count, total and max time, and execution time
+        histogram of each python_eval FB, as a list of dicts
+        """
+        return self.PythonEvalStatistics.Get()
+
+    def ResetPythonEvalStatistics(self):
+        """
+        Forget statistics of all python_eval FBs
+        """
+        self.PythonEvalStatistics.Reset()
+
+    def GetWorkerStatistics(self):
+        """
+        Return call count, waiting and total time of each PLCObject method
+        run by main worker, and count of callers waiting for it
+        """
+        return MainWorker.GetStatistics()
+
+    @RunShared
+    def GetRetainStatistics(self):
+        """
+        Return retain persistence statistics as a dict, durations being
+        in nanoseconds, or None if PLC target doesn't provide them
+        """
+        if self._GetRetainStatistics is None:
+            return None
+        stats = (ctypes.c_uint64 * len(RetainStatistics))()
+        self._GetRetainStatistics(stats, len(stats))
+        return dict(zip(RetainStatistics, stats))
 
     def PythonThreadProc(self):
         while True:
@@ -559,6 +769,10 @@ class PLCObject(object):
     def StopPLC(self):
         if self.PLCStatus == PlcStatus.Started:
             self.LogMessage("PLC stopped")
+            # answers of python_eval FBs must not reach stopped PLC
+            pool = self.PythonEvalPool
+            if pool is not None:
+                pool.Close()
             self._stopPLC()
             if self.TraceThread is not None:
                 self.TraceThread.join()
@@ -579,7 +793,7 @@ class PLCObject(object):
         except EOFError:
             return (PlcStatus.Disconnected, [0]*LogLevelsCount)
 
-    @RunInMain
+    @RunShared
     def _GetPLCstatus(self):
         return self.PLCStatus, list(map(self.GetLogCount, range(LogLevelsCount)))
 
@@ -602,6 +816,11 @@ class PLCObject(object):
         self.blobs[newBlobID] = blob
         return newBlobID
 
+    def NegotiateChunkSize(self, chunkSize):
+        # eRPC framed transport limits messages to 64KB,
+        # including message header and blob IDs
+        return min(chunkSize, 0xf000)
+
     @RunInMain
     def AppendChunkToBlob(self, data, blobID):
         blob = self.blobs.pop(blobID, None)
@@ -616,6 +835,83 @@ class PLCObject(object):
         self.blobs[newBlobID] = blob
         return newBlobID
 
+    @RunInMain
+    def AppendDeltaToBlob(self, deltaBlobID, blobID):
+        """
+        Append to blob the data rebuilt by applying binary delta
+        transferred as another blob to currently installed PLC binary.
+        Return new blob ID, or empty ID if delta couldn't be applied.
+        """
+        delta_blob = self.blobs.pop(deltaBlobID, None)
+        blob = self.blobs.pop(blobID, None)
+        try:
+            if delta_blob is None or blob is None:
+                raise Exception(_("Missing blob"))
+            fd, path, _md5sum = delta_blob
+            os.close(fd)
+            with open(path, "rb") as f:
+                delta = f.read()
+            os.remove(path)
+
+            basemd5 = blobdelta.BaseMD5(delta)
+            if self.CurrentPLCFilename is None or not self.MatchMD5(basemd5):
+                raise Exception(_("Delta doesn't apply to installed PLC"))
+            with open(os.path.join(self.workingdir,
+                                   self.CurrentPLCFilename), "rb") as f:
+                data = blobdelta.Patch(f.read(), delta)
+        except Exception as e:
+            self.LogMessage(LogLevelsDict["WARNING"],
+                            "Binary delta failed: " + str(e))
+            if blob is not None:
+                self.blobs[blobID] = blob
+            return b""
+
+        fd, _path, md5sum = blob
+        md5sum.update(data)
+        newBlobID = md5sum.digest()
+        os.write(fd, data)
+        self.blobs[newBlobID] = blob
+        return newBlobID
+
+    def _BlobCachePath(self, blobID):
+        return os.path.join(self.blobcachedir, blobID.hex())
+
+    @RunInMain
+    def MatchCachedBlobs(self, blobs):
+        """
+        For each given (name, blobID), tell if blob is already available,
+        either being transferred or from cache. Cached blobs are restored
+        as if they just had been transferred, ready to be used by NewPLC.
+        """
+        matches = []
+        for _name, blobID in blobs:
+            if blobID not in self.blobs:
+                cachepath = self._BlobCachePath(blobID)
+                if not os.path.exists(cachepath):
+                    matches.append(0)
+                    continue
+                fd, path = mkstemp(dir=self.tmpdir)
+                shutil.copyfile(cachepath, path)
+                # mark as recently used
+                os.utime(cachepath)
+                self.blobs[blobID] = (fd, path, None)
+            matches.append(1)
+        return bytes(matches)
+
+    def _CacheBlobFile(self, blobID, path):
+        try:
+            shutil.copyfile(path, self._BlobCachePath(blobID))
+            # evict least recently used blobs
+            entries = sorted(os.scandir(self.blobcachedir),
+                             key=lambda e: e.stat().st_mtime, reverse=True)
+            total = 0
+            for entry in entries:
+                total += entry.stat().st_size
+                if total > BlobCacheMaxSize:
+                    os.remove(entry.path)
+        except OSError:
+            self.LogMessage("Couldn't cache " + os.path.basename(path))
+
     @RunInMain
     def PurgeBlobs(self):
         for fd, _path, _md5sum in list(self.blobs.values()):
@@ -630,6 +926,7 @@ class PLCObject(object):
                 _(f"Missing data to create file: {newpath}").decode())
 
         self._BlobAsFile(blob, newpath)
+        self._CacheBlobFile(blobID, newpath)
 
     def _BlobAsFile(self, blob, newpath):
         fd, path, _md5sum = blob
@@ -723,6 +1020,8 @@ class PLCObject(object):
         return False
 
     def MatchMD5(self, MD5):
+        if MD5 == InterfaceProbeMD5:
+            return True
         try:
             last_md5 = open(self._GetMD5FileName(), "r").read()
             return last_md5 == MD5
@@ -740,14 +1039,19 @@ class PLCObject(object):
         if idxs:
             # suspend but dont disable
             if self._suspendDebug(False) == 0:
-                # keep a copy of requested idx
-                self._ResetDebugVariables()
-                for idx, force in idxs:
-                    res = self._RegisterDebugVariable(idx, force, 0 if force is None else len(force))
-                    if res != 0:
-                        self._resumeDebug()
-                        self._suspendDebug(True)
-                        return -res
+                # trace ring is reset, serialize with trace thread
+                # that frees samples from it
+                with self.PLClibraryLock:
+                    # keep a copy of requested idx
+                    self._ResetDebugVariables()
+                    for idx, force in idxs:
+                        res = self._RegisterDebugVariable(idx, force, 0 if force is None else len(force))
+                        if res != 0:
+                            break
+                if res != 0:
+                    self._resumeDebug()
+                    self._suspendDebug(True)
+                    return -res
                 self._TracesSwap()
                 self._resumeDebug()
                 return self.DebugToken
@@ -757,16 +1061,17 @@ class PLCObject(object):
 
     def _TracesSwap(self):
         self.LastSwapTrace = time()
+        self.TraceLock.acquire()
+        # GetTraceVariables calls can be concurrent
         if self.TraceThread is None and self.PLCStatus == PlcStatus.Started:
             self.TraceThread = Thread(target=self.TraceThreadProc, name="PLCTrace")
             self.TraceThread.start()
-        self.TraceLock.acquire()
         Traces = self.Traces
         self.Traces = []
         self.TraceLock.release()
         return Traces
 
-    @RunInMain
+    @RunShared
     def GetTraceVariables(self, DebugToken):
         if DebugToken is not None and DebugToken == self.DebugToken:
             return self.PLCStatus, self._TracesSwap()
@@ -777,21 +1082,38 @@ class PLCObject(object):
         Return a list of traces, corresponding to the list of required idx
         """
         self._resumeDebug()  # Re-enable debugger
+        self.DebugDroppedSamples = 0
+        dropped_origin = self._GetDebugDroppedSamples()
         while self.PLCStatus == PlcStatus.Started:
             tick = ctypes.c_uint32()
             size = ctypes.c_uint32()
             buff = ctypes.c_void_p()
-            TraceBuffer = None
-
-            self.PLClibraryLock.acquire()
+            TraceBuffers = []
 
+            # wait for samples without library lock, since trace list
+            # can be changed meanwhile and ring reset
             res = self._GetDebugData(ctypes.byref(tick),
                                      ctypes.byref(size),
                                      ctypes.byref(buff))
+
+            self.PLClibraryLock.acquire()
+
             if res == 0:
-                if size.value:
-                    TraceBuffer = ctypes.string_at(buff.value, size.value)
-                self._FreeDebugData()
+                # drain all samples available in trace ring
+                # while library lock is held
+                while self._TryGetDebugData(ctypes.byref(tick),
+                                            ctypes.byref(size),
+                                            ctypes.byref(buff)) == 0:
+                    if size.value:
+                        TraceBuffers.append(
+                            (tick.value,
+                             ctypes.string_at(buff.value, size.value)))
+                    self._FreeDebugData()
+                dropped = self._GetDebugDroppedSamples()
+                if dropped < dropped_origin:
+                    # counter is reset with trace list
+                    dropped_origin = 0
+                dropped -= dropped_origin
 
             self.PLClibraryLock.release()
 
@@ -799,12 +1121,20 @@ class PLCObject(object):
             if res != 0:
                 break
 
-            if TraceBuffer is not None:
+            if dropped > self.DebugDroppedSamples:
+                if self.DebugDroppedSamples == 0:
+                    self.LogMessage(
+                        LogLevelsDict["WARNING"],
+                        "Debug: trace ring full, samples are dropped")
+                self.DebugDroppedSamples = dropped
+
+            if TraceBuffers:
                 self.TraceLock.acquire()
-                lT = len(self.Traces)
-                if lT != 0 and lT * len(self.Traces[0]) > 1024 * 1024:
-                    self.Traces.pop(0)
-                self.Traces.append((tick.value, TraceBuffer))
+                for TraceBuffer in TraceBuffers:
+                    lT = len(self.Traces)
+                    if lT != 0 and lT * len(self.Traces[0]) > 1024 * 1024:
+                        self.Traces.pop(0)
+                    self.Traces.append(TraceBuffer)
                 self.TraceLock.release()
 
             # TraceProc stops here if Traces not polled for 3 seconds
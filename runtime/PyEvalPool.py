@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of Beremiz runtime.
+#
+# See COPYING.Runtime file for copyrights details.
+
+"""
+Concurrent evaluation of python_eval/python_poll FBs code, and execution
+time statistics of python_eval/python_poll FBs.
+
+With a pool, code of each FB is evaluated in a thread of the pool as soon
+as PLC requests it, and result is given back to PLC as soon as available,
+regardless of requests order. If evaluated expression returns a coroutine,
+it is run in an asyncio loop, and result is given back once awaited.
+
+Once PLC stops, evaluations still running are waited for a bounded time
+and then abandoned. Their result is dropped, never given back to PLC.
+"""
+
+import sys
+import asyncio
+from threading import Lock, Condition, Thread
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+
+# upper bounds of execution time histogram buckets, in seconds,
+# last bucket counting longer executions
+EXEC_TIME_BUCKETS = [0.001, 0.01, 0.1, 1.0, 10.0]
+
+# time given to running evaluations on shutdown, before abandoning them.
+# Must stay below the time PLCObject.StopPLC waits for python thread.
+SHUTDOWN_TIMEOUT = 2.0
+
+
+class PyEvalStatistics(object):
+    """
+    Execution time histogram of each python_eval FB, keyed by FBID
+    """
+    def __init__(self):
+        self.lock = Lock()
+        self.stats = {}
+
+    def Record(self, FBID, code, duration):
+        with self.lock:
+            stat = self.stats.get(FBID, None)
+            if stat is None:
+                stat = self.stats[FBID] = dict(
+                    FBID=FBID, code=code, count=0, total=0.0, max=0.0,
+                    histogram=[0] * (len(EXEC_TIME_BUCKETS) + 1))
+            stat["code"] = code
+            stat["count"] += 1
+            stat["total"] += duration
+            stat["max"] = max(stat["max"], duration)
+            bucket = 0
+            while bucket < len(EXEC_TIME_BUCKETS) and \
+                    duration > EXEC_TIME_BUCKETS[bucket]:
+                bucket += 1
+            stat["histogram"][bucket] += 1
+
+    def Get(self):
+        with self.lock:
+            return [dict(stat, histogram=list(stat["histogram"]))
+                    for stat in self.stats.values()]
+
+    def Reset(self):
+        with self.lock:
+            self.stats.clear()
+
+
+class PyEvalPool(object):
+    """
+    Thread pool evaluating python_eval FBs code.
+    evaluate(FBID, code) returns (result, exc_info) as evaluator does.
+    answer(FBID, code, result, exc_info, duration) gives result back to PLC,
+    called from pool or asyncio loop thread, never after Close().
+    """
+    def __init__(self, size, evaluate, answer):
+        self.evaluate = evaluate
+        self.answer = answer
+        self.executor = ThreadPoolExecutor(size, thread_name_prefix="PLCPythonEval")
+        self.loop = None
+        self.loop_thread = None
+        self.loop_lock = Lock()
+        # answers are given with answer_lock held, unless closed
+        self.answer_lock = Lock()
+        self.closed = False
+        # count of evaluations being run in pool threads
+        self.running = 0
+        self.running_cond = Condition()
+
+    def Submit(self, FBID, code):
+        self.executor.submit(self._Evaluate, FBID, code)
+
+    def _Evaluate(self, FBID, code):
+        with self.running_cond:
+            self.running += 1
+        try:
+            start = time()
+            result, exp = self.evaluate(FBID, code)
+            if exp is None and asyncio.iscoroutine(result):
+                future = asyncio.run_coroutine_threadsafe(result, self._GetLoop())
+                future.add_done_callback(
+                    lambda future: self._Awaited(FBID, code, start, future))
+                return
+            self._Answer(FBID, code, result, exp, time() - start)
+        finally:
+            with self.running_cond:
+                self.running -= 1
+                self.running_cond.notify_all()
+
+    def _Answer(self, FBID, code, result, exp, duration):
+        with self.answer_lock:
+            if not self.closed:
+                self.answer(FBID, code, result, exp, duration)
+
+    def _Awaited(self, FBID, code, start, future):
+        if future.cancelled():
+            result, exp = None, (asyncio.CancelledError, asyncio.CancelledError(), None)
+        elif future.exception() is not None:
+            e = future.exception()
+            result, exp = None, (type(e), e, e.__traceback__)
+        else:
+            result, exp = future.result(), None
+        self._Answer(FBID, code, result, exp, time() - start)
+
+    def _GetLoop(self):
+        with self.loop_lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                self.loop_thread = Thread(target=self.loop.run_forever,
+                                          name="PLCPythonEvalLoop")
+                self.loop_thread.start()
+            return self.loop
+
+    async def _CancelTasks(self):
+        tasks = [task for task in asyncio.all_tasks()
+                 if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def Close(self):
+        """
+        Stop giving answers, to be called before PLC stops.
+        Waits for answer being given, if any.
+        """
+        with self.answer_lock:
+            self.closed = True
+
+    def Shutdown(self, timeout=SHUTDOWN_TIMEOUT):
+        """
+        Cancel pending evaluations and awaited coroutines, and wait at most
+        timeout for running evaluations. Those still running afterwards are
+        abandoned. Return count of abandoned evaluations.
+        """
+        self.Close()
+        if sys.version_info >= (3, 9):
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            self.executor.shutdown(wait=False)
+        with self.loop_lock:
+            loop, self.loop = self.loop, None
+        if loop is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(
+                    self._CancelTasks(), loop).result(timeout)
+            except Exception:
+                pass
+            loop.call_soon_threadsafe(loop.stop)
+        with self.running_cond:
+            self.running_cond.wait_for(lambda: self.running == 0, timeout)
+            abandoned = self.running
+        if loop is not None:
+            self.loop_thread.join(timeout)
+            if not self.loop_thread.is_alive():
+                loop.close()
+        return abandoned
@@ -55,6 +55,9 @@ ExposedCalls = [
     ("GetPLCID", {}),
     ("SeedBlob", {}),
     ("AppendChunkToBlob", {}),
+    ("NegotiateChunkSize", {}),
+    ("MatchCachedBlobs", {}),
+    ("AppendDeltaToBlob", {}),
     ("PurgeBlobs", {}),
     ("NewPLC", {}),
     ("RepairPLC", {}),
@@ -63,7 +66,12 @@ ExposedCalls = [
     ("GetTraceVariables", {}),
     ("RemoteExec", {}),
     ("GetLogMessage", {}),
-    ("ResetLogCount", {})
+    ("GetLogMessages", {}),
+    ("ResetLogCount", {}),
+    ("GetPythonEvalStatistics", {}),
+    ("ResetPythonEvalStatistics", {}),
+    ("GetRetainStatistics", {}),
+    ("GetWorkerStatistics", {})
 ]
 
 # de-activated dumb wamp config
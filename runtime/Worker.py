@@ -8,7 +8,8 @@
 # See COPYING.Runtime file for copyrights details.
 
 
-from threading import Lock, Condition, Thread, get_ident
+from threading import Lock, Condition, Thread, get_ident, local
+from time import time
 
 
 class job(object):
@@ -37,6 +38,9 @@ class job(object):
 class worker(object):
     """
     serialize main thread load/unload of PLC shared objects
+
+    Besides jobs, shared calls are executed in caller's thread,
+    concurrently with each other, but never while a job is executed.
     """
     def __init__(self):
         # Only one job at a time
@@ -51,6 +55,60 @@ class worker(object):
         self.stopper = None
         self.own_thread = None
 
+        # Shared calls accounting, exclusive is set while a job is
+        # executed or waits for running shared calls to finish
+        self.shared_lock = Lock()
+        self.shared_cond = Condition(self.shared_lock)
+        self.shared = 0
+        self.exclusive = False
+        self.local = local()
+
+        # Instrumentation
+        self.waiting = 0
+        self.max_waiting = 0
+        self.stats = {}
+
+    def _record(self, name, kind, waited, duration):
+        with self.shared_lock:
+            stat = self.stats.get(name, None)
+            if stat is None:
+                stat = self.stats[name] = dict(
+                    name=name, kind=kind, count=0,
+                    total_wait=0.0, max_wait=0.0,
+                    total=0.0, max=0.0)
+            stat["count"] += 1
+            stat["total_wait"] += waited
+            stat["max_wait"] = max(stat["max_wait"], waited)
+            stat["total"] += duration
+            stat["max"] = max(stat["max"], duration)
+
+    def GetStatistics(self):
+        """
+        Return count, waiting and total time of each job or shared call,
+        and current and max count of callers waiting for job execution
+        """
+        with self.shared_lock:
+            return dict(
+                calls=[dict(stat) for stat in self.stats.values()],
+                waiting=self.waiting,
+                max_waiting=self.max_waiting,
+                shared=self.shared)
+
+    def _do_exclusive(self, _job):
+        """
+        do the job once running shared calls are finished,
+        preventing new ones to start meanwhile
+        """
+        with self.shared_lock:
+            self.exclusive = True
+            self.shared_cond.wait_for(lambda: self.shared == 0)
+        try:
+            _job.do()
+        finally:
+            with self.shared_lock:
+                self.exclusive = False
+                self.shared_cond.notify_all()
+
     def reraise(self, job):
         """
         reraise exception happend in a job
@@ -67,7 +125,7 @@ class worker(object):
         self.enabled = True
         if args or kwargs:
             self.job = job(*args, **kwargs)
-            self.job.do()
+            self._do_exclusive(self.job)
             # fail if first job fails
             if not self.job.success:
                 self.reraise(self.job)
@@ -77,7 +135,7 @@ class worker(object):
 
         while not self._finish:
             self.todo.wait_for(lambda: self.job is not None)
-            self.job.do()
+            self._do_exclusive(self.job)
             self.done.notify()
             self.job = None
             self.free.notify()
@@ -95,7 +153,7 @@ class worker(object):
 
         def do_pending_job():
             self.mutex.acquire()
-            self.job.do()
+            self._do_exclusive(self.job)
             self.done.notify_all()
             self.mutex.release()
 
@@ -157,18 +215,25 @@ class worker(object):
             _job.do()
         else:
             # otherwise notify and wait for completion
+            start = time()
             self.mutex.acquire()
             if not self.enabled:
                 self.mutex.release()
                 raise EOFError("Worker is disabled")
 
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
             self.free.wait_for(lambda: self.job is None)
+            waited = time() - start
 
             self.job = _job
             self.todo.notify()
             self.done.wait_for(lambda: _job.success is not None)
+            self.waiting -= 1
             self.free.notify()
             self.mutex.release()
+            self._record(getattr(args[0], "__name__", "?"), "job",
+                         waited, time() - start)
 
         if _job.success is None:
             raise EOFError("Worker job was interrupted")
@@ -178,6 +243,36 @@ class worker(object):
         else:
             self.reraise(_job)
 
+    def call_shared(self, call, *args, **kwargs):
+        """
+        execute call in caller's thread and deliver result, concurrently
+        with other shared calls, but not while a job is executed.
+        call must not wait for a job, i.e. not make a blocking worker call.
+        """
+        if self._threadID == get_ident() or getattr(self.local, "shared", False):
+            # worker thread or nested shared call, already exclusive of jobs
+            return call(*args, **kwargs)
+
+        start = time()
+        with self.shared_lock:
+            if not self.enabled:
+                raise EOFError("Worker is disabled")
+            self.shared_cond.wait_for(lambda: not self.exclusive)
+            self.shared += 1
+        waited = time() - start
+
+        self.local.shared = True
+        try:
+            return call(*args, **kwargs)
+        finally:
+            self.local.shared = False
+            with self.shared_lock:
+                self.shared -= 1
+                if self.shared == 0:
+                    self.shared_cond.notify_all()
+            self._record(getattr(call, "__name__", "?"), "shared",
+                         waited, time() - start)
+
     def quit(self):
         """
         unblocks main thread, and terminate execution of runloop()
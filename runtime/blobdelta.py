@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# See COPYING.Runtime file for copyrights details.
+
+"""
+Binary delta between two versions of a file, rsync style : new file is
+described as a sequence of copies from base file and of literal data.
+
+Delta format :
+    magic, base MD5 length, base MD5 string
+    then ops, either
+        COPY : op, offset in base, length
+        DATA : op, length, literal data
+"""
+
+import struct
+
+DELTA_MAGIC = b"BDLT"
+
+_Header = struct.Struct("=4sB")
+_Copy = struct.Struct("=BII")
+_Data = struct.Struct("=BI")
+
+_OP_COPY = 1
+_OP_DATA = 2
+
+# base is indexed by blocks of that size
+BLOCK_SIZE = 64
+
+
+def Diff(basemd5, base, data, blocksize=BLOCK_SIZE):
+    """
+    Return delta that rebuilds data from base.
+    basemd5 identifies base so that Patch can check it is applied to
+    the right file.
+    """
+    bmd5 = basemd5.encode()
+    out = [_Header.pack(DELTA_MAGIC, len(bmd5)), bmd5]
+
+    # first occurence of each aligned block of base
+    blocks = {}
+    for offset in range(0, len(base) - blocksize + 1, blocksize):
+        blocks.setdefault(base[offset:offset + blocksize], offset)
+
+    literal_start = 0
+    pos = 0
+    end = len(data) - blocksize
+    while pos <= end:
+        offset = blocks.get(data[pos:pos + blocksize])
+        if offset is None:
+            pos += 1
+            continue
+
+        # extend match backward into pending literal data ...
+        while pos > literal_start and offset > 0 and \
+                data[pos - 1] == base[offset - 1]:
+            pos -= 1
+            offset -= 1
+        # ... and forward, a block at a time then byte per byte
+        length = blocksize
+        while pos + length + blocksize <= len(data) and \
+                data[pos + length:pos + length + blocksize] == \
+                base[offset + length:offset + length + blocksize]:
+            length += blocksize
+        while pos + length < len(data) and offset + length < len(base) and \
+                data[pos + length] == base[offset + length]:
+            length += 1
+
+        if pos > literal_start:
+            out.append(_Data.pack(_OP_DATA, pos - literal_start))
+            out.append(data[literal_start:pos])
+        out.append(_Copy.pack(_OP_COPY, offset, length))
+        pos += length
+        literal_start = pos
+
+    if literal_start < len(data):
+        out.append(_Data.pack(_OP_DATA, len(data) - literal_start))
+        out.append(data[literal_start:])
+
+    return b"".join(out)
+
+
+def IsDelta(delta):
+    return delta[:len(DELTA_MAGIC)] == DELTA_MAGIC
+
+
+def BaseMD5(delta):
+    """ Return MD5 of the file that delta must be applied to """
+    magic, size = _Header.unpack_from(delta, 0)
+    if magic != DELTA_MAGIC:
+        raise ValueError("Not a binary delta")
+    return delta[_Header.size:_Header.size + size].decode()
+
+
+def Patch(base, delta):
+    """ Rebuild data from base and delta """
+    _magic, size = _Header.unpack_from(delta, 0)
+    pos = _Header.size + size
+    out = []
+    while pos < len(delta):
+        op = delta[pos]
+        if op == _OP_COPY:
+            _op, offset, length = _Copy.unpack_from(delta, pos)
+            pos += _Copy.size
+            if offset + length > len(base):
+                raise ValueError("Binary delta copies beyond base end")
+            out.append(base[offset:offset + length])
+        elif op == _OP_DATA:
+            _op, length = _Data.unpack_from(delta, pos)
+            pos += _Data.size
+            if pos + length > len(delta):
+                raise ValueError("Truncated binary delta")
+            out.append(delta[pos:pos + length])
+            pos += length
+        else:
+            raise ValueError("Invalid binary delta op %d" % op)
+    return b"".join(out)
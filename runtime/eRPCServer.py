@@ -34,15 +34,20 @@ def TranslatedReturnAsLastOutput(translator):
     
 ReturnWrappers = {
     "AppendChunkToBlob":ReturnAsLastOutput,
+    "AppendDeltaToBlob":ReturnAsLastOutput,
     "GetLogMessage":TranslatedReturnAsLastOutput(
         lambda res:log_message(*res)),
+    "GetLogMessages":TranslatedReturnAsLastOutput(
+        lambda res:[log_message(*message) for message in res]),
     "GetPLCID":TranslatedReturnAsLastOutput(
         lambda res:PSKID(*res)),
     "GetPLCstatus":TranslatedReturnAsLastOutput(
         lambda res:PLCstatus(getattr(PLCstatus_enum, res[0]),res[1])),
     "GetTraceVariables":TranslatedReturnAsLastOutput(
         lambda res:TraceVariables(getattr(PLCstatus_enum, res[0]),[trace_sample(*sample) for sample in res[1]])),
+    "MatchCachedBlobs":ReturnAsLastOutput,
     "MatchMD5":ReturnAsLastOutput,
+    "NegotiateChunkSize":ReturnAsLastOutput,
     "NewPLC":ReturnAsLastOutput,
     "SeedBlob":ReturnAsLastOutput,
     "SetTraceVariablesList": ReturnAsLastOutput,
@@ -52,6 +57,10 @@ ReturnWrappers = {
 ArgsWrappers = {
     "AppendChunkToBlob":
         lambda data, blobID:(data, bytes(blobID)),
+    "AppendDeltaToBlob":
+        lambda deltaBlobID, blobID:(bytes(deltaBlobID), bytes(blobID)),
+    "MatchCachedBlobs":
+        lambda blobs: ([(f.fname, bytes(f.blobID)) for f in blobs],),
     "NewPLC":
         lambda md5sum, plcObjectBlobID, extrafiles: (
             md5sum, bytes(plcObjectBlobID), [(f.fname, bytes(f.blobID)) for f in extrafiles]),
@@ -6,6 +6,7 @@
 
 from ctypes import *
 from datetime import timedelta as td
+import struct
 
 class IEC_STRING(Structure):
     """
@@ -71,36 +72,337 @@ TypeTranslator = SameEndianessTypeTranslator
 DebugTypesSize = dict([(key, sizeof(t)) for key, (t, p, u) in SameEndianessTypeTranslator.items() if t is not None])
 
 
-def UnpackDebugBuffer(buff, indexes):
-    res = []
-    buffoffset = 0
-    buffsize = len(buff)
-    buffptr = cast(cast(buff, c_char_p), c_void_p).value
-    for iectype in indexes:
-        c_type, unpack_func, _pack_func = TypeTranslator.get(iectype,
-                                                             (None, None, None))
-
-        cursor = c_void_p(buffptr + buffoffset)
-        if iectype == "STRING":
-            # strlen is stored in c_uint8 and sizeof(c_uint8) is 1
-            # first check we can read size
-            if (buffoffset + 1) <= buffsize:
-                size = 1 + cast(cursor,POINTER(c_type)).contents.len
+# struct format characters used to decode debug buffers.
+# Debug buffers are packed (no alignment), so standard sizes are used and
+# characters are choosen by size to stay consistent with ctypes on any host.
+_IntStructChars = {1: ("b", "B"), 2: ("h", "H"), 4: ("i", "I"), 8: ("q", "Q")}
+
+
+def _ctype_struct_chars(c_type):
+    if c_type in (c_float, c_double):
+        return c_type._type_
+    signed, unsigned = _IntStructChars[sizeof(c_type)]
+    return signed if c_type(-1).value < 0 else unsigned
+
+
+# Header of trace pages, index of first variable in page
+_PageHeader = struct.Struct("=I")
+
+# Header of delta samples, sequence number and flags
+_DeltaHeader = struct.Struct("=IB")
+_DELTA_KEYFRAME = 1
+# some changed values are left out, and sent by next samples
+_DELTA_PARTIAL = 2
+# sample continues previous one, doesn't start at first variable
+_DELTA_CONTINUED = 4
+
+
+def _time_from_fields(s, ns):
+    return td(0, s, ns/1000.0)
+
+
+def _debug_type_layout(iectype):
+    """
+    Return struct format and converter for fixed size IEC type.
+    Converter is None when struct already gives final value.
+    """
+    if iectype == "BOOL":
+        return "?", None
+    c_type, _unpack_func, _pack_func = TypeTranslator[iectype]
+    if c_type is IEC_TIME:
+        char = _ctype_struct_chars(c_long)
+        return char * 2, _time_from_fields
+    return _ctype_struct_chars(c_type), None
+
+
+class DebugBufferDecoder(object):
+    """
+    Decode debug buffers built by __publish_debug according to a list of
+    traced IEC types.
+
+    Types list is compiled once in a list of segments : fixed size
+    runs of variables are decoded at once with a precompiled struct.Struct,
+    and offsets are only recomputed around variable size STRINGs.
+
+    In paging mode (TRACE_PAGING), each buffer is a page that starts with
+    index of its first variable, and full samples are rebuilt by
+    accumulating consecutive pages.
+
+    In delta mode (TRACE_DELTA), each buffer only contains variables that
+    changed, and full samples are rebuilt from last known values.
+    """
+
+    def __init__(self, iectypes, paging=False, delta=False):
+        self.iectypes = list(iectypes)
+        self.valid = len(self.iectypes) > 0
+        self.paging = paging
+        self.delta = delta and not paging
+        # segments are either ("STRING", None, None)
+        # or (struct.Struct, [(field_index, fields_count, converter)...])
+        self.segments = []
+        fmt = ""
+        fields = []
+        field_index = 0
+        for iectype in self.iectypes:
+            if iectype == "STRING":
+                if fmt:
+                    self.segments.append((struct.Struct("=" + fmt), fields))
+                    fmt, fields, field_index = "", [], 0
+                self.segments.append(("STRING", None))
+            elif iectype in TypeTranslator:
+                chars, converter = _debug_type_layout(iectype)
+                fields.append((field_index, len(chars), converter))
+                field_index += len(chars)
+                fmt += chars
             else:
-                return None
+                # unsupported type, nothing can be decoded
+                self.valid = False
+        if fmt:
+            self.segments.append((struct.Struct("=" + fmt), fields))
+
+        # size of sample when no STRING is traced, else None
+        if len(self.segments) == 1 and self.segments[0][0] != "STRING" \
+           and not (self.paging or self.delta):
+            self.fixed_size = self.segments[0][0].size
         else:
-            size = sizeof(c_type)
+            self.fixed_size = None
+
+        if (self.paging or self.delta) and self.valid:
+            # samples can hold any subset of variables,
+            # then layout is per variable
+            self.variables = []
+            for iectype in self.iectypes:
+                if iectype == "STRING":
+                    self.variables.append(("STRING", None))
+                else:
+                    chars, converter = _debug_type_layout(iectype)
+                    self.variables.append(
+                        (struct.Struct("=" + chars), converter))
+            self.pending = [None] * len(self.iectypes)
+            self.pending_complete = False
+            self.next_page_start = 0
+            self.next_sequence = None
+            # index of next variable expected while key frame is
+            # spread over samples, else None
+            self.keyframe_next = None
+            self.bitmap_size = (len(self.iectypes) + 7) // 8
+
+    def Decode(self, buff):
+        """
+        Decode a single sample.
+        Return list of values, or None if buffer doesn't match types.
+        """
+        if not self.valid:
+            return None
+        res = []
+        buffoffset = 0
+        buffsize = len(buff)
+        for segment, fields in self.segments:
+            if segment == "STRING":
+                # strlen is stored in first byte
+                if buffoffset + 1 > buffsize:
+                    return None
+                size = 1 + buff[buffoffset]
+                if buffoffset + size > buffsize:
+                    return None
+                res.append(bytes(buff[buffoffset + 1:buffoffset + size]).decode())
+                buffoffset += size
+            else:
+                if buffoffset + segment.size > buffsize:
+                    return None
+                raw = segment.unpack_from(buff, buffoffset)
+                buffoffset += segment.size
+                for field_index, count, converter in fields:
+                    if converter is None:
+                        res.append(raw[field_index])
+                    else:
+                        res.append(converter(*raw[field_index:field_index + count]))
+        if buffoffset == buffsize:
+            return res
+        return None
 
-        if c_type is not None and (buffoffset + size) <= buffsize:
-            ptr = cast(cursor, POINTER(c_type))
-            value = unpack_func(ptr.contents)
+    def DecodePage(self, buff):
+        """
+        Decode a page into pending sample.
+        Return full sample if page completes it, else None.
+        Raise ValueError if page doesn't match types.
+        """
+        buffsize = len(buff)
+        if buffsize < _PageHeader.size:
+            raise ValueError("Truncated trace page")
+        index, = _PageHeader.unpack_from(buff, 0)
+        if index == 0:
+            self.pending_complete = True
+        elif index != self.next_page_start:
+            # some page was lost, current sample can't be completed
+            self.pending_complete = False
+        buffoffset = _PageHeader.size
+        pending = self.pending
+        count = len(self.variables)
+        while buffoffset < buffsize and index < count:
+            decoded = self._DecodeVariable(buff, buffoffset, index)
+            if decoded is None:
+                break
+            pending[index], size = decoded
             buffoffset += size
-            res.append(value)
-        else:
+            index += 1
+        if buffoffset != buffsize:
+            self.pending_complete = False
+            self.next_page_start = 0
+            raise ValueError("Trace page doesn't match traced types")
+
+        if index < count:
+            self.next_page_start = index
+            return None
+        self.next_page_start = 0
+        if self.pending_complete:
+            return list(pending)
+        return None
+
+    def DecodeDelta(self, buff):
+        """
+        Update pending sample with changed values.
+        Return full sample if all values are known and up to date,
+        else None.
+        Raise ValueError if buffer doesn't match types.
+        """
+        buffsize = len(buff)
+        bitmap_end = _DeltaHeader.size + self.bitmap_size
+        if buffsize < bitmap_end:
+            raise ValueError("Truncated delta trace sample")
+        sequence, flags = _DeltaHeader.unpack_from(buff, 0)
+        if sequence != self.next_sequence:
+            # some sample was lost, wait for next key frame
+            self.pending_complete = False
+            self.keyframe_next = None
+        self.next_sequence = (sequence + 1) & 0xFFFFFFFF
+
+        bitmap = int.from_bytes(buff[_DeltaHeader.size:bitmap_end], "little")
+        sent = bitmap
+        pending = self.pending
+        buffoffset = bitmap_end
+        present = 0
+        while bitmap:
+            lowbit = bitmap & -bitmap
+            index = lowbit.bit_length() - 1
+            decoded = self._DecodeVariable(buff, buffoffset, index)
+            if decoded is None:
+                break
+            pending[index], size = decoded
+            buffoffset += size
+            present += 1
+            bitmap ^= lowbit
+        if bitmap or buffoffset != buffsize:
+            self.pending_complete = False
+            raise ValueError("Delta trace sample doesn't match traced types")
+
+        if flags & _DELTA_KEYFRAME:
+            # key frame holds all variables from where it starts,
+            # possibly over several consecutive samples
+            if not flags & _DELTA_CONTINUED:
+                self.pending_complete = False
+                self.keyframe_next = 0
+            if self.keyframe_next is not None:
+                if sent != ((1 << present) - 1) << self.keyframe_next:
+                    self.keyframe_next = None
+                    raise ValueError("Incomplete key frame")
+                self.keyframe_next += present
+                if not flags & _DELTA_PARTIAL:
+                    self.pending_complete = \
+                        self.keyframe_next == len(pending)
+                    self.keyframe_next = None
+                    if not self.pending_complete:
+                        raise ValueError("Incomplete key frame")
+        if self.pending_complete and not flags & _DELTA_PARTIAL:
+            return list(pending)
+        return None
+
+    def _DecodeVariable(self, buff, buffoffset, index):
+        """
+        Return (value, size) of variable at index in list stored
+        at given offset, or None if buffer is too short.
+        """
+        layout, converter = self.variables[index]
+        if layout == "STRING":
+            if buffoffset >= len(buff):
+                return None
+            size = 1 + buff[buffoffset]
+            if buffoffset + size > len(buff):
+                return None
+            return bytes(buff[buffoffset + 1:buffoffset + size]).decode(), size
+        size = layout.size
+        if buffoffset + size > len(buff):
             return None
-    if buffoffset and buffoffset == buffsize:
-        return res
-    return None
+        raw = layout.unpack_from(buff, buffoffset)
+        return (raw[0] if converter is None else converter(*raw)), size
+
+    def DecodeSamples(self, buffers):
+        """
+        Decode all samples of a poll in one pass.
+        Return a tuple (valid, columns, errors) where valid is the list of
+        indexes of buffers that could be decoded into a full sample, columns
+        a list of values list, one per traced variable, each with one value
+        per valid sample, and errors the count of undecodable buffers.
+        """
+        if not self.valid:
+            return [], [[] for _iectype in self.iectypes], len(buffers)
+
+        if self.paging or self.delta:
+            decode = self.DecodePage if self.paging else self.DecodeDelta
+            valid = []
+            samples = []
+            errors = 0
+            for i, buff in enumerate(buffers):
+                try:
+                    values = decode(buff)
+                except ValueError:
+                    errors += 1
+                    continue
+                if values is not None:
+                    valid.append(i)
+                    samples.append(values)
+            if not samples:
+                return valid, [[] for _iectype in self.iectypes], errors
+            return valid, [list(column) for column in zip(*samples)], errors
+
+        if self.fixed_size is not None:
+            segment, fields = self.segments[0]
+            size = self.fixed_size
+            valid = [i for i, buff in enumerate(buffers) if len(buff) == size]
+            if len(valid) == len(buffers):
+                data = b"".join(buffers)
+            else:
+                data = b"".join([buffers[i] for i in valid])
+            errors = len(buffers) - len(valid)
+            if not valid:
+                return valid, [[] for _field in fields], errors
+            raw_columns = list(zip(*segment.iter_unpack(data)))
+            columns = []
+            for field_index, count, converter in fields:
+                if converter is None:
+                    columns.append(list(raw_columns[field_index]))
+                else:
+                    columns.append(list(map(
+                        converter,
+                        *raw_columns[field_index:field_index + count])))
+            return valid, columns, errors
+
+        valid = []
+        samples = []
+        for i, buff in enumerate(buffers):
+            values = self.Decode(buff)
+            if values is not None:
+                valid.append(i)
+                samples.append(values)
+        errors = len(buffers) - len(valid)
+        if not samples:
+            return valid, [[] for _iectype in self.iectypes], errors
+        return valid, [list(column) for column in zip(*samples)], errors
+
+
+def UnpackDebugBuffer(buff, indexes):
+    return DebugBufferDecoder(indexes).Decode(buff)
+
 
 def ValueToIECBytes(iectype, value):
     if value is None:
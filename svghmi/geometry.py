@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of Beremiz
+#
+# See COPYING file for copyrights details.
+
+# Bounding box intersection, python counterpart of geometry.ysl2,
+# used where XSLT implementation is too slow.
+
+
+def Intersect1D(a0, a1, b0, b1):
+    """
+    Rates 1D intersection of 2 segments A and B,
+    same as func:intersect_1d in geometry.ysl2
+    """
+    d0 = a0 >= b0
+    d1 = a1 >= b1
+    if not d0 and d1:
+        # b contained in a
+        return 3
+    if d0 and not d1:
+        # a contained in b
+        return 2
+    if d0 and d1 and a0 < b1:
+        # a and b are overlapped
+        return 1
+    if not d0 and not d1 and b0 < a1:
+        # a and b are overlapped
+        return 1
+    # no intersection
+    return 0
+
+
+def Intersect(a, b):
+    """
+    Rates intersection of A and B areas given as (x, y, w, h),
+    same as func:intersect in geometry.ysl2
+    """
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    x_intersect = Intersect1D(ax, ax + aw, bx, bx + bw)
+    if x_intersect != 0:
+        return x_intersect * Intersect1D(ay, ay + ah, by, by + bh)
+    return 0
+
+
+def ParseGeometry(geometry):
+    """
+    Return list of (bbox, Id, (x, y, w, h)) for given bbox elements
+    """
+    return [(bbox, bbox.get("Id"), tuple(float(bbox.get(k)) for k in "xywh"))
+            for bbox in geometry]
+
+
+def GetOverlappingGeometry(elt_id, geometry, group_ids):
+    """
+    Return bbox elements of parsed geometry overlapping element whose id
+    is given, except groups, that must be contained to be counted in.
+    """
+    for _bbox, Id, rect in geometry:
+        if Id == elt_id:
+            g = rect
+            break
+    else:
+        return []
+
+    res = []
+    for bbox, Id, rect in geometry:
+        if Id == elt_id:
+            continue
+        rate = Intersect(g, rect)
+        if (rate == 9) if Id in group_ids else (rate > 0):
+            res.append(bbox)
+    return res
@@ -13,15 +13,21 @@ import shutil
 import hashlib
 import shlex
 import time
+import gzip
 
 import wx
 
 from lxml import etree
 from lxml.etree import XSLTApplyError
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 import util.paths as paths
 from POULibrary import POULibrary
-from docutil import open_svg, get_inkscape_path
+from docutil import open_svg, get_inkscape_path, get_inkscape_version
 
 from util.ProcessLogger import ProcessLogger
 from runtime.typemapping import DebugTypesSize
@@ -34,10 +40,53 @@ from svghmi.i18n import EtreeToMessages, SaveCatalog, ReadTranslations,\
 from svghmi.hmi_tree import HMI_TYPES, HMITreeNode, SPECIAL_NODES 
 from svghmi.ui import SVGHMI_UI
 from svghmi.fonts import GetFontTypeAndFamilyName, GetCSSFontFaceFromFontFile
+from svghmi.geometry import ParseGeometry, GetOverlappingGeometry
 
 
 ScriptDirectory = paths.AbsDir(__file__)
 
+# precompressed variants of served files, see PrecompressedFile in
+# svghmi_server.py. Brotli variant is only produced if module is available
+ASSET_ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+
+def CompressAsset(path):
+    """
+    Write precompressed variants of file at given path, unless they are
+    already up to date. Return list of variant file paths
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    variants = []
+    for encoding, ext in ASSET_ENCODINGS:
+        if encoding == "br" and brotli is None:
+            continue
+        variant_path = path + ext
+        variants.append(variant_path)
+        if os.path.exists(variant_path) and \
+           os.path.getmtime(variant_path) >= os.path.getmtime(path):
+            continue
+        if encoding == "br":
+            compressed = brotli.compress(data, mode=brotli.MODE_TEXT)
+        else:
+            # mtime=0 so that identical content gives identical file
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        with open(variant_path, 'wb') as f:
+            f.write(compressed)
+    return variants
+
+
+def AssetETag(path, hmi_hash):
+    """
+    ETag for a served file : HMI tree hash, so that clients never keep
+    an HMI that doesn't match PLC, and content hash
+    """
+    hasher = hashlib.md5()
+    with open(path, 'rb') as f:
+        for buf in iter(lambda: f.read(65536), b""):
+            hasher.update(buf)
+    return hmi_hash.hex() + "-" + hasher.hexdigest()
+
 
 # module scope for HMITree root
 # so that CTN can use HMITree deduced in Library
@@ -423,22 +472,50 @@ class SVGHMI(object):
                     shutil.copy(pofile, self.CTNPath())
         return True
 
+    def _getGeometryCachePath(self):
+        location_str = "_".join(map(str, self.GetCurrentLocation()))
+        return os.path.join(self._getBuildPath(),
+                            "svghmi_"+location_str+"_geometry.csv")
+
     def GetSVGGeometry(self):
-        self.ProgressStart("inkscape", "collecting SVG geometry (Inkscape)")
         # invoke inskscape -S, csv-parse output, produce elements
         InkscapeGeomColumns = ["Id", "x", "y", "w", "h"]
 
-        inkpath = get_inkscape_path().decode()
+        inkpath = get_inkscape_path()
         if inkpath is None:
             self.FatalError("SVGHMI: inkscape is not installed.")
+        inkpath = inkpath.decode()
 
         svgpath = self._getSVGpath()
-        status, result, _err_result = ProcessLogger(self.GetCTRoot().logger,
-                                                     [inkpath, '-S', svgpath],
-                                                     no_stdout=True,
-                                                     no_stderr=True).spin()
-        if status != 0:
-            self.FatalError("SVGHMI: inkscape couldn't extract geometry from given SVG.")
+
+        # geometry only depends on SVG content and on Inkscape, and is
+        # kept in build directory, first line being digest of both
+        hasher = hashlib.md5(
+            (inkpath + repr(get_inkscape_version())).encode())
+        with open(svgpath, 'rb') as svgfile:
+            hasher.update(svgfile.read())
+        digest = hasher.hexdigest()
+        cache_path = self._getGeometryCachePath()
+
+        result = None
+        if os.path.exists(cache_path):
+            with open(cache_path, 'r') as cache_file:
+                if cache_file.readline().strip() == digest:
+                    result = cache_file.read()
+
+        if result is None:
+            self.ProgressStart("inkscape", "collecting SVG geometry (Inkscape)")
+            status, result, _err_result = ProcessLogger(self.GetCTRoot().logger,
+                                                         [inkpath, '-S', svgpath],
+                                                         no_stdout=True,
+                                                         no_stderr=True).spin()
+            if status != 0:
+                self.FatalError("SVGHMI: inkscape couldn't extract geometry from given SVG.")
+
+            with open(cache_path, 'w') as cache_file:
+                cache_file.write(digest + "\n" + result)
+        else:
+            self.ProgressStart("inkscape", "loading SVG geometry from cache")
 
         res = []
         for line in result.split():
@@ -451,6 +528,23 @@ class SVGHMI(object):
         self.ProgressEnd("inkscape")
         return res
 
+    def GetOverlappingGeometry(self, _context, elts, geometry, group_ids):
+        # geometry is parsed once for all pages, then each page is compared
+        # with all geometry, which was main bottleneck when done in XSLT
+        geometry = ParseGeometry(geometry)
+        group_ids = set(group_ids)
+        res = etree.Element("overlapping_geometry")
+        for elt in elts:
+            elt_id = elt.get("id")
+            k = "overlapping:" + elt_id
+            self.ProgressStart(k, "collecting membership of " +
+                elt.get("{http://www.inkscape.org/namespaces/inkscape}label", ""))
+            overlapping = etree.SubElement(res, "elt", id=elt_id)
+            for bbox in GetOverlappingGeometry(elt_id, geometry, group_ids):
+                etree.SubElement(overlapping, "bbox", bbox.attrib)
+            self.ProgressEnd(k)
+        return [res]
+
     def GetHMITree(self):
         ctroot = self.GetCTRoot()
         svghmilib = ctroot.Libraries["SVGHMI"]
@@ -555,10 +649,13 @@ class SVGHMI(object):
 
         if os.path.exists(svgfile):
 
+            self.ProgressStart("digest", "checking for changes")
             hasher = hashlib.md5()
             hmi_tree_root._hash(hasher)
             pofiles = GetPoFiles(self.CTNPath())
-            filestocheck = [svgfile] + \
+            # transform itself is checked, for changes in Beremiz
+            filestocheck = [os.path.join(ScriptDirectory, "gen_index_xhtml.xslt"),
+                            svgfile] + \
                            (list(list(zip(*pofiles))[1]) if pofiles else []) + \
                            self.GetFontsFiles()
 
@@ -572,17 +669,19 @@ class SVGHMI(object):
                             break
             digest = hasher.hexdigest()
 
-            if os.path.exists(hash_path):
-                with open(hash_path, 'rb') as digest_file:
+            if os.path.exists(hash_path) and os.path.exists(target_path):
+                with open(hash_path, 'r') as digest_file:
                     last_digest = digest_file.read()
             else:
                 last_digest = None
-            
+            self.ProgressEnd("digest")
+
             if digest != last_digest:
 
                 transform = XSLTransform(os.path.join(ScriptDirectory, "gen_index_xhtml.xslt"),
                               [("GetSVGGeometry", lambda *_ignored:self.GetSVGGeometry()),
                                ("GetHMITree", lambda *_ignored:self.GetHMITree()),
+                               ("GetOverlappingGeometry", self.GetOverlappingGeometry),
                                ("GetTranslations", self.GetTranslations),
                                ("GetFonts", self.GetFonts),
                                ("ProgressStart", lambda _ign,k,m:self.ProgressStart(str(k),str(m))),
@@ -640,6 +739,10 @@ class SVGHMI(object):
 
         res += ((target_fname, open(target_path, "rb")),)
 
+        etag = AssetETag(target_path, hmi_tree_root.hash())
+        for variant_path in CompressAsset(target_path):
+            res += ((os.path.basename(variant_path), open(variant_path, "rb")),)
+
         svghmi_cmds = {}
         for thing in ["Start", "Stop", "Watchdog"]:
              given_command = self.GetParamsAttributes("SVGHMI.On"+thing)["value"]
@@ -691,7 +794,7 @@ def _runtime_{location}_svghmi_start():
 
     svghmi_root.putChild(
         b'{path}',
-        NoCacheFile('{xhtml}',
+        PrecompressedFile('{xhtml}', '{etag}',
             defaultType='application/xhtml+xml'))
 
     path_list.append("{path}")
@@ -732,6 +835,7 @@ def _runtime_{location}_svghmi_stop():
 
         """.format(location=location_str,
                    xhtml=target_fname,
+                   etag=etag,
                    svghmi_cmds=svghmi_cmds,
                    watchdog_initial = self.GetParamsAttributes("SVGHMI.WatchdogInitial")["value"],
                    watchdog_interval = self.GetParamsAttributes("SVGHMI.WatchdogInterval")["value"],
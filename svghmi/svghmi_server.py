@@ -7,7 +7,7 @@
 
 
 import errno
-from threading import RLock, Timer
+from threading import RLock, Lock, Timer
 import os, time
 
 try:
@@ -18,7 +18,11 @@ except ImportError:
 from twisted.web.server import Site
 from twisted.web.resource import Resource
 from twisted.internet import reactor
-from twisted.web.static import File
+from twisted.web.static import File, NoRangeStaticProducer
+from twisted.web.server import NOT_DONE_YET
+from twisted.web import http
+from twisted.internet.interfaces import IPushProducer
+from zope.interface import implementer
 
 from autobahn.twisted.websocket import WebSocketServerFactory, WebSocketServerProtocol
 from autobahn.websocket.protocol import WebSocketProtocol
@@ -56,6 +60,10 @@ svghmi_recv_dispatch.argtypes = [
     ctypes.c_uint32,  # size
     ctypes.c_char_p]  # data ptr
 
+# svghmi_send_collect fills a single buffer shared by all sessions, and
+# session flow control state is changed from both send thread and reactor
+svghmi_collect_lock = Lock()
+
 class HMISessionMgr(object):
     def __init__(self):
         self.multiclient_sessions = set()
@@ -63,6 +71,15 @@ class HMISessionMgr(object):
         self.session_count = 0
         self.lock = RLock()
         self.indexes = set()
+        # immutable snapshot of registered sessions, rebuilt on
+        # register/unregister so that send thread can iterate it unlocked
+        self.sessions = ()
+
+    def update_sessions(self):
+        sessions = tuple(self.multiclient_sessions)
+        if self.watchdog_session is not None:
+            sessions = (self.watchdog_session,) + sessions
+        self.sessions = sessions
 
     def next_index(self):
         if self.indexes:
@@ -94,6 +111,7 @@ class HMISessionMgr(object):
                 self.multiclient_sessions.add(session)
                 self.session_count += 1
             session.session_index = self.next_index()
+            self.update_sessions()
 
     def unregister(self, session):
         with self.lock:
@@ -108,6 +126,7 @@ class HMISessionMgr(object):
                     return
             self.free_index(session.session_index)
             self.session_count -= 1
+            self.update_sessions()
         session.kill()
 
     def close_all(self):
@@ -115,22 +134,22 @@ class HMISessionMgr(object):
             self.unregister(session)
 
     def iter_sessions(self):
-        with self.lock:
-            lst = list(self.multiclient_sessions)
-            if self.watchdog_session is not None:
-                lst = [self.watchdog_session]+lst
-            for nxt_session in lst:
-                yield nxt_session
+        return iter(self.sessions)
 
 
 svghmi_session_manager = HMISessionMgr()
 
 
+@implementer(IPushProducer)
 class HMISession(object):
     def __init__(self, protocol_instance):
         self.protocol_instance = protocol_instance
         self._session_index = None
         self.closed = False
+        # flow control, see ready()
+        self.paused = False
+        self.in_flight = False
+        self.skipped = False
 
     @property
     def is_watchdog_session(self):
@@ -164,10 +183,48 @@ class HMISession(object):
         return svghmi_recv_dispatch(self.session_index, len(msg), msg)
 
     def sendMessage(self, msg):
+        # must be called from reactor thread
         if self.closed: return
         self.protocol_instance.sendMessage(msg, True)
         return 0
 
+    def ready(self):
+        # Session doesn't get new data while transport is congested or
+        # while previous frame wasn't passed to transport yet. Updates
+        # meanwhile stay pending on C side, where only latest value of
+        # each variable is kept, and are collected at once when ready.
+        return not (self.closed or self.paused or self.in_flight)
+
+    def collect(self, size, ptr):
+        # call with svghmi_collect_lock held
+        res = svghmi_send_collect(
+            self.session_index, ctypes.byref(size), ctypes.byref(ptr))
+        if res == 0:
+            return res, ctypes.string_at(ptr.value, size.value)
+        return res, None
+
+    def catch_up(self):
+        # called from reactor when session becomes ready again, since
+        # values skipped meanwhile won't wake send thread up again
+        with svghmi_collect_lock:
+            if not (self.skipped and self.ready()):
+                return
+            self.skipped = False
+            res, msg = self.collect(ctypes.c_uint32(), ctypes.c_void_p())
+        if msg is not None:
+            self.sendMessage(msg)
+
+    # IPushProducer, registered to websocket transport
+    def pauseProducing(self):
+        self.paused = True
+
+    def resumeProducing(self):
+        self.paused = False
+        self.catch_up()
+
+    def stopProducing(self):
+        self.paused = True
+
 class Watchdog(object):
     def __init__(self, initial_timeout, interval, callback):
         self._callback = callback
@@ -223,6 +280,10 @@ class HMIProtocol(WebSocketServerProtocol):
         registered = svghmi_session_manager.register(_hmi_session)
         self._hmi_session = _hmi_session
         self._hmi_session.reset()
+        # transport was taken over from twisted.web's HTTP channel, that
+        # is still registered as its producer
+        self.unregisterProducer()
+        self.registerProducer(_hmi_session, True)
 
     def onClose(self, wasClean, code, reason):
         global svghmi_session_manager
@@ -248,6 +309,14 @@ svghmi_send_thread = None
 # python's errno on windows seems to have no ENODATA
 ENODATA = errno.ENODATA if hasattr(errno,"ENODATA") else None
 
+def SendBatch(batch):
+    # runs in reactor thread, transports are not thread safe
+    for svghmi_session, msg in batch:
+        svghmi_session.sendMessage(msg)
+        with svghmi_collect_lock:
+            svghmi_session.in_flight = False
+        svghmi_session.catch_up()
+
 def SendThreadProc():
     global svghmi_session_manager
     size = ctypes.c_uint32()
@@ -255,13 +324,17 @@ def SendThreadProc():
     res = 0
     while svghmi_continue_collect:
         svghmi_wait()
+        batch = []
         for svghmi_session in svghmi_session_manager.iter_sessions():
-            res = svghmi_send_collect(
-                svghmi_session.session_index,
-                ctypes.byref(size), ctypes.byref(ptr))
+            with svghmi_collect_lock:
+                if not svghmi_session.ready():
+                    svghmi_session.skipped = True
+                    continue
+                res, msg = svghmi_session.collect(size, ptr)
+                if res == 0:
+                    svghmi_session.in_flight = True
             if res == 0:
-                svghmi_session.sendMessage(
-                    ctypes.string_at(ptr.value,size.value))
+                batch.append((svghmi_session, msg))
             elif res == ENODATA:
                 # this happens when there is no data after wakeup
                 # because of hmi data refresh period longer than
@@ -270,6 +343,9 @@ def SendThreadProc():
             else:
                 # this happens when finishing
                 break
+        if batch:
+            # hand all frames of this cycle to reactor at once
+            reactor.callFromThread(SendBatch, batch)
 
 def AddPathToSVGHMIServers(path, factory, *args, **kwargs):
     for k,v in svghmi_servers.items():
@@ -296,10 +372,60 @@ def _runtime_00_svghmi_stop():
     svghmi_send_thread = None
 
 
-class NoCacheFile(File):
+class PrecompressedFile(Resource):
+    """
+    Serve a file built by IDE along with its precompressed variants.
+    Clients must revalidate on each load, but only get content again
+    if ETag, derived from HMI tree hash and content, did change.
+    """
+    isLeaf = True
+
+    # preference order, and file extension of variants
+    encodings = [(b"br", ".br"), (b"gzip", ".gz")]
+
+    def __init__(self, path, etag, defaultType):
+        Resource.__init__(self)
+        self.path = path
+        self.etag = etag
+        self.type = defaultType.encode()
+        self.variants = [(encoding, path + ext)
+                         for encoding, ext in self.encodings
+                         if os.path.exists(path + ext)]
+
+    def select_variant(self, request):
+        accepted = request.getHeader(b"accept-encoding") or b""
+        accepted = [token.split(b";")[0].strip()
+                    for token in accepted.lower().split(b",")]
+        for encoding, path in self.variants:
+            if encoding in accepted:
+                return encoding, path
+        return None, self.path
+
     def render_GET(self, request):
-        request.setHeader(b"Cache-Control", b"no-cache, no-store")
-        return File.render_GET(self, request)
+        encoding, path = self.select_variant(request)
+        try:
+            f = open(path, "rb")
+        except IOError:
+            request.setResponseCode(http.NOT_FOUND)
+            return b""
+
+        request.setHeader(b"Cache-Control", b"no-cache")
+        request.setHeader(b"Vary", b"Accept-Encoding")
+        request.setHeader(b"Content-Type", self.type)
+        etag = self.etag if encoding is None else \
+            self.etag + "-" + encoding.decode()
+        if request.setETag(('"' + etag + '"').encode()) == http.CACHED:
+            f.close()
+            return b""
+
+        if encoding is not None:
+            request.setHeader(b"Content-Encoding", encoding)
+        request.setHeader(b"Content-Length", b"%d" % os.fstat(f.fileno()).st_size)
+        if request.method == b"HEAD":
+            f.close()
+            return b""
+        NoRangeStaticProducer(request, f).start()
+        return NOT_DONE_YET
     render_HEAD = render_GET
 
 
@@ -9,18 +9,44 @@
 
 */
 
+/*
+  PLC thread only copies retained variables into an in-memory snapshot.
+  Snapshots are double buffered : while writer thread persists one, PLC
+  thread fills the other.
+
+  Retain file is made of two slots, each one holding a complete copy of
+  retained data :
+  | retain_size | hash_size | hash | retained data | sequence | CRC32 |
+  CRC32 covers the whole slot. Valid slot with greatest sequence number
+  is the one reminded.
+
+  Each save updates the oldest slot in place, writing only pages that
+  differ from snapshot, so that other slot stays valid if writing is
+  interrupted. Retain file is first created whole in a temporary file,
+  renamed once synced.
+
+  Former retain files, made of one slot without sequence number, are
+  still reminded.
+*/
+
 #ifndef HAVE_RETAIN
 #include <stdio.h>
 #include <stdint.h>
+#include <stdlib.h>
+#include <string.h>
 #include <unistd.h>
+#include <fcntl.h>
+#include <time.h>
+#include <pthread.h>
 #include "iec_types.h"
 
 int GetRetainSize(void);
+extern long AtomicCompareExchange(long*, long, long);
 
-/* Retain buffer.  */
-FILE *retain_buffer;
+/* Retain files.  */
 const char rb_file[]      = "retain_buffer_file";
 const char rb_file_bckp[] = "retain_buffer_file.bak";
+const char rb_file_tmp[]  = "retain_buffer_file.tmp";
 
 
 /* Retain header struct.  */
@@ -30,12 +56,14 @@ struct retain_info_t {
 	uint8_t* hash;
 	uint32_t header_offset;
 	uint32_t header_crc;
+	/* header as written in file */
+	uint8_t* header;
 };
 
 /* Init retain info structure.  */
 struct retain_info_t retain_info;
 
-/* CRC lookup table and initial state.  */
+/* CRC lookup table.  */
 static const uint32_t crc32_table[256] = {
 	0x00000000, 0x77073096, 0xEE0E612C, 0x990951BA, 0x076DC419, 0x706AF48F, 0xE963A535, 0x9E6495A3,
 	0x0EDB8832, 0x79DCB8A4, 0xE0D5E91E, 0x97D2D988, 0x09B64C2B, 0x7EB17CBD, 0xE7B82D07, 0x90BF1D91,
@@ -70,66 +98,368 @@ static const uint32_t crc32_table[256] = {
 	0xBDBDF21C, 0xCABAC28A, 0x53B39330, 0x24B4A3A6, 0xBAD03605, 0xCDD70693, 0x54DE5729, 0x23D967BF,
 	0xB3667A2E, 0xC4614AB8, 0x5D681B02, 0x2A6F2B94, 0xB40BBE37, 0xC30C8EA1, 0x5A05DF1B, 0x2D02EF8D,
 };
-uint32_t retain_crc;
 
 
+/* Tables for slicing-by-8 CRC calculation, derived from crc32_table.  */
+static uint32_t crc32_slices[8][256];
+static int crc32_slices_ready = 0;
+
+static void InitCRC32Slices(void)
+{
+	int i, k;
+
+	if (crc32_slices_ready)
+		return;
+	for (i = 0; i < 256; i++) {
+		crc32_slices[0][i] = crc32_table[i];
+		for (k = 1; k < 8; k++)
+			crc32_slices[k][i] = (crc32_slices[k-1][i] >> 8) ^
+				crc32_table[crc32_slices[k-1][i] & 0xFF];
+	}
+	crc32_slices_ready = 1;
+}
+
+#define LOAD32_LE(p) ((uint32_t)(p)[0] | ((uint32_t)(p)[1] << 8) | \
+	((uint32_t)(p)[2] << 16) | ((uint32_t)(p)[3] << 24))
+
 /* Calculate CRC32 for len bytes from pointer buf with init starting value.  */
 uint32_t GenerateCRC32Sum(const void* buf, unsigned int len, uint32_t init)
 {
 	uint32_t crc = ~init;
-	unsigned char* current = (unsigned char*) buf;
+	const unsigned char* current = (const unsigned char*) buf;
+
+	InitCRC32Slices();
+
+	/* 8 bytes at a time.  */
+	while (len >= 8) {
+		uint32_t one = LOAD32_LE(current) ^ crc;
+		uint32_t two = LOAD32_LE(current + 4);
+		crc = crc32_slices[7][one & 0xFF] ^
+			crc32_slices[6][(one >> 8) & 0xFF] ^
+			crc32_slices[5][(one >> 16) & 0xFF] ^
+			crc32_slices[4][one >> 24] ^
+			crc32_slices[3][two & 0xFF] ^
+			crc32_slices[2][(two >> 8) & 0xFF] ^
+			crc32_slices[1][(two >> 16) & 0xFF] ^
+			crc32_slices[0][two >> 24];
+		current += 8;
+		len -= 8;
+	}
+
+	/* Remaining bytes.  */
 	while (len--)
 		crc = crc32_table[(crc ^ *current++) & 0xFF] ^ (crc >> 8);
 	return ~crc;
 }
 
-/* Calc CRC32 for retain file byte by byte.  */
-int CheckFileCRC(FILE* file_buffer)
+/* Retain statistics, see GetRetainStatistics.  */
+enum {
+	RETAIN_STAT_SNAPSHOTS,          /* snapshots taken by PLC thread */
+	RETAIN_STAT_SUPERSEDED,         /* snapshots replaced by a newer one before being written */
+	RETAIN_STAT_SNAPSHOT_LAST_NS,   /* PLC thread time spent taking last snapshot */
+	RETAIN_STAT_SNAPSHOT_MAX_NS,
+	RETAIN_STAT_SNAPSHOT_TOTAL_NS,
+	RETAIN_STAT_WRITES,             /* snapshots written in retain file */
+	RETAIN_STAT_WRITE_ERRORS,
+	RETAIN_STAT_WRITE_LAST_NS,      /* writer thread time spent writing last snapshot */
+	RETAIN_STAT_WRITE_MAX_NS,
+	RETAIN_STAT_BYTES_WRITTEN,      /* total bytes written in retain file */
+	RETAIN_STAT_LAST_BYTES_WRITTEN, /* bytes written by last save */
+	RETAIN_STAT_COUNT
+};
+static uint64_t retain_stats[RETAIN_STAT_COUNT];
+
+/* Copy at most count statistics into stats, return statistics count.  */
+unsigned int GetRetainStatistics(uint64_t *stats, unsigned int count)
+{
+	if (count > RETAIN_STAT_COUNT)
+		count = RETAIN_STAT_COUNT;
+	memcpy(stats, retain_stats, count * sizeof(uint64_t));
+	return RETAIN_STAT_COUNT;
+}
+
+static uint64_t ElapsedNanoseconds(struct timespec *start)
 {
-	/* Set the magic constant for one-pass CRC calc according to ZIP CRC32.  */
-	const uint32_t magic_number = 0x2144df1c;
+	struct timespec now;
+	clock_gettime(CLOCK_MONOTONIC, &now);
+	return (uint64_t)(now.tv_sec - start->tv_sec) * 1000000000 +
+		now.tv_nsec - start->tv_nsec;
+}
 
-	/* CRC initial state.  */
-	uint32_t calc_crc32 = 0;
-	char data_block = 0;
+static void RecordDuration(int stat, uint64_t duration)
+{
+	retain_stats[stat] = duration;
+	if (duration > retain_stats[stat + 1])
+		retain_stats[stat + 1] = duration;
+}
 
-	while(!feof(file_buffer)){
-		if (fread(&data_block, sizeof(data_block), 1, file_buffer))
-			calc_crc32 = GenerateCRC32Sum(&data_block, sizeof(char), calc_crc32);
-	}
+/* Snapshots, each one being retain_size bytes long.  */
+static char *retain_snapshots[2];
+
+/* Snapshot being filled by PLC thread, -1 if none.  */
+static int retain_filling = -1;
+
+/* Snapshots exchanged between PLC thread and writer thread.
+   Bits 0-1 : published snapshot index + 1, 0 if none.
+   Bits 2-3 : index + 1 of snapshot being written, 0 if none.
+   Only updated with AtomicCompareExchange.  */
+static long retain_state = 0;
+#define PUBLISHED(state) ((state) & 3)
+#define WRITING(state) (((state) >> 2) & 3)
+
+static struct timespec retain_snapshot_start;
+
+static pthread_t retain_writer_thread;
+static pthread_mutex_t retain_writer_mutex = PTHREAD_MUTEX_INITIALIZER;
+static pthread_cond_t retain_writer_cond = PTHREAD_COND_INITIALIZER;
+static int retain_writer_running = 0;
+static int retain_writer_quit = 0;
+
+#ifndef RETAIN_PAGE_SIZE
+#define RETAIN_PAGE_SIZE 512
+#endif
+
+static unsigned int retain_slot_size;
+static unsigned int retain_page_count;
+
+/* Retain file, -1 if it has to be created.  */
+static int retain_fd = -1;
+
+/* Slot written last, and its sequence number.  */
+static int retain_last_slot;
+static uint32_t retain_seq;
+
+/* Retained data, as in slot written last.  */
+static char *retain_persisted;
 
-	/* Compare crc result with a magic number.  */
-	return (calc_crc32 == magic_number) ? 1 : 0;
+/* For each slot, pages that differ from retain_persisted.  */
+static uint8_t *retain_stale[2];
+
+static uint32_t GenerateSlotCRC32Sum(const char *data, uint32_t seq)
+{
+	uint32_t crc = GenerateCRC32Sum(data, retain_info.retain_size,
+		retain_info.header_crc);
+	return GenerateCRC32Sum(&seq, sizeof(seq), crc);
 }
 
-/* Compare current hash with hash from file byte by byte.  */
-int CheckFilehash(void)
+static unsigned int PageSize(unsigned int page)
 {
-	int k,ret;
-	int offset = sizeof(retain_info.retain_size);
+	unsigned int start = page * RETAIN_PAGE_SIZE;
+	unsigned int remaining = retain_info.retain_size - start;
+	return remaining < RETAIN_PAGE_SIZE ? remaining : RETAIN_PAGE_SIZE;
+}
 
-	rewind(retain_buffer);
-	fseek(retain_buffer, offset , SEEK_SET);
+/* Create retain file with both slots holding snapshot,
+   return written bytes count or -1.  */
+static long CreateRetainFile(const char *snapshot)
+{
+	FILE *file;
+	int ok = 1, slot, dir;
+
+	file = fopen(rb_file_tmp, "wb");
+	if (!file)
+		return -1;
+
+	for (slot = 0; slot < 2 && ok; slot++) {
+		uint32_t seq = retain_seq + 1 + slot;
+		uint32_t crc = GenerateSlotCRC32Sum(snapshot, seq);
+
+		ok = fwrite(retain_info.header, retain_info.header_offset, 1, file) &&
+			fwrite(snapshot, retain_info.retain_size, 1, file) &&
+			fwrite(&seq, sizeof(seq), 1, file) &&
+			fwrite(&crc, sizeof(crc), 1, file);
+	}
+	ok = ok && fflush(file) == 0 && fsync(fileno(file)) == 0;
+	fclose(file);
+
+	if (!ok || rename(rb_file_tmp, rb_file)) {
+		remove(rb_file_tmp);
+		return -1;
+	}
+
+	/* Make rename durable.  */
+	dir = open(".", O_RDONLY);
+	if (dir >= 0) {
+		fsync(dir);
+		close(dir);
+	}
 
-	uint32_t size;
-	ret = fread(&size, sizeof(size), 1, retain_buffer);
-	if (size != retain_info.hash_size)
+	/* Former backup is outdated.  */
+	remove(rb_file_bckp);
+
+	retain_fd = open(rb_file, O_RDWR);
+	if (retain_fd < 0)
+		return -1;
+
+	retain_seq += 2;
+	retain_last_slot = 1;
+	memcpy(retain_persisted, snapshot, retain_info.retain_size);
+	memset(retain_stale[0], 0, retain_page_count);
+	memset(retain_stale[1], 0, retain_page_count);
+
+	return 2 * retain_slot_size;
+}
+
+/* Write pages of snapshot that differ from oldest slot into it,
+   return written bytes count or -1.  */
+static long UpdateRetainFile(const char *snapshot)
+{
+	int slot = 1 - retain_last_slot;
+	uint8_t *stale = retain_stale[slot];
+	off_t data_offset = (off_t)slot * retain_slot_size + retain_info.header_offset;
+	unsigned int page, changed = 0;
+	uint32_t trailer[2];
+	long written = 0;
+
+	/* Find pages changed since last save.  */
+	for (page = 0; page < retain_page_count; page++) {
+		unsigned int start = page * RETAIN_PAGE_SIZE;
+		if (memcmp(snapshot + start, retain_persisted + start, PageSize(page))) {
+			stale[page] |= 2;
+			changed++;
+		}
+	}
+
+	/* Slot written last is up to date.  */
+	if (!changed)
 		return 0;
 
-	for(k = 0; k < retain_info.hash_size; k++){
-		uint8_t file_digit;
-		ret = fread(&file_digit, sizeof(char), 1, retain_buffer);
-		if (file_digit != *(retain_info.hash+k))
-			return 0;
+	/* Write runs of consecutive stale pages.  */
+	page = 0;
+	while (page < retain_page_count) {
+		unsigned int start, size;
+
+		if (!stale[page]) {
+			page++;
+			continue;
+		}
+		start = page * RETAIN_PAGE_SIZE;
+		size = 0;
+		while (page < retain_page_count && stale[page])
+			size += PageSize(page++);
+		if (pwrite(retain_fd, snapshot + start, size, data_offset + start) != size)
+			goto error;
+		written += size;
 	}
 
-	return 1;
+	/* Then sequence number and CRC, that make slot valid.  */
+	trailer[0] = retain_seq + 1;
+	trailer[1] = GenerateSlotCRC32Sum(snapshot, trailer[0]);
+	if (pwrite(retain_fd, trailer, sizeof(trailer),
+		data_offset + retain_info.retain_size) != sizeof(trailer))
+		goto error;
+	written += sizeof(trailer);
+
+	if (fdatasync(retain_fd))
+		goto error;
+
+	for (page = 0; page < retain_page_count; page++) {
+		if (stale[page] & 2) {
+			unsigned int start = page * RETAIN_PAGE_SIZE;
+			memcpy(retain_persisted + start, snapshot + start, PageSize(page));
+			retain_stale[retain_last_slot][page] = 1;
+		}
+		stale[page] = 0;
+	}
+	retain_seq++;
+	retain_last_slot = slot;
+
+	return written;
+
+error:
+	/* Slot content is unknown, write it whole next time.  */
+	memset(stale, 1, retain_page_count);
+	return -1;
+}
+
+static long WriteRetainFile(const char *snapshot)
+{
+	if (retain_fd < 0)
+		return CreateRetainFile(snapshot);
+	return UpdateRetainFile(snapshot);
+}
+
+/* Take published snapshot if any, return its index or -1.  */
+static int TakePublishedSnapshot(void)
+{
+	long state, published;
+
+	do {
+		state = retain_state;
+		published = PUBLISHED(state);
+		if (!published)
+			return -1;
+	} while (AtomicCompareExchange(&retain_state, state, published << 2) != state);
+
+	return published - 1;
+}
+
+static void ReleaseWrittenSnapshot(void)
+{
+	long state;
+
+	do {
+		state = retain_state;
+	} while (AtomicCompareExchange(&retain_state, state, PUBLISHED(state)) != state);
+}
+
+static void *RetainWriterProc(void *arg)
+{
+	pthread_mutex_lock(&retain_writer_mutex);
+	while (1) {
+		int index = TakePublishedSnapshot();
+
+		if (index < 0) {
+			struct timespec timeout;
+
+			/* Pending snapshots are written before quitting.  */
+			if (retain_writer_quit)
+				break;
+
+			/* PLC thread doesn't wait to signal, a wakeup may be
+			   missed, thus wait with timeout.  */
+			clock_gettime(CLOCK_REALTIME, &timeout);
+			timeout.tv_nsec += 100000000;
+			if (timeout.tv_nsec >= 1000000000) {
+				timeout.tv_sec++;
+				timeout.tv_nsec -= 1000000000;
+			}
+			pthread_cond_timedwait(&retain_writer_cond,
+				&retain_writer_mutex, &timeout);
+			continue;
+		}
+
+		pthread_mutex_unlock(&retain_writer_mutex);
+		{
+			struct timespec start;
+			long written;
+
+			clock_gettime(CLOCK_MONOTONIC, &start);
+			written = WriteRetainFile(retain_snapshots[index]);
+			if (written >= 0) {
+				retain_stats[RETAIN_STAT_WRITES]++;
+				retain_stats[RETAIN_STAT_BYTES_WRITTEN] += written;
+				retain_stats[RETAIN_STAT_LAST_BYTES_WRITTEN] = written;
+			} else {
+				retain_stats[RETAIN_STAT_WRITE_ERRORS]++;
+				fprintf(stderr, "Failed to write retain file : %s\n", rb_file);
+			}
+			RecordDuration(RETAIN_STAT_WRITE_LAST_NS, ElapsedNanoseconds(&start));
+		}
+		ReleaseWrittenSnapshot();
+		pthread_mutex_lock(&retain_writer_mutex);
+	}
+	pthread_mutex_unlock(&retain_writer_mutex);
+
+	return NULL;
 }
 
 void InitRetain(void)
 {
 	int i;
 
+	InitCRC32Slices();
+
 	/* Get retain size in bytes */
 	retain_info.retain_size = GetRetainSize();
 
@@ -151,57 +481,204 @@ void InitRetain(void)
 		sizeof(retain_info.hash_size) + \
 		retain_info.hash_size;
 
-	/*  Set header CRC initial state.  */
-	retain_info.header_crc = 0;
+	/* Build header as written in file.  */
+	retain_info.header = malloc(retain_info.header_offset);
+	memcpy(retain_info.header,
+		&retain_info.retain_size, sizeof(retain_info.retain_size));
+	memcpy(retain_info.header + sizeof(retain_info.retain_size),
+		&retain_info.hash_size, sizeof(retain_info.hash_size));
+	memcpy(retain_info.header + sizeof(retain_info.retain_size) +
+		sizeof(retain_info.hash_size),
+		retain_info.hash, retain_info.hash_size);
 
 	/* Calc crc for header.  */
 	retain_info.header_crc = GenerateCRC32Sum(
-		&retain_info.retain_size,
-		sizeof(retain_info.retain_size),
-		retain_info.header_crc);
+		retain_info.header, retain_info.header_offset, 0);
 
-	retain_info.header_crc = GenerateCRC32Sum(
-		&retain_info.hash_size,
-		sizeof(retain_info.hash_size),
-		retain_info.header_crc);
+	memset(retain_stats, 0, sizeof(retain_stats));
+	retain_filling = -1;
+	retain_state = 0;
+	retain_fd = -1;
+	retain_seq = 0;
 
-	retain_info.header_crc = GenerateCRC32Sum(
-		retain_info.hash,
-		retain_info.hash_size,
-		retain_info.header_crc);
+	if (!retain_info.retain_size)
+		return;
+
+	retain_slot_size = retain_info.header_offset + retain_info.retain_size +
+		2 * sizeof(uint32_t);
+	retain_page_count = (retain_info.retain_size + RETAIN_PAGE_SIZE - 1) /
+		RETAIN_PAGE_SIZE;
+
+	retain_snapshots[0] = calloc(retain_info.retain_size, 1);
+	retain_snapshots[1] = calloc(retain_info.retain_size, 1);
+	retain_persisted = calloc(retain_info.retain_size, 1);
+	retain_stale[0] = calloc(retain_page_count, 1);
+	retain_stale[1] = calloc(retain_page_count, 1);
+	if (!retain_snapshots[0] || !retain_snapshots[1] || !retain_persisted ||
+		!retain_stale[0] || !retain_stale[1]) {
+		fprintf(stderr, "Failed to allocate retain snapshots\n");
+		return;
+	}
+
+	retain_writer_quit = 0;
+	if (pthread_create(&retain_writer_thread, NULL, RetainWriterProc, NULL)) {
+		fprintf(stderr, "Failed to create retain writer thread\n");
+		return;
+	}
+	retain_writer_running = 1;
 }
 
 void CleanupRetain(void)
 {
+	if (retain_writer_running) {
+		/* Let writer thread write pending snapshot and quit.  */
+		pthread_mutex_lock(&retain_writer_mutex);
+		retain_writer_quit = 1;
+		pthread_cond_signal(&retain_writer_cond);
+		pthread_mutex_unlock(&retain_writer_mutex);
+		pthread_join(retain_writer_thread, NULL);
+		retain_writer_running = 0;
+	}
+
+	if (retain_fd >= 0) {
+		close(retain_fd);
+		retain_fd = -1;
+	}
+
+	free(retain_snapshots[0]);
+	free(retain_snapshots[1]);
+	free(retain_persisted);
+	free(retain_stale[0]);
+	free(retain_stale[1]);
+	retain_snapshots[0] = retain_snapshots[1] = retain_persisted = NULL;
+	retain_stale[0] = retain_stale[1] = NULL;
+
 	/* Free hash memory.  */
 	free(retain_info.hash);
+	free(retain_info.header);
+	retain_info.hash = retain_info.header = NULL;
+}
+
+/* Set the magic constant for one-pass CRC calc according to ZIP CRC32.  */
+static const uint32_t magic_number = 0x2144df1c;
+
+/* Check retain file slot, and get its sequence number.  */
+static int CheckRetainSlot(const char *slot, uint32_t *seq)
+{
+	if (GenerateCRC32Sum(slot, retain_slot_size, 0) != magic_number ||
+		memcmp(slot, retain_info.header, retain_info.header_offset))
+		return 0;
+
+	memcpy(seq, slot + retain_info.header_offset + retain_info.retain_size,
+		sizeof(*seq));
+	return 1;
+}
+
+/* Load retained data from latest valid slot of retain file.  */
+static int LoadRetainFile(void)
+{
+	unsigned int size = 2 * retain_slot_size;
+	int valid[2] = {0, 0};
+	uint32_t seq[2];
+	int slot, loaded = 0;
+	char *image;
+	FILE *file;
+
+	file = fopen(rb_file, "rb");
+	if (!file)
+		return 0;
+
+	image = malloc(size);
+	if (image &&
+		fread(image, size, 1, file) &&
+		fgetc(file) == EOF) {
+		for (slot = 0; slot < 2; slot++)
+			valid[slot] = CheckRetainSlot(image + slot * retain_slot_size, &seq[slot]);
+	}
+
+	if (valid[0] || valid[1]) {
+		unsigned int page;
+		const char *other;
+
+		/* Slot written last has greatest sequence number.  */
+		slot = (valid[0] && valid[1]) ? (int32_t)(seq[1] - seq[0]) > 0 : valid[1];
+		retain_last_slot = slot;
+		retain_seq = seq[slot];
+		memcpy(retain_persisted,
+			image + slot * retain_slot_size + retain_info.header_offset,
+			retain_info.retain_size);
+		memcpy(retain_snapshots[0], retain_persisted, retain_info.retain_size);
+
+		/* Oldest slot is updated in place by next save if valid,
+		   otherwise retain file is created again.  */
+		if (valid[1 - slot]) {
+			other = image + (1 - slot) * retain_slot_size + retain_info.header_offset;
+			for (page = 0; page < retain_page_count; page++) {
+				unsigned int start = page * RETAIN_PAGE_SIZE;
+				retain_stale[1 - slot][page] =
+					memcmp(other + start, retain_persisted + start, PageSize(page)) != 0;
+			}
+			memset(retain_stale[slot], 0, retain_page_count);
+			retain_fd = open(rb_file, O_RDWR);
+		}
+		loaded = 1;
+	}
+
+	free(image);
+	fclose(file);
+	return loaded;
 }
 
+/* Load retained data from former retain file into first snapshot
+   if file is valid.  */
 int CheckRetainFile(const char * file)
 {
+	unsigned int size = retain_info.header_offset + retain_info.retain_size +
+		sizeof(uint32_t);
+	int valid = 0;
+	char *image;
+	FILE *retain_buffer;
+
 	retain_buffer = fopen(file, "rb");
-	if (retain_buffer) {
+	if (!retain_buffer)
+		return 0;
+
+	image = malloc(size);
+	if (image &&
+		/* File must be exactly header, data and CRC.  */
+		fread(image, size, 1, retain_buffer) &&
+		fgetc(retain_buffer) == EOF &&
 		/* Check CRC32 and hash.  */
-		if (CheckFileCRC(retain_buffer))
-			if (CheckFilehash())
-				return 1;
-		fclose(retain_buffer);
-		retain_buffer = NULL;
+		GenerateCRC32Sum(image, size, 0) == magic_number &&
+		memcmp(image, retain_info.header, retain_info.header_offset) == 0) {
+
+		memcpy(retain_snapshots[0], image + retain_info.header_offset,
+			retain_info.retain_size);
+		valid = 1;
 	}
-	return 0;
+
+	free(image);
+	fclose(retain_buffer);
+	return valid;
 }
 
 int CheckRetainBuffer(void)
 {
-	retain_buffer = NULL;
 	if (!retain_info.retain_size)
 		return 1;
 
-	/* Check latest retain file.  */
+	if (!retain_writer_running)
+		return 0;
+
+	/* Check retain file.  */
+	if (LoadRetainFile())
+		return 1;
+
+	/* Check former retain file.  */
 	if (CheckRetainFile(rb_file))
 		return 1;
 
-	/* Check if we have backup.  */
+	/* Check if we have former backup.  */
 	if (CheckRetainFile(rb_file_bckp))
 		return 1;
 
@@ -240,7 +717,7 @@ int RetainSaveNeeded(void)
 	double diff_s;
 
 	/* no retain */
-	if (!retain_info.retain_size)
+	if (!retain_writer_running)
 		return 0;
 
 	/* periodic retain flush to avoid high I/O load */
@@ -255,71 +732,73 @@ int RetainSaveNeeded(void)
 	return ret;
 }
 
-void ValidateRetainBuffer(void)
+/* Called by PLC thread before Retain calls, choose snapshot to fill.  */
+void InValidateRetainBuffer(void)
 {
-	if (!retain_buffer)
-		return;
-
-	/* Add retain data CRC to the end of buffer file.  */
-	fseek(retain_buffer, 0, SEEK_END);
-	fwrite(&retain_crc, sizeof(uint32_t), 1, retain_buffer);
+	long state, next;
 
-	/* Sync file buffer and close file.  */
-#ifdef __WIN32
-	fflush(retain_buffer);
-#else
-	fsync(fileno(retain_buffer));
-#endif
+	if (!RetainSaveNeeded())
+		return;
 
-	fclose(retain_buffer);
-	retain_buffer = NULL;
+	clock_gettime(CLOCK_MONOTONIC, &retain_snapshot_start);
+
+	do {
+		state = retain_state;
+		if (PUBLISHED(state)) {
+			/* Writer thread didn't take published snapshot yet,
+			   take it back and replace it.  */
+			retain_filling = PUBLISHED(state) - 1;
+			next = state & ~3;
+		} else {
+			/* Fill the snapshot that isn't being written.  */
+			retain_filling = (WRITING(state) == 1) ? 1 : 0;
+			next = state;
+		}
+	} while (AtomicCompareExchange(&retain_state, state, next) != state);
+
+	if (PUBLISHED(state))
+		retain_stats[RETAIN_STAT_SUPERSEDED]++;
 }
 
-void InValidateRetainBuffer(void)
+/* Called by PLC thread after Retain calls, publish filled snapshot.  */
+void ValidateRetainBuffer(void)
 {
-	if (!RetainSaveNeeded())
-		return;
+	long state;
 
-	/* Rename old retain file into *.bak if it exists.  */
-	rename(rb_file, rb_file_bckp);
+	if (retain_filling < 0)
+		return;
 
-	/* Set file CRC initial value.  */
-	retain_crc = retain_info.header_crc;
+	do {
+		state = retain_state;
+	} while (AtomicCompareExchange(&retain_state, state,
+		state | (retain_filling + 1)) != state);
+	retain_filling = -1;
 
-	/* Create new retain file.  */
-	retain_buffer = fopen(rb_file, "wb+");
-	if (!retain_buffer) {
-		fprintf(stderr, "Failed to create retain file : %s\n", rb_file);
-		return;
+	/* Wake up writer thread, unless it is busy.  */
+	if (pthread_mutex_trylock(&retain_writer_mutex) == 0) {
+		pthread_cond_signal(&retain_writer_cond);
+		pthread_mutex_unlock(&retain_writer_mutex);
 	}
 
-	/* Write header to the new file.  */
-	fwrite(&retain_info.retain_size,
-		sizeof(retain_info.retain_size), 1, retain_buffer);
-	fwrite(&retain_info.hash_size,
-		sizeof(retain_info.hash_size),   1, retain_buffer);
-	fwrite(retain_info.hash ,
-		sizeof(char), retain_info.hash_size, retain_buffer);
+	retain_stats[RETAIN_STAT_SNAPSHOTS]++;
+	RecordDuration(RETAIN_STAT_SNAPSHOT_LAST_NS,
+		ElapsedNanoseconds(&retain_snapshot_start));
+	retain_stats[RETAIN_STAT_SNAPSHOT_TOTAL_NS] +=
+		retain_stats[RETAIN_STAT_SNAPSHOT_LAST_NS];
 }
 
 void Retain(unsigned int offset, unsigned int count, void *p)
 {
-	if (!retain_buffer)
+	if (retain_filling < 0)
 		return;
 
-	/* Generate CRC 32 for each data block.  */
-	retain_crc = GenerateCRC32Sum(p, count, retain_crc);
-
-	/* Save current var in file.  */
-	fseek(retain_buffer, retain_info.header_offset+offset, SEEK_SET);
-	fwrite(p, count, 1, retain_buffer);
+	/* Copy current var into snapshot.  */
+	memcpy(retain_snapshots[retain_filling] + offset, p, count);
 }
 
 void Remind(unsigned int offset, unsigned int count, void *p)
 {
-    int ret;
-	/* Remind variable from file.  */
-	fseek(retain_buffer, retain_info.header_offset+offset, SEEK_SET);
-	ret = fread((void *)p, count, 1, retain_buffer);
+	/* Remind variable from snapshot loaded from file.  */
+	memcpy(p, retain_snapshots[0] + offset, count);
 }
 #endif // !HAVE_RETAIN
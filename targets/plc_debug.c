@@ -1,12 +1,12 @@
 /*
  * DEBUGGER code
  * 
- * On "publish", when buffer is free, debugger stores arbitrary variables 
- * content into, and mark this buffer as filled
+ * On "publish", when a slot of the trace ring is free, debugger stores
+ * arbitrary variables content into, and mark this slot as filled.
+ * If ring is full, sample is dropped and counted.
  * 
- * 
- * Buffer content is read asynchronously, (from non real time part), 
- * and then buffer marked free again.
+ * Slots content is read asynchronously, (from non real time part), 
+ * oldest first, and then slots are marked free again.
  *  
  * 
  * */
@@ -26,38 +26,97 @@ void __publish_debug (void){}
 #include <stdio.h>
 
 typedef unsigned int dbgvardsc_index_t;
-typedef unsigned short trace_buf_offset_t;
-
-#define BUFFER_EMPTY 0
-#define BUFFER_FULL 1
 
 #ifndef TARGET_ONLINE_DEBUG_DISABLE
 
-#define TRACE_BUFFER_SIZE 4096
-#define TRACE_LIST_SIZE 1024
-
-/* Atomically accessed variable for buffer state */
-static long trace_buffer_state = BUFFER_EMPTY;
+/* Sizes are build parameters, see BeremizRoot.Debugger */
+#define TRACE_BUFFER_SIZE %(trace_buffer_size)d
+#define TRACE_LIST_SIZE %(trace_list_size)d
+#define TRACE_RING_SLOTS %(trace_ring_slots)d
+%(trace_paging)s
+%(trace_delta)s
 
 typedef struct trace_item_s {
     dbgvardsc_index_t dbgvardsc_index;
+#ifdef TRACE_DELTA
+    unsigned int shadow_offset;
+#endif
 } trace_item_t;
 
 trace_item_t trace_list[TRACE_LIST_SIZE];
-char trace_buffer[TRACE_BUFFER_SIZE];
+
+typedef struct trace_slot_s {
+    unsigned int tick;
+    unsigned int size;
+    char buffer[TRACE_BUFFER_SIZE];
+} trace_slot_t;
+
+/* Single producer (PLC thread), single consumer (debugger thread) ring */
+trace_slot_t trace_ring[TRACE_RING_SLOTS];
+/* Atomically accessed count of filled slots */
+static long trace_ring_count = 0;
+/* Next slot to fill, only accessed by PLC thread */
+static unsigned int trace_ring_head = 0;
+/* Oldest filled slot, only accessed by debugger thread */
+static unsigned int trace_ring_tail = 0;
+/* Atomically accessed, set when debugger thread waits for data */
+static long trace_ring_waiting = 0;
+/* Samples dropped because ring was full */
+static unsigned int trace_ring_dropped = 0;
 
 /* Trace's cursor*/
 static trace_item_t *trace_list_collect_cursor = trace_list;
 static trace_item_t *trace_list_addvar_cursor = trace_list;
 static const trace_item_t *trace_list_end = 
     &trace_list[TRACE_LIST_SIZE-1];
-static char *trace_buffer_cursor = trace_buffer;
-static const char *trace_buffer_end = trace_buffer + TRACE_BUFFER_SIZE;
+static char *trace_buffer_cursor = trace_ring[0].buffer;
+static const char *trace_buffer_end = trace_ring[0].buffer + TRACE_BUFFER_SIZE;
+
+#ifdef TRACE_PAGING
+/* In paging mode, trace list too large for buffer is splitted in pages
+ * sent on consecutive ticks. Each page starts with index of its
+ * first variable in trace list. */
+typedef unsigned int trace_page_start_t;
+static trace_item_t *trace_list_page_cursor = trace_list;
+#endif
+
+#ifdef TRACE_DELTA
+/* In delta mode, each sample starts with a sequence number, flags and a
+ * bitmap of variables present in sample. Only variables that changed
+ * since last sample are present, except for key frames that are sent
+ * periodically, and after a dropped sample or a trace list change.
+ * When changes don't fit in buffer, sample is marked partial and next
+ * sample, marked continued, starts from first variable left out. Key
+ * frames too large for buffer are spread over consecutive samples the
+ * same way. */
+#define TRACE_DELTA_KEYFRAME 1
+#define TRACE_DELTA_PARTIAL 2
+#define TRACE_DELTA_CONTINUED 4
+#define TRACE_DELTA_KEYFRAME_PERIOD 128
+#define TRACE_DELTA_HEADER_SIZE (4 + 1)
+#define TRACE_DELTA_BITMAP_SIZE ((TRACE_LIST_SIZE + 7) / 8)
+#if TRACE_DELTA_HEADER_SIZE + TRACE_DELTA_BITMAP_SIZE >= TRACE_BUFFER_SIZE
+#error "Trace buffer too small for trace list size in delta mode"
+#endif
+
+/* Last traced value of each variable */
+static char trace_shadow[TRACE_BUFFER_SIZE];
+static char *trace_shadow_cursor = trace_shadow;
+static const char *trace_shadow_end = trace_shadow + TRACE_BUFFER_SIZE;
+static unsigned int trace_delta_seq = 0;
+/* 0: no key frame, 1: key frame requested, 2: key frame being sent */
+#define TRACE_DELTA_KEYFRAME_REQUESTED 1
+#define TRACE_DELTA_KEYFRAME_ONGOING 2
+static int trace_delta_keyframe = TRACE_DELTA_KEYFRAME_REQUESTED;
+static unsigned int trace_delta_since_keyframe = 0;
+/* First variable to check in next sample, not 0 after a partial sample */
+static trace_item_t *trace_delta_start = trace_list;
+#endif
 
 
 
-#define FORCE_BUFFER_SIZE 1024
-#define FORCE_LIST_SIZE 256
+#define FORCE_BUFFER_SIZE %(force_buffer_size)d
+#define FORCE_LIST_SIZE %(force_list_size)d
 
 typedef struct force_item_s {
     dbgvardsc_index_t dbgvardsc_index;
@@ -127,10 +186,23 @@ void __init_debug(void)
 {
     /* init local static vars */
 #ifndef TARGET_ONLINE_DEBUG_DISABLE
-    trace_buffer_cursor = trace_buffer;
     trace_list_addvar_cursor = trace_list;
     trace_list_collect_cursor = trace_list;
-    trace_buffer_state = BUFFER_EMPTY;
+    trace_ring_count = 0;
+    trace_ring_head = 0;
+    trace_ring_tail = 0;
+    trace_ring_waiting = 0;
+    trace_ring_dropped = 0;
+#ifdef TRACE_PAGING
+    trace_list_page_cursor = trace_list;
+#endif
+#ifdef TRACE_DELTA
+    trace_shadow_cursor = trace_shadow;
+    trace_delta_seq = 0;
+    trace_delta_keyframe = TRACE_DELTA_KEYFRAME_REQUESTED;
+    trace_delta_since_keyframe = 0;
+    trace_delta_start = trace_list;
+#endif
 
     force_buffer_cursor = force_buffer;
     force_list_addvar_cursor = force_list;
@@ -175,7 +247,6 @@ extern unsigned int __tick;
 void __cleanup_debug(void)
 {
 #ifndef TARGET_ONLINE_DEBUG_DISABLE
-    trace_buffer_cursor = trace_buffer;
     InitiateDebugTransfer();
 #endif    
 
@@ -221,6 +292,15 @@ extern void LeaveDebugSection(void);
 extern void ValidateRetainBuffer(void);
 extern void InValidateRetainBuffer(void);
 
+static long AtomicAdd(long *atomicvar, long value)
+{
+    long previous;
+    do {
+        previous = *atomicvar;
+    } while(AtomicCompareExchange(atomicvar, previous, previous + value) != previous);
+    return previous;
+}
+
 #define __ReForceOutput_case_p(TYPENAME)                                                            \
         case TYPENAME##_P_ENUM :                                                                    \
         case TYPENAME##_O_ENUM :                                                                    \
@@ -246,37 +326,79 @@ void __publish_debug(void)
 #ifndef TARGET_ONLINE_DEBUG_DISABLE 
     /* Check there is no running debugger re-configuration */
     if(TryEnterDebugSection()){
-        /* Lock buffer */
-        long latest_state = AtomicCompareExchange(
-            &trace_buffer_state,
-            BUFFER_EMPTY,
-            BUFFER_FULL);
-            
-        /* If buffer was free */
-        if(latest_state == BUFFER_EMPTY)
-        {
-            int stop = 0;
-            /* Reset force list cursor */
-            force_list_apply_cursor = force_list;
+        int stop = 0;
+        /* Reset force list cursor */
+        force_list_apply_cursor = force_list;
+        force_buffer_cursor = force_buffer;
 
-            /* iterate over force list */
-            while(!stop && force_list_apply_cursor < force_list_addvar_cursor){
-                dbgvardsc_t *dsc = &dbgvardsc[
-                    force_list_apply_cursor->dbgvardsc_index];
-                void *varp = dsc->ptr;
-                __IEC_types_enum vartype = dsc->type;
-                switch(vartype){
-                    __ANY(__ReForceOutput_case_p)
-                default:
-                    break;
-                }
-                force_list_apply_cursor++;
+        /* iterate over force list */
+        while(!stop && force_list_apply_cursor < force_list_addvar_cursor){
+            dbgvardsc_t *dsc = &dbgvardsc[
+                force_list_apply_cursor->dbgvardsc_index];
+            void *varp = dsc->ptr;
+            __IEC_types_enum vartype = dsc->type;
+            switch(vartype){
+                __ANY(__ReForceOutput_case_p)
+            default:
+                break;
             }
+            force_list_apply_cursor++;
+        }
+
+        /* If a slot is free */
+        if(trace_ring_count < TRACE_RING_SLOTS)
+        {
+            trace_slot_t *slot = &trace_ring[trace_ring_head];
 
             /* Reset buffer cursor */
-            trace_buffer_cursor = trace_buffer;
+            trace_buffer_cursor = slot->buffer;
+            trace_buffer_end = slot->buffer + TRACE_BUFFER_SIZE;
+#ifdef TRACE_PAGING
+            /* Restart from page left by previous tick */
+            if(trace_list_page_cursor >= trace_list_addvar_cursor)
+                trace_list_page_cursor = trace_list;
+            trace_list_collect_cursor = trace_list_page_cursor;
+            {
+                trace_page_start_t page_start =
+                    trace_list_collect_cursor - trace_list;
+                memcpy(trace_buffer_cursor, &page_start, sizeof(page_start));
+                trace_buffer_cursor += sizeof(page_start);
+            }
+#else
             /* Reset trace list cursor */
             trace_list_collect_cursor = trace_list;
+#endif
+#ifdef TRACE_DELTA
+            unsigned char delta_flags = 0;
+            unsigned char *delta_flags_p;
+            unsigned int bitmap_size =
+                (trace_list_addvar_cursor - trace_list + 7) / 8;
+            unsigned char *bitmap;
+
+            if(!trace_delta_keyframe &&
+               trace_delta_since_keyframe >= TRACE_DELTA_KEYFRAME_PERIOD)
+                trace_delta_keyframe = TRACE_DELTA_KEYFRAME_REQUESTED;
+            if(trace_delta_keyframe == TRACE_DELTA_KEYFRAME_REQUESTED){
+                trace_delta_keyframe = TRACE_DELTA_KEYFRAME_ONGOING;
+                trace_delta_start = trace_list;
+            }
+            if(trace_delta_keyframe)
+                delta_flags |= TRACE_DELTA_KEYFRAME;
+            /* Continue from variables left out by previous sample */
+            if(trace_delta_start >= trace_list_addvar_cursor)
+                trace_delta_start = trace_list;
+            if(trace_delta_start != trace_list)
+                delta_flags |= TRACE_DELTA_CONTINUED;
+            trace_list_collect_cursor = trace_delta_start;
+
+            memcpy(trace_buffer_cursor, &trace_delta_seq, 4);
+            delta_flags_p = (unsigned char *)trace_buffer_cursor + 4;
+            trace_buffer_cursor += TRACE_DELTA_HEADER_SIZE;
+            trace_delta_seq++;
+            bitmap = (unsigned char *)trace_buffer_cursor;
+            memset(bitmap, 0, bitmap_size);
+            trace_buffer_cursor += bitmap_size;
+#endif
 
             /* iterate over trace list */
             while(trace_list_collect_cursor < trace_list_addvar_cursor){
@@ -296,6 +418,16 @@ void __publish_debug(void)
                     size = ((STRING*)value_p)->len + 1;
                 }
 
+#ifdef TRACE_DELTA
+                char *shadow = trace_shadow +
+                    trace_list_collect_cursor->shadow_offset;
+                /* skip unchanged variables */
+                if(!trace_delta_keyframe && memcmp(shadow, value_p, size) == 0){
+                    trace_list_collect_cursor++;
+                    continue;
+                }
+#endif
+
                 /* compute next cursor positon.*/
                 next_cursor = trace_buffer_cursor + size;
                 /* check for buffer overflow */
@@ -305,15 +437,60 @@ void __publish_debug(void)
                 else
                     /* stop looping in case of overflow */
                     break;
+#ifdef TRACE_DELTA
+                {
+                    unsigned int index =
+                        trace_list_collect_cursor - trace_list;
+                    memcpy(shadow, value_p, size);
+                    bitmap[index >> 3] |= 1 << (index & 7);
+                }
+#endif
                 /* increment cursor according size*/
                 trace_buffer_cursor = next_cursor;
                 trace_list_collect_cursor++;
             }
-            
-            /* Leave debug section,
-             * Trigger asynchronous transmission 
-             * (returns immediately) */
-            InitiateDebugTransfer(); /* size */
+#ifdef TRACE_DELTA
+            trace_delta_since_keyframe++;
+            if(trace_list_collect_cursor < trace_list_addvar_cursor){
+                /* values left out are sent by next sample. Registration
+                 * ensures that at least one variable fits in a sample */
+                delta_flags |= TRACE_DELTA_PARTIAL;
+                trace_delta_start = trace_list_collect_cursor;
+            }else{
+                trace_delta_start = trace_list;
+                /* key frame is done once whole list was sent */
+                if(trace_delta_keyframe){
+                    trace_delta_keyframe = 0;
+                    trace_delta_since_keyframe = 0;
+                }
+            }
+            *delta_flags_p = delta_flags;
+#endif
+#ifdef TRACE_PAGING
+            /* next page starts where this one stopped. A variable
+             * bigger than whole buffer is skipped to avoid stalling */
+            if(trace_list_collect_cursor == trace_list_page_cursor)
+                trace_list_collect_cursor++;
+            trace_list_page_cursor = trace_list_collect_cursor;
+#endif
+
+            slot->tick = __tick;
+            slot->size = trace_buffer_cursor - slot->buffer;
+            trace_ring_head = (trace_ring_head + 1) %% TRACE_RING_SLOTS;
+            AtomicAdd(&trace_ring_count, 1);
+
+            /* Trigger asynchronous transmission if debugger thread
+             * waits for data (returns immediately) */
+            if(AtomicCompareExchange(&trace_ring_waiting, 1, 0) == 1)
+                InitiateDebugTransfer();
+        }
+        else
+        {
+            trace_ring_dropped++;
+#ifdef TRACE_DELTA
+            /* debugger missed a change, send all again */
+            trace_delta_keyframe = TRACE_DELTA_KEYFRAME_REQUESTED;
+#endif
         }
         LeaveDebugSection();
     }
@@ -349,6 +526,7 @@ void __publish_debug(void)
 #define FORCE_LIST_OVERFLOW    2
 #define FORCE_BUFFER_OVERFLOW  3
 #define FORCE_INVALID  4
+#define TRACE_SHADOW_OVERFLOW  6
 
 #define __ForceVariable_checksize(TYPENAME)                                             \
     if(sizeof(TYPENAME) != force_size) {                                                \
@@ -404,6 +582,21 @@ int RegisterDebugVariable(dbgvardsc_index_t idx, void* force, size_t force_size)
     if(idx < sizeof(dbgvardsc)/sizeof(dbgvardsc_t)){
         /* add to trace_list, inc trace_list_addvar_cursor*/
         if(trace_list_addvar_cursor <= trace_list_end){
+#ifdef TRACE_DELTA
+            size_t size;
+            UnpackVar(&dbgvardsc[idx], NULL, NULL, &size);
+            /* all values must fit in shadow, and each value alone
+             * must fit in a sample, after header and bitmap */
+            if(trace_shadow_cursor + size > trace_shadow_end ||
+               TRACE_DELTA_HEADER_SIZE + TRACE_DELTA_BITMAP_SIZE + size >=
+               TRACE_BUFFER_SIZE){
+                error_code = TRACE_SHADOW_OVERFLOW;
+                goto error_cleanup;
+            }
+            trace_list_addvar_cursor->shadow_offset =
+                trace_shadow_cursor - trace_shadow;
+            trace_shadow_cursor += size;
+#endif
             trace_list_addvar_cursor->dbgvardsc_index = idx;
             trace_list_addvar_cursor++;
         } else {
@@ -434,7 +627,6 @@ int RegisterDebugVariable(dbgvardsc_index_t idx, void* force, size_t force_size)
 
 error_cleanup:
     ResetDebugVariables();
-    trace_buffer_state = BUFFER_EMPTY;
     return error_code;
     
 }
@@ -459,6 +651,21 @@ void ResetDebugVariables(void)
 {
     /* Reset trace list */
     trace_list_addvar_cursor = trace_list;
+    /* Drop samples of previous trace list. Debug is suspended,
+     * PLC thread doesn't publish meanwhile */
+    trace_ring_count = 0;
+    trace_ring_head = 0;
+    trace_ring_tail = 0;
+    trace_ring_dropped = 0;
+#ifdef TRACE_PAGING
+    trace_list_page_cursor = trace_list;
+#endif
+#ifdef TRACE_DELTA
+    trace_shadow_cursor = trace_shadow;
+    trace_delta_keyframe = TRACE_DELTA_KEYFRAME_REQUESTED;
+    trace_delta_since_keyframe = 0;
+    trace_delta_start = trace_list;
+#endif
 
     force_list_apply_cursor = force_list;
     /* Restore forced variables */
@@ -484,21 +691,47 @@ void ResetDebugVariables(void)
 
 void FreeDebugData(void)
 {
-    /* atomically mark buffer as free */
-    AtomicCompareExchange(
-        &trace_buffer_state,
-        BUFFER_FULL,
-        BUFFER_EMPTY);
+    if(trace_ring_count > 0){
+        trace_ring_tail = (trace_ring_tail + 1) %% TRACE_RING_SLOTS;
+        /* atomically mark slot as free */
+        AtomicAdd(&trace_ring_count, -1);
+    }
 }
+
+/* Return pointer to oldest debug data if any, without waiting */
+int TryGetDebugData(unsigned int *tick, unsigned int *size, void **buffer){
+    trace_slot_t *slot;
+    if(trace_ring_count == 0)
+        return -1;
+    slot = &trace_ring[trace_ring_tail];
+    *tick = slot->tick;
+    *size = slot->size;
+    *buffer = slot->buffer;
+    return 0;
+}
+
 int WaitDebugData(unsigned int *tick);
 /* Wait until debug data ready and return pointer to it */
 int GetDebugData(unsigned int *tick, unsigned int *size, void **buffer){
-    int wait_error = WaitDebugData(tick);
-    if(!wait_error){
-        *size = trace_buffer_cursor - trace_buffer;
-        *buffer = trace_buffer;
+    while(trace_ring_count == 0){
+        unsigned int wait_tick;
+        int wait_error;
+        AtomicCompareExchange(&trace_ring_waiting, 0, 1);
+        /* data may have been published before flag was set. If flag is
+         * already cleared, PLC thread did signal and wait must consume it */
+        if(trace_ring_count > 0 &&
+           AtomicCompareExchange(&trace_ring_waiting, 1, 0) == 1)
+            break;
+        wait_error = WaitDebugData(&wait_tick);
+        if(wait_error)
+            return wait_error;
     }
-    return wait_error;
+    return TryGetDebugData(tick, size, buffer);
+}
+
+/* Return count of samples dropped because trace ring was full */
+unsigned int GetDebugDroppedSamples(void){
+    return trace_ring_dropped;
 }
 #endif
 #endif
@@ -111,17 +111,20 @@ uint32_t GetLogMessage(uint8_t level, uint32_t msgidx, char* buf, uint32_t max_s
         uint32_t stailpos = (uint32_t)cursor; 
         uint32_t smsgidx;
         mTail tail;
+        uint32_t distance = 0;
         tail.msgidx = cursor >> 32;
         tail.msgsize = 0;
 
         /* Message search loop */
         do {
             smsgidx = tail.msgidx;
+            distance += sizeof(mTail) + tail.msgsize;
             stailpos = (stailpos - sizeof(mTail) - tail.msgsize ) & LOG_BUFFER_MASK;
             copy_from_log(level, stailpos, &tail, sizeof(mTail));
         }while((tail.msgidx == smsgidx - 1) && (tail.msgidx > msgidx));
 
-        if(tail.msgidx == msgidx){
+        /* body of oldest messages may have been overwritten */
+        if(tail.msgidx == msgidx && distance + tail.msgsize <= LOG_BUFFER_SIZE){
             uint32_t sbuffpos = (stailpos - tail.msgsize ) & LOG_BUFFER_MASK; 
             uint32_t totalsize = tail.msgsize;
             *tick = tail.tick; 
@@ -135,6 +138,70 @@ uint32_t GetLogMessage(uint8_t level, uint32_t msgidx, char* buf, uint32_t max_s
     return 0;
 }
 
+/* Log batch structure, messages from newest to oldest
+
+ |<-sizeof(mBatchHead)->|<-Head1.msgsize->|<-sizeof(mBatchHead)->|...
+ |        Head1         |  Message1 Body  |        Head2         |...
+
+*/
+typedef struct {
+    uint32_t msgsize;
+    uint32_t tick;
+    uint32_t tv_sec;
+    uint32_t tv_nsec;
+} mBatchHead;
+
+/* Pack up to max_count messages into buf, from message msgidx backward.
+   Stop at first message that doesn't fit or that isn't in buffer anymore.
+   First message is truncated if it doesn't fit alone.
+   Return packed size, 0 if message msgidx isn't available */
+uint32_t GetLogMessages(uint8_t level, uint32_t msgidx, uint32_t max_count, char* buf, uint32_t max_size){
+    uint64_t cursor = LogCursor[level];
+    uint32_t packedsize = 0;
+    if(cursor && max_count && max_size > sizeof(mBatchHead)){
+        /* search cursor */
+        uint32_t stailpos = (uint32_t)cursor;
+        uint32_t smsgidx;
+        mTail tail;
+        uint32_t distance = 0;
+        tail.msgidx = cursor >> 32;
+        tail.msgsize = 0;
+
+        /* Message search loop, same as GetLogMessage */
+        do {
+            smsgidx = tail.msgidx;
+            distance += sizeof(mTail) + tail.msgsize;
+            stailpos = (stailpos - sizeof(mTail) - tail.msgsize ) & LOG_BUFFER_MASK;
+            copy_from_log(level, stailpos, &tail, sizeof(mTail));
+        }while((tail.msgidx == smsgidx - 1) && (tail.msgidx > msgidx));
+
+        /* Packing loop, following tails backward */
+        while(tail.msgidx == msgidx && distance + tail.msgsize <= LOG_BUFFER_SIZE){
+            uint32_t sbuffpos = (stailpos - tail.msgsize ) & LOG_BUFFER_MASK;
+            uint32_t room = max_size - packedsize - sizeof(mBatchHead);
+            mBatchHead head;
+            if(tail.msgsize > room && packedsize) break;
+            head.msgsize = tail.msgsize > room ? room : tail.msgsize;
+            head.tick = tail.tick;
+            head.tv_sec = tail.time.tv_sec;
+            head.tv_nsec = tail.time.tv_nsec;
+            memcpy(buf + packedsize, &head, sizeof(mBatchHead));
+            packedsize += sizeof(mBatchHead);
+            copy_from_log(level, sbuffpos, buf + packedsize, head.msgsize);
+            packedsize += head.msgsize;
+
+            if(--max_count == 0 || msgidx == 0 ||
+               max_size - packedsize <= sizeof(mBatchHead)) break;
+
+            msgidx--;
+            distance += sizeof(mTail) + tail.msgsize;
+            stailpos = (sbuffpos - sizeof(mTail)) & LOG_BUFFER_MASK;
+            copy_from_log(level, stailpos, &tail, sizeof(mTail));
+        }
+    }
+    return packedsize;
+}
+
 #endif
 
 #ifndef TARGET_EXT_SYNC_DISABLE
@@ -27,16 +27,25 @@
 
 import os
 import re
+import json
+import time
+import shutil
+import tempfile
 import operator
 import hashlib
 import subprocess
 import shlex
+from collections import deque
 from functools import reduce
+from threading import Event
 from util.ProcessLogger import ProcessLogger
 
 
 includes_re = re.compile(r'\s*#include\s*["<]([^">]*)[">].*')
 
+# directory of compiler cache shared by builds, disabled if not set
+CompilerCacheDir = os.environ.get("BEREMIZ_CC_CACHE")
+
 
 def compute_file_md5(filetocheck):
     hasher = hashlib.md5()
@@ -50,6 +59,204 @@ def compute_file_md5(filetocheck):
     return hasher.hexdigest()
 
 
+class BufferedLogger(object):
+    """
+    Keep output of a compilation, so that outputs of compilations running
+    in parallel can be logged one after the other, in build order
+    """
+    def __init__(self):
+        self.messages = []
+
+    def _append(self, method, s):
+        # compilers output is often empty, don't keep nor cache it
+        if s:
+            self.messages.append((method, s))
+
+    def write(self, s):
+        self._append("write", s)
+
+    def write_warning(self, s):
+        self._append("write_warning", s)
+
+    def write_error(self, s):
+        self._append("write_error", s)
+
+    def progress(self, text):
+        pass
+
+    def flush(self, logger):
+        for method, s in self.messages:
+            getattr(logger, method)(s)
+        self.messages = []
+
+
+class CompilerCache(object):
+    """
+    Object files cache, shared by projects and build directories, and
+    addressed by digest of preprocessed source, compiler and flags
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def _entry(self, key, ext):
+        return os.path.join(self.path, key[:2], key + ext)
+
+    def fetch(self, key, objectfilename, logger):
+        """ Copy cached object file, return False if not in cache """
+        try:
+            with open(self._entry(key, ".json"), "r") as f:
+                messages = json.load(f)
+            _copy_replace(self._entry(key, ".o"), objectfilename)
+        except (OSError, ValueError):
+            return False
+        logger.messages.extend(tuple(message) for message in messages)
+        return True
+
+    def store(self, key, objectfilename, logger):
+        try:
+            os.makedirs(os.path.dirname(self._entry(key, "")), exist_ok=True)
+            _copy_replace(objectfilename, self._entry(key, ".o"))
+            # object is stored before messages, that mark entry as valid
+            _write_replace(self._entry(key, ".json"),
+                           json.dumps(logger.messages))
+        except OSError:
+            pass
+
+
+# umask can only be read by setting it, do it once before build threads
+_umask = os.umask(0)
+os.umask(_umask)
+
+
+def _copy_replace(src, dst):
+    """ Copy file atomically, other builds may read it concurrently """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dst))
+    os.close(fd)
+    try:
+        shutil.copyfile(src, tmp)
+        # mkstemp creates file readable by owner only
+        os.chmod(tmp, 0o666 & ~_umask)
+        os.replace(tmp, dst)
+    except OSError:
+        os.remove(tmp)
+        raise
+
+
+def _write_replace(dst, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dst))
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(data)
+        os.chmod(tmp, 0o666 & ~_umask)
+        os.replace(tmp, dst)
+    except OSError:
+        os.remove(tmp)
+        raise
+
+
+class CompilationJob(object):
+    """
+    Compilation of a C file into an object file, run in background.
+    With a compiler cache, source is first preprocessed to get cache key,
+    and object file is only compiled if not found in cache.
+    Line markers are kept in preprocessed source when object gets debug
+    information, that refers to source files paths and lines.
+    """
+    def __init__(self, bn, obn, command, cache=None, keyprefix=None,
+                 linemarkers=False):
+        self.bn = bn
+        self.obn = obn
+        self.command = command
+        self.cache = cache
+        self.keyprefix = keyprefix
+        self.linemarkers = linemarkers
+        self.key = None
+        self.cached = False
+        self.logger = BufferedLogger()
+        self.process = None
+        self.preprocessing = False
+        self.status = None
+        self.cancelled = False
+        self.starttime = None
+        self.duration = None
+        self.wakeup = None
+
+    def _objectfilename(self):
+        return self.command[self.command.index("-o") + 1]
+
+    def _preprocessedfilename(self):
+        return os.path.splitext(self._objectfilename())[0] + ".i"
+
+    def _run(self, logger, command):
+        self.process = ProcessLogger(
+            logger, command,
+            finish_callback=lambda *args: self.wakeup.set())
+
+    def start(self, wakeup):
+        self.wakeup = wakeup
+        self.starttime = time.time()
+        if self.cache is None:
+            self._run(self.logger, self.command)
+            return
+        # line markers are dropped, they contain build directory path,
+        # unless debug information depends on them
+        command = list(self.command)
+        command[command.index("-c")] = "-E"
+        command[command.index("-o") + 1] = self._preprocessedfilename()
+        self.preprocessing = True
+        self._run(BufferedLogger(), command if self.linemarkers else command + ["-P"])
+
+    def _preprocessed(self):
+        """ Get cache key from preprocessed source, then fetch or compile """
+        self.preprocessing = False
+        ifile = self._preprocessedfilename()
+        if self.process.exitcode == 0:
+            self.key = hashlib.md5(
+                self.keyprefix.encode() + compute_file_md5(ifile).encode()
+            ).hexdigest()
+        if os.path.exists(ifile):
+            os.remove(ifile)
+        if self.cancelled:
+            return 1
+        if self.key is not None and self.cache.fetch(
+                self.key, self._objectfilename(), self.logger):
+            self.cached = True
+            return 0
+        # preprocessing errors are reported by compilation
+        self._run(self.logger, self.command)
+        return None
+
+    def poll(self):
+        """ Return True once compilation is over """
+        if self.status is None and self.process is not None and \
+           self.process.finishsem.acquire(False):
+            if self.preprocessing:
+                self.status = self._preprocessed()
+            else:
+                self.status = self.process.exitcode
+                if self.status == 0 and self.key is not None:
+                    self.cache.store(
+                        self.key, self._objectfilename(), self.logger)
+            if self.status is not None:
+                self.duration = time.time() - self.starttime
+        return self.status is not None
+
+    def cancel(self):
+        self.cancelled = True
+        if self.process is not None and not self.poll():
+            self.process.kill()
+
+    def log(self, logger):
+        if self.cancelled and self.status != 0:
+            logger.write("   [CC]  %s -> %s  cancelled\n" % (self.bn, self.obn))
+        elif self.cached:
+            logger.write("   [cache]  %s -> %s\n" % (self.bn, self.obn))
+            self.logger.flush(logger)
+        else:
+            logger.write("   [CC]  %s -> %s  %.2fs\n" % (self.bn, self.obn, self.duration))
+            self.logger.flush(logger)
+
+
 class toolchain_gcc(object):
     """
     This abstract class contains GCC specific code.
@@ -90,6 +297,23 @@ class toolchain_gcc(object):
         """
         return self.CTRInstance.GetTarget().getcontent().getCompiler()
 
+    def getJobs(self):
+        """
+        Returns number of C files compiled in parallel
+        """
+        jobs = self.CTRInstance.GetTarget().getcontent().getJobs()
+        return jobs if jobs else (os.cpu_count() or 1)
+
+    def getCompilerIdentity(self):
+        """
+        Returns string identifying compiler executable, for compiler cache
+        """
+        path = shutil.which(self.compiler)
+        if path is None:
+            return self.compiler
+        st = os.stat(path)
+        return "%s:%d:%d" % (os.path.realpath(path), st.st_size, st.st_mtime_ns)
+
     def getLinker(self):
         """
         Returns linker
@@ -124,7 +348,48 @@ class toolchain_gcc(object):
             self.bin = self.CTRInstance.GetProjectName() + self.extension
             self.bin_path = os.path.join(self.buildpath, self.bin)
             self.md5key = None
+            self.srcmd5 = None
+            self.linkmd5 = None
+            self.srcdigests = {}
+            self.srcfiles = {}
+
+    def _GetBuildStateFileName(self):
+        return os.path.join(self.buildpath, "lastbuildCFiles.json")
+
+    def LoadBuildState(self):
+        """
+        Load digests of sources objects were built from, and includes of
+        sources, saved by previous build in this build directory
+        """
+        try:
+            with open(self._GetBuildStateFileName(), "r") as f:
+                state = json.load(f)
+            self.srcmd5 = state["sources"]
+            self.srcfiles = state["files"]
+            self.linkmd5 = state.get("link")
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
             self.srcmd5 = {}
+            self.srcfiles = {}
+            self.linkmd5 = None
+
+    def SaveBuildState(self):
+        try:
+            with open(self._GetBuildStateFileName(), "w") as f:
+                json.dump({"sources": self.srcmd5, "files": self.srcfiles,
+                           "link": self.linkmd5}, f)
+        except OSError:
+            pass
+
+    def get_link_digest(self, command, prebuilt):
+        """
+        Return digest of link command, and of content of object files not
+        built from sources, binary must be linked again if it changed
+        """
+        hasher = hashlib.md5("\0".join(command).encode())
+        for objectfilename in prebuilt:
+            if os.path.exists(objectfilename):
+                hasher.update(compute_file_md5(objectfilename).encode())
+        return hasher.hexdigest()
 
     def append_cfile_deps(self, src, deps):
         for l in src.splitlines():
@@ -144,27 +409,68 @@ class toolchain_gcc(object):
         # TODO detect cicular deps.
         return reduce(operator.concat, list(map(self.concat_deps, deps)), src)
 
-    def check_and_update_hash_and_deps(self, bn):
-        # Get latest computed hash and deps
-        oldhash, deps = self.srcmd5.get(bn, (None, []))
+    def get_file_infos(self, bn):
+        """
+        Return digest of file content and list of files it includes.
+        File is only read and scanned again if it was modified since it
+        was last scanned, files modified too recently to be told apart
+        from a later modification by their modification time are always
+        scanned.
+        """
+        path = os.path.join(self.buildpath, bn)
+        st = os.stat(path)
+        stamp = [st.st_mtime_ns, st.st_size]
+        infos = self.srcfiles.get(bn)
+        if infos is not None and infos[0] == stamp:
+            return infos[1], infos[2]
+        with open(path, "rb") as f:
+            src = f.read()
+        digest = hashlib.md5(src).hexdigest()
+        includes = []
+        for l in src.decode(errors="replace").splitlines():
+            res = includes_re.match(l)
+            if res is not None:
+                includes.append(res.groups()[0])
+        if time.time() - st.st_mtime > 2:
+            self.srcfiles[bn] = [stamp, digest, includes]
+        else:
+            self.srcfiles.pop(bn, None)
+        return digest, includes
+
+    def get_source_digest(self, bn):
+        """
+        Return digest of source file content, and of content of files it
+        includes from build directory, recursively.
+        Digests are computed once per build, since files included by many
+        sources, like POUS.h, must be seen as changed for all of them.
+        """
+        digest = self.srcdigests.get(bn)
+        if digest is None:
+            # include cycle
+            self.srcdigests[bn] = ""
+            filedigest, includes = self.get_file_infos(bn)
+            hasher = hashlib.md5(filedigest.encode())
+            for dep in includes:
+                if os.path.exists(os.path.join(self.buildpath, dep)):
+                    hasher.update(self.get_source_digest(dep).encode())
+            digest = hasher.hexdigest()
+            self.srcdigests[bn] = digest
+        return digest
+
+    def check_and_update_hash_and_deps(self, bn, command=None):
+        # Get digest of source and deps when object was last built
+        oldhash = self.srcmd5.get(bn)
         # read source
         src = os.path.join(self.buildpath, bn)
         if not os.path.exists(src):
             return False
-        # compute new hash
-        newhash = compute_file_md5(src)
-        # compare
-        match = (oldhash == newhash)
-        if not match:
-            # file have changed
-            # update direct dependencies
-            deps = []
-            self.append_cfile_deps(src, deps)
-            # store that hashand deps
-            self.srcmd5[bn] = (newhash, deps)
-        # recurse through deps
-        # TODO detect cicular deps.
-        return reduce(operator.and_, list(map(self.check_and_update_hash_and_deps, deps)), match)
+        # compute new digest, object must be built again if command changed
+        newhash = self.get_source_digest(bn)
+        if command is not None:
+            newhash = hashlib.md5(
+                (newhash + "\0".join(command)).encode()).hexdigest()
+        self.srcmd5[bn] = newhash
+        return oldhash == newhash
 
     def calc_source_md5(self):
         wholesrcdata = ""
@@ -175,6 +481,67 @@ class toolchain_gcc(object):
                 wholesrcdata += self.concat_deps(CFileName)
         return hashlib.md5(wholesrcdata).hexdigest()
 
+    def compile(self, buildlog):
+        """
+        Run compilation jobs of build log, in parallel, and log messages
+        and jobs outputs in build order. Remaining jobs are cancelled as
+        soon as one of them fails.
+        """
+        logger = self.CTRInstance.logger
+        jobs = [item for item in buildlog if isinstance(item, CompilationJob)]
+        maxjobs = self.getJobs()
+        pending = deque(jobs)
+        running = []
+        failed = None
+        wakeup = Event()
+        start = time.time()
+        buildlog = deque(buildlog)
+        while True:
+            while pending and failed is None and len(running) < maxjobs:
+                job = pending.popleft()
+                job.start(wakeup)
+                running.append(job)
+
+            for job in running[:]:
+                if job.poll():
+                    running.remove(job)
+                    if job.status and failed is None:
+                        failed = job
+                        for other in running + list(pending):
+                            other.cancel()
+
+            while buildlog:
+                item = buildlog[0]
+                if isinstance(item, CompilationJob):
+                    if not item.poll() and not (item.cancelled and item.process is None):
+                        break
+                    item.log(logger)
+                else:
+                    logger.write(item)
+                buildlog.popleft()
+
+            if not buildlog or (failed is not None and not running):
+                break
+            wakeup.wait(0.1)
+            wakeup.clear()
+            logger.progress("%.3fs" % (time.time() - start))
+
+        if failed is not None:
+            for job in jobs:
+                if job.status != 0:
+                    self.srcmd5.pop(job.bn, None)
+            logger.write_error(_("C compilation of %s failed.\n") % failed.bn)
+            return False
+
+        if jobs:
+            cached = len([job for job in jobs if job.cached])
+            logger.write(_("%d C files compiled in %.2fs, %d jobs\n") % (
+                len(jobs) - cached, time.time() - start,
+                min(maxjobs, len(jobs))))
+            if cached:
+                logger.write(_("%d object files taken from compiler cache\n") % cached)
+        return True
+
     def build(self):
         # Retrieve compiler and linker
         self.compiler = self.getCompiler()
@@ -204,15 +571,25 @@ class toolchain_gcc(object):
             Builder_LDFLAGS = replace_sysroot(Builder_LDFLAGS)
 
         # ----------------- GENERATE OBJECT FILES ------------------------
+        if self.srcmd5 is None:
+            self.LoadBuildState()
+        self.srcdigests = {}
+        cache = None
+        if CompilerCacheDir:
+            cache = CompilerCache(CompilerCacheDir)
+            compiler_identity = self.getCompilerIdentity()
         obns = []
         objs = []
+        prebuilt = []
+        # messages and compilation jobs, in build order
+        buildlog = []
         relink = not os.path.exists(self.bin_path)
         for Location, CFilesAndCFLAGS, _DoCalls in self.CTRInstance.LocationCFilesAndCFLAGS:
             if CFilesAndCFLAGS:
                 if Location:
-                    self.CTRInstance.logger.write(".".join(map(str, Location))+" :\n")
+                    buildlog.append(".".join(map(str, Location))+" :\n")
                 else:
-                    self.CTRInstance.logger.write(_("PLC :\n"))
+                    buildlog.append(_("PLC :\n"))
 
             for CFile, CFLAGS in CFilesAndCFLAGS:
                 if CFile.endswith(".c"):
@@ -220,34 +597,59 @@ class toolchain_gcc(object):
                     obn = os.path.splitext(bn)[0]+".o"
                     objectfilename = os.path.splitext(CFile)[0]+".o"
 
-                    match = self.check_and_update_hash_and_deps(bn)
+                    flags = ["-O2"] + Builder_CFLAGS + shlex.split(CFLAGS)
+
+                    match = self.check_and_update_hash_and_deps(
+                        bn, [self.compiler] + flags) and \
+                        os.path.exists(objectfilename)
 
                     if match:
-                        self.CTRInstance.logger.write("   [pass]  "+bn+" -> "+obn+"\n")
+                        buildlog.append("   [pass]  "+bn+" -> "+obn+"\n")
                     else:
                         relink = True
 
-                        self.CTRInstance.logger.write("   [CC]  "+bn+" -> "+obn+"\n")
-
-                        status, _result, _err_result = ProcessLogger(
-                            self.CTRInstance.logger,
+                        keyprefix = None
+                        # debug information refers to source paths and
+                        # lines, and to compiler working directory
+                        debug = [flag for flag in flags if flag.startswith("-g")]
+                        debug = bool(debug) and debug[-1] != "-g0"
+                        if cache is not None and debug:
+                            keyprefix = "\0".join(
+                                [compiler_identity, os.getcwd()] + flags) + "\0"
+                        elif cache is not None:
+                            # build directory path in flags would prevent
+                            # sharing objects with other build directories
+                            keyprefix = "\0".join(
+                                [compiler_identity] +
+                                [flag.replace(self.buildpath, "{BUILDPATH}")
+                                 for flag in flags]) + "\0"
+
+                        buildlog.append(CompilationJob(
+                            bn, obn,
                             [self.compiler,
                              "-c", CFile,
-                             "-o", objectfilename,
-                             "-O2"]
-                            + Builder_CFLAGS
-                            + shlex.split(CFLAGS)
-                        ).spin()
-
-                        if status:
-                            self.srcmd5.pop(bn)
-                            self.CTRInstance.logger.write_error(_("C compilation of %s failed.\n") % bn)
-                            return False
+                             "-o", objectfilename]
+                            + flags,
+                            cache, keyprefix, debug))
                     obns.append(obn)
                     objs.append(objectfilename)
                 elif CFile.endswith(".o"):
                     obns.append(os.path.basename(CFile))
                     objs.append(CFile)
+                    prebuilt.append(CFile)
+
+        # binary must also be linked again if objects list or flags changed
+        link_command = [self.linker] + objs + ["-o", self.bin_path] + Builder_LDFLAGS
+        linkmd5 = self.get_link_digest(link_command, prebuilt)
+        if linkmd5 != self.linkmd5:
+            relink = True
+        # forgotten until link succeeds
+        self.linkmd5 = None
+
+        compiled = self.compile(buildlog)
+        self.SaveBuildState()
+        if not compiled:
+            return False
 
         # ---------------- GENERATE OUTPUT FILE --------------------------
         # Link all the object files into one binary file
@@ -258,9 +660,7 @@ class toolchain_gcc(object):
 
             status, _result, _err_result = ProcessLogger(
                 self.CTRInstance.logger,
-                [self.linker] + objs
-                + ["-o", self.bin_path]
-                + Builder_LDFLAGS
+                link_command
             ).spin()
 
             if status:
@@ -269,6 +669,9 @@ class toolchain_gcc(object):
         else:
             self.CTRInstance.logger.write("   [pass]  " + ' '.join(obns)+" -> " + self.bin + "\n")
 
+        self.linkmd5 = linkmd5
+        self.SaveBuildState()
+
         # Calculate md5 key and get data for the new created PLC
         self.md5key = compute_file_md5(self.bin_path)
 
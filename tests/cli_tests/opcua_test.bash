@@ -1,7 +1,23 @@
 #!/bin/bash
 
+# OPC-UA client exchange mode element, i.e. PerVariable (default),
+# Batched or Subscription, see opcua_test_*.bash
+OPCUA_EXCHANGE_MODE=${OPCUA_EXCHANGE_MODE:-PerVariable}
+
 rm -f ./SRVOK ./PLCOK
 
+# Test project is a copy of opcua_client with given exchange mode
+PROJECT=$(mktemp -d)
+cp -r $BEREMIZPATH/tests/projects/opcua_client/. $PROJECT
+cat > "$PROJECT/opcua_0@opcua/confnode.xml" << EOF
+<?xml version='1.0' encoding='utf-8'?>
+<OPCUAClient xmlns:xsd="http://www.w3.org/2001/XMLSchema">
+  <ExchangeMode>
+    <$OPCUA_EXCHANGE_MODE/>
+  </ExchangeMode>
+</OPCUAClient>
+EOF
+
 # Run server
 $BEREMIZPYTHONPATH - > >(
     echo "Start SRV loop"
@@ -56,7 +72,7 @@ SERVER_PID=$!
 
 # Start PLC with opcua test
 setsid $BEREMIZPYTHONPATH $BEREMIZPATH/Beremiz_cli.py -k \
-     --project-home $BEREMIZPATH/tests/projects/opcua_client build transfer run > >(
+     --project-home $PROJECT build transfer run > >(
 echo "Start PLC loop"
 while read line; do 
     # Wait for PLC runtime to output expected value on stdout
@@ -88,5 +104,6 @@ done
 echo will kill PLC:$PLC_PID and SERVER:$SERVER_PID
 pkill -s $PLC_PID 
 kill $SERVER_PID
+rm -rf $PROJECT
 
 exit $res
@@ -0,0 +1,5 @@
+#!/bin/bash
+
+# opcua_test.bash, with all values exchanged in single requests
+export OPCUA_EXCHANGE_MODE=Batched
+source $(dirname ${BASH_SOURCE[0]})/opcua_test.bash
@@ -0,0 +1,5 @@
+#!/bin/bash
+
+# opcua_test.bash, with inputs received through a subscription
+export OPCUA_EXCHANGE_MODE=Subscription
+source $(dirname ${BASH_SOURCE[0]})/opcua_test.bash
@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of Beremiz.
+#
+# See COPYING file for copyrights details.
+
+"""
+Benchmark ST generation from a large FBD program.
+
+Generates a synthetic project with one FBD program made of chains of ADD
+blocks, and compares ST generation time of former implementation, where
+body instances were looked up with an XPath query and related connections
+with a linear search, with current indexed implementation.
+
+Usage: python tests/tools/bench_fbd_generation.py [blocks] [chain length]
+"""
+
+import os
+import sys
+import tempfile
+import timeit
+import builtins
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+builtins.__dict__.setdefault("_", lambda s: s)
+
+# as in IDE, controls must be imported before graphics, that PLCControler uses
+import controls  # noqa: E402, F401
+from plcopen import PLCOpenParser  # noqa: E402
+from plcopen.plcopen import PLCOpen_XPath  # noqa: E402
+from PLCControler import PLCControler  # noqa: E402
+from PLCGenerator import PouProgramGenerator  # noqa: E402
+
+PROJECT_TEMPLATE = """<?xml version='1.0' encoding='utf-8'?>
+<project xmlns="http://www.plcopen.org/xml/tc6_0201" \
+xmlns:xhtml="http://www.w3.org/1999/xhtml" \
+xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+  <fileHeader companyName="Beremiz" productName="Benchmark" \
+productVersion="1" creationDateTime="2024-01-01T00:00:00"/>
+  <contentHeader name="Benchmark" modificationDateTime="2024-01-01T00:00:00">
+    <coordinateInfo>
+      <fbd><scaling x="0" y="0"/></fbd>
+      <ld><scaling x="0" y="0"/></ld>
+      <sfc><scaling x="0" y="0"/></sfc>
+    </coordinateInfo>
+  </contentHeader>
+  <types>
+    <dataTypes/>
+    <pous>
+      <pou name="program0" pouType="program">
+        <interface>
+          <localVars>
+%(variables)s
+          </localVars>
+        </interface>
+        <body>
+          <FBD>
+%(instances)s
+          </FBD>
+        </body>
+      </pou>
+    </pous>
+  </types>
+  <instances>
+    <configurations/>
+  </instances>
+</project>
+"""
+
+VARIABLE_TEMPLATE = """\
+            <variable name="%s"><type><INT/></type></variable>"""
+
+IN_VARIABLE_TEMPLATE = """\
+            <inVariable localId="%(id)d" height="30" width="30">
+              <position x="0" y="0"/>
+              <connectionPointOut><relPosition x="30" y="15"/></connectionPointOut>
+              <expression>%(expression)s</expression>
+            </inVariable>"""
+
+CONNECTION_TEMPLATE = """\
+                  <connectionPointIn>
+                    <relPosition x="0" y="0"/>
+                    <connection refLocalId="%d"%s>
+                      <position x="0" y="0"/>
+                      <position x="0" y="0"/>
+                    </connection>
+                  </connectionPointIn>"""
+
+BLOCK_TEMPLATE = """\
+            <block localId="%(id)d" width="60" height="60" typeName="ADD">
+              <position x="0" y="0"/>
+              <inputVariables>
+                <variable formalParameter="IN1">
+%(in1)s
+                </variable>
+                <variable formalParameter="IN2">
+%(in2)s
+                </variable>
+              </inputVariables>
+              <inOutVariables/>
+              <outputVariables>
+                <variable formalParameter="OUT">
+                  <connectionPointOut><relPosition x="60" y="30"/></connectionPointOut>
+                </variable>
+              </outputVariables>
+            </block>"""
+
+OUT_VARIABLE_TEMPLATE = """\
+            <outVariable localId="%(id)d" height="30" width="30">
+              <position x="0" y="0"/>
+%(in)s
+              <expression>%(expression)s</expression>
+            </outVariable>"""
+
+
+def Connection(local_id, parameter=None):
+    return CONNECTION_TEMPLATE % (
+        local_id,
+        ' formalParameter="%s"' % parameter if parameter else "")
+
+
+def SyntheticProject(blocks, chain_length):
+    """
+    Chains of chain_length ADD blocks, each adding a constant to previous
+    block output, whose result is stored in a local variable.
+    Elements are stored in reverse order, so that lookups don't only hit
+    first elements of body.
+    """
+    variables = []
+    instances = []
+    local_id = 0
+    for chain in range(0, blocks, chain_length):
+        local_id += 1
+        instances.append(IN_VARIABLE_TEMPLATE % {
+            "id": local_id, "expression": "1"})
+        previous = Connection(local_id)
+        for _i in range(min(chain_length, blocks - chain)):
+            local_id += 1
+            instances.append(IN_VARIABLE_TEMPLATE % {
+                "id": local_id, "expression": "2"})
+            local_id += 1
+            instances.append(BLOCK_TEMPLATE % {
+                "id": local_id,
+                "in1": previous,
+                "in2": Connection(local_id - 1)})
+            previous = Connection(local_id, "OUT")
+        name = "result%d" % (chain // chain_length)
+        variables.append(VARIABLE_TEMPLATE % name)
+        local_id += 1
+        instances.append(OUT_VARIABLE_TEMPLATE % {
+            "id": local_id, "expression": name,
+            "in": previous})
+    instances.reverse()
+    return PROJECT_TEMPLATE % {
+        "variables": "\n".join(variables),
+        "instances": "\n".join(instances)}
+
+
+instance_by_id_xpath = PLCOpen_XPath("*[@localId=$localId]")
+
+
+def LegacyGetContentInstance(self, local_id):
+    """ Former implementation of body.getcontentInstance, for reference """
+    instance = instance_by_id_xpath(self.content, localId=local_id)
+    if len(instance) > 0:
+        return instance[0]
+    return None
+
+
+def LegacyAddRelatedConnections(self, related):
+    self.__dict__.setdefault("LegacyRelatedConnections", []).append(related)
+
+
+def LegacyExtractRelatedConnections(self, connection):
+    """ Former implementation, for reference """
+    groups = self.__dict__.setdefault("LegacyRelatedConnections", [])
+    for i, related in enumerate(groups):
+        if connection in related:
+            return groups.pop(i)
+    return [connection]
+
+
+def SetImplementation(legacy):
+    body_class = PLCOpenParser.GetElementClass("body")
+    for cls, name, legacy_method in [
+            (body_class, "getcontentInstance", LegacyGetContentInstance),
+            (PouProgramGenerator, "AddRelatedConnections",
+             LegacyAddRelatedConnections),
+            (PouProgramGenerator, "ExtractRelatedConnections",
+             LegacyExtractRelatedConnections)]:
+        current = cls.__dict__.get("_current_" + name, getattr(cls, name))
+        setattr(cls, "_current_" + name, current)
+        setattr(cls, name, legacy_method if legacy else current)
+
+
+def main():
+    blocks = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    chain_length = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    fd, project_path = tempfile.mkstemp(suffix=".xml")
+    with os.fdopen(fd, "w") as f:
+        f.write(SyntheticProject(blocks, chain_length))
+
+    controler = PLCControler()
+    error = controler.OpenXMLFile(project_path)
+    os.remove(project_path)
+    if error:
+        print(error)
+        return
+
+    def generate():
+        start = timeit.default_timer()
+        program, errors, _warnings = controler.GenerateProgram(noconfig=True)
+        assert not errors, errors
+        return program, timeit.default_timer() - start
+
+    print("%d ADD blocks in chains of %d" % (blocks, chain_length))
+
+    SetImplementation(legacy=True)
+    legacy_program, legacy = generate()
+
+    SetImplementation(legacy=False)
+    program, indexed = generate()
+
+    assert program == legacy_program
+    print("former  : %.2fs" % legacy)
+    print("indexed : %.2fs (x%.1f)" % (indexed, legacy / indexed))
+
+
+if __name__ == '__main__':
+    main()
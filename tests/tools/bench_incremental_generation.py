@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of Beremiz.
+#
+# See COPYING file for copyrights details.
+
+"""
+Benchmark incremental ST generation from a project with many POUs.
+
+Generates a synthetic project with chains of function blocks, each one
+calling previous one in its chain, and a program instantiating all of
+them. Then compares ST generation time without cache, with cache after
+no change, and with cache after one function block changed, checking that
+generated program is always identical to the one generated without cache.
+
+Usage: python tests/tools/bench_incremental_generation.py [POUs] [chain length]
+"""
+
+import os
+import sys
+import tempfile
+import timeit
+import builtins
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+builtins.__dict__.setdefault("_", lambda s: s)
+
+# as in IDE, controls must be imported before graphics, that PLCControler uses
+import controls  # noqa: E402, F401
+from PLCControler import PLCControler  # noqa: E402
+
+PROJECT_TEMPLATE = """<?xml version='1.0' encoding='utf-8'?>
+<project xmlns="http://www.plcopen.org/xml/tc6_0201" \
+xmlns:xhtml="http://www.w3.org/1999/xhtml" \
+xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+  <fileHeader companyName="Beremiz" productName="Benchmark" \
+productVersion="1" creationDateTime="2024-01-01T00:00:00"/>
+  <contentHeader name="Benchmark" modificationDateTime="2024-01-01T00:00:00">
+    <coordinateInfo>
+      <fbd><scaling x="0" y="0"/></fbd>
+      <ld><scaling x="0" y="0"/></ld>
+      <sfc><scaling x="0" y="0"/></sfc>
+    </coordinateInfo>
+  </contentHeader>
+  <types>
+    <dataTypes>
+      <dataType name="Counters">
+        <baseType>
+          <array>
+            <dimension lower="0" upper="9"/>
+            <baseType><INT/></baseType>
+          </array>
+        </baseType>
+      </dataType>
+    </dataTypes>
+    <pous>
+%(function_blocks)s
+      <pou name="program0" pouType="program">
+        <interface>
+          <localVars>
+%(instances)s
+          </localVars>
+        </interface>
+        <body>
+          <ST>
+            <xhtml:p><![CDATA[%(calls)s]]></xhtml:p>
+          </ST>
+        </body>
+      </pou>
+    </pous>
+  </types>
+  <instances>
+    <configurations/>
+  </instances>
+</project>
+"""
+
+FUNCTION_BLOCK_TEMPLATE = """\
+      <pou name="%(name)s" pouType="functionBlock">
+        <interface>
+          <inputVars>
+            <variable name="IN"><type><INT/></type></variable>
+          </inputVars>
+          <outputVars>
+            <variable name="OUT"><type><INT/></type></variable>
+          </outputVars>
+          <localVars>
+            <variable name="counters"><type><derived name="Counters"/></type></variable>
+%(previous_instance)s
+          </localVars>
+        </interface>
+        <body>
+          <ST>
+            <xhtml:p><![CDATA[%(body)s]]></xhtml:p>
+          </ST>
+        </body>
+      </pou>"""
+
+VARIABLE_TEMPLATE = """\
+            <variable name="%s"><type><derived name="%s"/></type></variable>"""
+
+
+def SyntheticProject(pous, chain_length):
+    function_blocks = []
+    instances = []
+    calls = []
+    for i in range(pous):
+        name = "FB%d" % i
+        if i % chain_length:
+            previous_instance = VARIABLE_TEMPLATE % ("previous", "FB%d" % (i - 1))
+            body = ("previous(IN := IN);\n"
+                    "counters[%d] := counters[%d] + 1;\n"
+                    "OUT := previous.OUT + %d;" % (i % 10, i % 10, i))
+        else:
+            previous_instance = ""
+            body = "OUT := IN + %d;" % i
+        function_blocks.append(FUNCTION_BLOCK_TEMPLATE % {
+            "name": name,
+            "previous_instance": previous_instance,
+            "body": body})
+        instances.append(VARIABLE_TEMPLATE % ("inst%d" % i, name))
+        calls.append("inst%d(IN := %d);" % (i, i))
+    return PROJECT_TEMPLATE % {
+        "function_blocks": "\n".join(function_blocks),
+        "instances": "\n".join(instances),
+        "calls": "\n".join(calls)}
+
+
+def main():
+    pous = int(sys.argv[1]) if len(sys.argv) > 1 else 800
+    chain_length = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    fd, project_path = tempfile.mkstemp(suffix=".xml")
+    with os.fdopen(fd, "w") as f:
+        f.write(SyntheticProject(pous, chain_length))
+
+    controler = PLCControler()
+    error = controler.OpenXMLFile(project_path)
+    os.remove(project_path)
+    if error:
+        print(error)
+        return
+
+    def generate(cache):
+        controler.ProgramChunksCache = cache
+        start = timeit.default_timer()
+        program, errors, _warnings = controler.GenerateProgram(noconfig=True)
+        assert not errors, errors
+        return program, timeit.default_timer() - start
+
+    print("%d function blocks in chains of %d" % (pous, chain_length))
+
+    reference, uncached = generate(None)
+    cache = {}
+    program, cold = generate(cache)
+    assert program == reference
+    program, unchanged = generate(cache)
+    assert program == reference
+
+    # change first function block of a chain, whole chain and program
+    # must be generated again
+    pou = controler.Project.getpou("FB%d" % (pous // 2 // chain_length * chain_length))
+    body = pou.getbody()[0]
+    body.settext(body.gettext().replace("OUT := IN +", "OUT := IN - "))
+    reference, _uncached = generate(None)
+    program, changed = generate(cache)
+    assert program == reference
+
+    print("without cache      : %.2fs" % uncached)
+    print("empty cache        : %.2fs" % cold)
+    print("no change          : %.2fs (x%.1f)" % (unchanged, uncached / unchanged))
+    print("one POU changed    : %.2fs (x%.1f)" % (changed, uncached / changed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of Beremiz.
+#
+# See COPYING file for copyrights details.
+
+"""
+Benchmark log messages retrieval by IDE over a simulated remote link.
+
+Builds with gcc a library with PLC logging code from plc_main_tail.c,
+fills log buffer with messages, and times how long IDE connector takes to
+fetch them all through runtime's PLCObject, with a given latency per call
+and a given link bandwidth. Messages are fetched in batches, and then one
+by one as with runtimes that don't know GetLogMessages. Both results are
+checked to be identical.
+
+Usage: python tests/tools/bench_log_retrieval.py [messages]
+                                  [latency ms] [bandwidth KB/s]
+"""
+
+import os
+import sys
+import ctypes
+import shutil
+import subprocess
+import tempfile
+from time import sleep, perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from runtime.PLCObject import PLCObject  # noqa: E402
+from connectors.ConnectorBase import ConnectorBase  # noqa: E402
+
+TAIL_C = os.path.join(os.path.dirname(__file__), "..", "..",
+                      "targets", "plc_main_tail.c")
+
+HARNESS_C = """\
+#include <stdint.h>
+#include <string.h>
+#include <time.h>
+
+#define LOG_LEVELS 4
+#define LOG_CRITICAL 0
+#define LOG_BUFFER_SIZE (1<<%(log_buffer_bits)d)
+#define TARGET_EXT_SYNC_DISABLE
+
+typedef struct {
+    long int tv_sec;
+    long int tv_nsec;
+} IEC_TIME;
+
+unsigned int __tick = 0;
+
+void PLC_GetTime(IEC_TIME *CURRENT_TIME)
+{
+    struct timespec tmp;
+    clock_gettime(CLOCK_REALTIME, &tmp);
+    CURRENT_TIME->tv_sec = tmp.tv_sec;
+    CURRENT_TIME->tv_nsec = tmp.tv_nsec;
+}
+
+long long AtomicCompareExchange64(long long* atomicvar, long long compared, long long exchange)
+{
+    return __sync_val_compare_and_swap(atomicvar, compared, exchange);
+}
+
+#include "plc_main_tail.c"
+"""
+
+
+def BuildLogLibrary(builddir, messages):
+    """ return loaded library, with log buffer big enough for messages """
+    log_buffer_bits = max(14, (messages * 128).bit_length())
+    with open(os.path.join(builddir, "harness.c"), "w") as f:
+        f.write(HARNESS_C % {"log_buffer_bits": log_buffer_bits})
+    shutil.copy(TAIL_C, os.path.join(builddir, "plc_main_tail.c"))
+    libpath = os.path.join(builddir, "liblog.so")
+    subprocess.check_call(
+        ["gcc", "-O2", "-w", "-shared", "-fPIC", "-o", libpath,
+         os.path.join(builddir, "harness.c")])
+    return ctypes.CDLL(libpath)
+
+
+def RuntimePLCObject(lib):
+    """ PLCObject with only logging functions of given library loaded """
+    plc = PLCObject.__new__(PLCObject)
+    plc._loading_error = None
+    plc._GetLogMessage = lib.GetLogMessage
+    plc._GetLogMessage.restype = ctypes.c_uint32
+    plc._GetLogMessage.argtypes = [ctypes.c_uint8, ctypes.c_uint32, ctypes.c_char_p, ctypes.c_uint32, ctypes.POINTER(ctypes.c_uint32), ctypes.POINTER(ctypes.c_uint32), ctypes.POINTER(ctypes.c_uint32)]
+    plc._GetLogMessages = lib.GetLogMessages
+    plc._GetLogMessages.restype = ctypes.c_uint32
+    plc._GetLogMessages.argtypes = [ctypes.c_uint8, ctypes.c_uint32, ctypes.c_uint32, ctypes.c_char_p, ctypes.c_uint32]
+    return plc
+
+
+class SimulatedLink(ConnectorBase):
+    """
+    Connector calling PLCObject directly, waiting for latency on each call
+    and for reply transfer at given bandwidth. Runtime calls are made
+    without main worker, there is no PLC being loaded concurrently.
+    """
+    def __init__(self, plc, latency, bandwidth, batched):
+        self.plc = plc
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.batched = batched
+        self.calls = 0
+
+    def _transfer(self, messages):
+        self.calls += 1
+        size = sum(16 + len(msg.encode()) for msg, *_ in messages)
+        sleep(self.latency + size / self.bandwidth)
+
+    def GetLogMessage(self, level, msgid):
+        message = PLCObject.GetLogMessage.__wrapped__(self.plc, level, msgid)
+        self._transfer([] if message is None else [message])
+        return message
+
+    def MatchMD5(self, MD5):
+        # runtimes without GetLogMessages don't match interface probe
+        self._transfer([])
+        return self.batched
+
+    def GetLogMessages(self, level, msgid, max_count, max_bytes):
+        messages = PLCObject.GetLogMessages.__wrapped__(
+            self.plc, level, msgid, max_count, max_bytes)
+        self._transfer(messages)
+        return messages
+
+
+def Fetch(plc, count, latency, bandwidth, batched):
+    """ return fetched messages, duration and number of calls """
+    link = SimulatedLink(plc, latency, bandwidth, batched)
+    start = perf_counter()
+    messages = link.FetchLogMessages(0, count - 1, count)
+    duration = perf_counter() - start
+    return messages, duration, link.calls
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.002
+    bandwidth = float(sys.argv[3]) * 1024 if len(sys.argv) > 3 else 1024 * 1024
+
+    builddir = tempfile.mkdtemp()
+    try:
+        lib = BuildLogLibrary(builddir, count)
+        for i in range(count):
+            msg = ("PLC message %d, with some text to make it realistic" % i).encode()
+            lib.LogMessage(0, msg, len(msg))
+        plc = RuntimePLCObject(lib)
+
+        print("%d messages, %.1f ms latency, %d KB/s" % (
+            count, latency * 1000, bandwidth / 1024))
+        batched, duration, calls = Fetch(plc, count, latency, bandwidth, True)
+        assert len(batched) == count
+        assert batched[0][0] == "PLC message %d, with some text to make it realistic" % (count - 1)
+        print("batched      : %7.3fs, %5d calls" % (duration, calls))
+        single, former, calls = Fetch(plc, count, latency, bandwidth, False)
+        assert single == batched
+        print("one by one   : %7.3fs, %5d calls (x%.1f)" % (
+            former, calls, former / duration))
+    finally:
+        shutil.rmtree(builddir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of Beremiz.
+#
+# See COPYING file for copyrights details.
+
+"""
+Benchmark PLC cycle time impact of Linux target retain persistence.
+
+Builds with gcc a program emulating PLC cycles of a PLC with given amount
+of retained bytes, calling retain functions the same way as plc_debug.c,
+and measures time spent in retain code by PLC thread. If a former
+implementation is given (i.e. extracted with git show), it is measured
+too. Retained data written by program is reloaded and checked. Mean
+bytes written per save is given for implementations providing retain
+statistics.
+
+Usage: python tests/tools/bench_retain.py [retained bytes]
+                                  [cycles] [former_retain.c]
+"""
+
+import os
+import sys
+import shutil
+import subprocess
+import tempfile
+
+RETAIN_C = os.path.join(os.path.dirname(__file__), "..", "..",
+                        "targets", "Linux", "plc_Linux_main_retain.c")
+
+IEC_TYPES_H = """\
+#ifndef IEC_TYPES_H
+#define IEC_TYPES_H
+#include <stdint.h>
+typedef struct {
+    long int tv_sec;
+    long int tv_nsec;
+} IEC_TIME;
+#endif
+"""
+
+HARNESS_C = """\
+#include <stdio.h>
+#include <stdint.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+#include "iec_types.h"
+
+#define RETAINED_BYTES %(retained_bytes)d
+#define VARIABLE_SIZE 8
+#define CYCLES %(cycles)d
+#define CYCLE_PERIOD_NS 1000000
+#define FILE_RETAIN_SAVE_PERIOD_S 0.05
+
+char *PLC_ID = "0123456789abcdef0123456789abcdef";
+static uint8_t variables[RETAINED_BYTES];
+static unsigned long long durations[CYCLES];
+
+int GetRetainSize(void) { return RETAINED_BYTES; }
+static int force_save = 0;
+int ForceSaveRetainReq(void) { return force_save; }
+long AtomicCompareExchange(long* atomicvar, long compared, long exchange)
+{
+    return __sync_val_compare_and_swap(atomicvar, compared, exchange);
+}
+void PLC_GetTime(IEC_TIME *CURRENT_TIME)
+{
+    struct timespec tmp;
+    clock_gettime(CLOCK_REALTIME, &tmp);
+    CURRENT_TIME->tv_sec = tmp.tv_sec;
+    CURRENT_TIME->tv_nsec = tmp.tv_nsec;
+}
+
+void InitRetain(void);
+void CleanupRetain(void);
+int CheckRetainBuffer(void);
+void InValidateRetainBuffer(void);
+void ValidateRetainBuffer(void);
+void Retain(unsigned int offset, unsigned int count, void *p);
+void Remind(unsigned int offset, unsigned int count, void *p);
+
+#include "retain.c"
+
+static unsigned long long now_ns(void)
+{
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return ts.tv_sec * 1000000000ULL + ts.tv_nsec;
+}
+
+static int compare(const void *a, const void *b)
+{
+    unsigned long long x = *(unsigned long long*)a, y = *(unsigned long long*)b;
+    return (x > y) - (x < y);
+}
+
+int main(void)
+{
+    unsigned int cycle, offset;
+    unsigned long long total = 0;
+    struct timespec period = {0, CYCLE_PERIOD_NS};
+
+    InitRetain();
+    CheckRetainBuffer();
+    for (cycle = 0; cycle < CYCLES; cycle++) {
+        unsigned long long start;
+        /* PLC program changes some variables */
+        variables[(cycle * 4099) %% RETAINED_BYTES] = cycle;
+        /* last cycle saves, as when PLC stops */
+        force_save = cycle == CYCLES - 1;
+        start = now_ns();
+        /* same as __publish_debug */
+        InValidateRetainBuffer();
+        for (offset = 0; offset < RETAINED_BYTES; offset += VARIABLE_SIZE)
+            Retain(offset, VARIABLE_SIZE, variables + offset);
+        ValidateRetainBuffer();
+        durations[cycle] = now_ns() - start;
+        total += durations[cycle];
+        nanosleep(&period, NULL);
+    }
+    CleanupRetain();
+
+    qsort(durations, CYCLES, sizeof(durations[0]), compare);
+    printf("%%.1f %%.1f %%.1f", total / 1000.0 / CYCLES,
+           durations[CYCLES * 99 / 100] / 1000.0, durations[CYCLES - 1] / 1000.0);
+#ifdef HAVE_RETAIN_STATISTICS
+    {
+        uint64_t stats[RETAIN_STAT_COUNT];
+        GetRetainStatistics(stats, RETAIN_STAT_COUNT);
+        printf(" %%.0f", (double)stats[RETAIN_STAT_BYTES_WRITTEN] /
+               stats[RETAIN_STAT_WRITES]);
+    }
+#endif
+    printf("\\n");
+
+    /* check last saved state is reminded */
+    InitRetain();
+    if (!CheckRetainBuffer()) {
+        printf("no valid retain file\\n");
+        return 1;
+    }
+    for (offset = 0; offset < RETAINED_BYTES; offset += VARIABLE_SIZE) {
+        uint8_t value[VARIABLE_SIZE];
+        Remind(offset, VARIABLE_SIZE, value);
+        if (memcmp(value, variables + offset, VARIABLE_SIZE)) {
+            printf("reminded value mismatch at offset %%u\\n", offset);
+            return 1;
+        }
+    }
+    return 0;
+}
+"""
+
+
+def Measure(retain_c, retained_bytes, cycles):
+    """
+    return mean, 99th percentile and max retain time per cycle in µs,
+    and mean bytes written per save if available
+    """
+    builddir = tempfile.mkdtemp()
+    try:
+        with open(os.path.join(builddir, "iec_types.h"), "w") as f:
+            f.write(IEC_TYPES_H)
+        with open(os.path.join(builddir, "harness.c"), "w") as f:
+            f.write(HARNESS_C % {"retained_bytes": retained_bytes,
+                                 "cycles": cycles})
+        shutil.copy(retain_c, os.path.join(builddir, "retain.c"))
+        with open(retain_c) as f:
+            defines = ["-DHAVE_RETAIN_STATISTICS"] \
+                if "GetRetainStatistics" in f.read() else []
+        subprocess.check_call(
+            ["gcc", "-O2", "-w", "-I", builddir] + defines + ["-o",
+             os.path.join(builddir, "harness"),
+             os.path.join(builddir, "harness.c"), "-lpthread"])
+        output = subprocess.check_output(
+            [os.path.join(builddir, "harness")], cwd=builddir).decode()
+        lines = output.splitlines()
+        if len(lines) != 1:
+            raise Exception("Retain check failed : " + output)
+        values = [float(v) for v in lines[0].split()]
+        return tuple(values + [None] * (4 - len(values)))
+    finally:
+        shutil.rmtree(builddir)
+
+
+def main():
+    retained_bytes = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    cycles = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    former_retain_c = sys.argv[3] if len(sys.argv) > 3 else None
+
+    print("%d retained bytes, %d cycles of 1ms, saved every 50ms" % (
+        retained_bytes, cycles))
+    print("retain time per cycle (µs) :    mean      p99      max  bytes/save")
+    implementations = [("current", RETAIN_C)]
+    if former_retain_c is not None:
+        implementations.append(("former", former_retain_c))
+    for name, retain_c in implementations:
+        mean, p99, maximum, bytes_per_save = Measure(
+            retain_c, retained_bytes, cycles)
+        print("%-26s : %8.1f %8.1f %8.1f  %10s" % (
+            name, mean, p99, maximum,
+            "-" if bytes_per_save is None else "%d" % bytes_per_save))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of Beremiz.
+#
+# See COPYING file for copyrights details.
+
+"""
+Benchmark SVGHMI XHTML generation from SVG with many pages.
+
+Generates synthetic SVGs with increasing number of pages, each page
+containing Display widgets, a Jump to next page and a clone of another
+page's element, and times gen_index_xhtml.xslt transform, with geometry
+computed by generator instead of Inkscape. If a former stylesheet is given
+(i.e. extracted with git show), it is timed too, and generated XHTML is
+checked to be identical.
+
+Usage: python tests/tools/bench_svghmi_generation.py [max pages]
+                                  [widgets per page] [former.xslt]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from lxml import etree  # noqa: E402
+
+from XSLTransform import XSLTransform  # noqa: E402
+from svghmi.svghmi import SVGHMI, ScriptDirectory  # noqa: E402
+from svghmi.hmi_tree import HMITreeNode  # noqa: E402
+
+SVG_TEMPLATE = """\
+<svg xmlns="http://www.w3.org/2000/svg" \
+xmlns:inkscape="http://www.inkscape.org/namespaces/inkscape" \
+xmlns:xlink="http://www.w3.org/1999/xlink" \
+id="svg" width="%(width)d" height="600">
+  <g id="layer1" inkscape:label="Layer 1">
+%(pages)s
+  </g>
+</svg>
+"""
+
+
+def SyntheticSVG(pages, widgets):
+    """ return SVG and its geometry as a list of (id, x, y, w, h) """
+    elements = []
+    geometry = [("svg", 0, 0, pages * 1000, 600),
+                ("layer1", 0, 0, pages * 1000, 600)]
+
+    def add(eid, x, y, w, h, elt):
+        elements.append("    " + elt)
+        geometry.append((eid, x, y, w, h))
+
+    for p in range(pages):
+        x0 = p * 1000
+        add("page%d" % p, x0, 0, 800, 600,
+            '<rect id="page%d" inkscape:label="HMI:Page:%s" '
+            'x="%d" y="0" width="800" height="600"/>' % (
+                p, "Home" if p == 0 else "Page%d" % p, x0))
+        for w in range(widgets):
+            x = x0 + 10 + (w % 10) * 70
+            y = 10 + (w // 10) * 40
+            add("display%d_%d" % (p, w), x, y, 60, 30,
+                '<text id="display%d_%d" inkscape:label="HMI:Display@/VAR%d" '
+                'x="%d" y="%d">0</text>' % (p, w, w, x, y))
+        target = (p + 1) % pages
+        add("jump%d" % p, x0 + 700, 550, 50, 30,
+            '<g id="jump%d" inkscape:label="HMI:Jump:%s">'
+            '<rect id="jumprect%d" x="%d" y="550" width="50" height="30"/>'
+            '</g>' % (p, "Home" if target == 0 else "Page%d" % target,
+                      p, x0 + 700))
+        geometry.append(("jumprect%d" % p, x0 + 700, 550, 50, 30))
+        add("clone%d" % p, x0 + 600, 500, 50, 30,
+            '<use id="clone%d" xlink:href="#jumprect%d" '
+            'transform="translate(%d,-50)"/>' % (
+                p, (p + 3) % pages, 1000 * (p - (p + 3) % pages) - 100))
+
+    svg = SVG_TEMPLATE % {
+        "width": pages * 1000,
+        "pages": "\n".join(elements)}
+    return svg, geometry
+
+
+def SyntheticHMITree(widgets):
+    root = HMITreeNode(["CONFIG", "RES", "INST", "ROOT"], "", "HMI_NODE")
+    for w in range(widgets):
+        root.place_node(HMITreeNode(
+            ["CONFIG", "RES", "INST", "VAR%d" % w], "VAR%d" % w,
+            "HMI_INT", "HMI_INT", "VAR", "CONFIG.RES.INST.VAR%d" % w))
+    return root
+
+
+class Progress(object):
+    def ProgressStart(self, k, m):
+        pass
+
+    def ProgressEnd(self, k):
+        pass
+
+
+def Generate(xsltpath, svg, geometry, hmitree):
+    progress = Progress()
+    transform = XSLTransform(xsltpath, [
+        ("GetSVGGeometry", lambda *_ignored: [
+            etree.Element("bbox", Id=eid, x=str(x), y=str(y), w=str(w), h=str(h))
+            for eid, x, y, w, h in geometry]),
+        ("GetHMITree", lambda *_ignored: [hmitree.etree(add_hash=True)]),
+        ("GetOverlappingGeometry",
+         lambda *args: SVGHMI.GetOverlappingGeometry(progress, *args)),
+        ("GetTranslations", lambda *_ignored: None),
+        ("GetFonts", lambda *_ignored: ""),
+        ("ProgressStart", lambda *_ignored: ""),
+        ("ProgressEnd", lambda *_ignored: "")])
+    svgdom = etree.ElementTree(etree.fromstring(svg.encode()))
+    start = timeit.default_timer()
+    result = transform.transform(svgdom, instance_name="0")
+    duration = timeit.default_timer() - start
+    for entry in transform.get_error_log():
+        print("SVGHMI: " + entry.message)
+    return etree.tostring(result), duration
+
+
+def main():
+    max_pages = int(sys.argv[1]) if len(sys.argv) > 1 else 80
+    widgets = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    former_xslt = sys.argv[3] if len(sys.argv) > 3 else None
+
+    xslt = os.path.join(ScriptDirectory, "gen_index_xhtml.xslt")
+    hmitree = SyntheticHMITree(widgets)
+
+    print("%d widgets per page" % widgets)
+    pages = 10
+    while pages <= max_pages:
+        svg, geometry = SyntheticSVG(pages, widgets)
+        xhtml, duration = Generate(xslt, svg, geometry, hmitree)
+        line = "%4d pages : %6.2fs (%.1f ms per page)" % (
+            pages, duration, duration * 1000 / pages)
+        if former_xslt is not None:
+            former_xhtml, former = Generate(former_xslt, svg, geometry, hmitree)
+            assert xhtml == former_xhtml
+            line += ", former : %6.2fs (x%.1f)" % (former, former / duration)
+        print(line)
+        pages *= 2
+
+
+if __name__ == '__main__':
+    main()
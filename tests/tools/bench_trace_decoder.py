@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of Beremiz.
+#
+# See COPYING file for copyrights details.
+
+"""
+Benchmark debug trace buffers decoding.
+
+Compares legacy per-sample ctypes based decoding with
+runtime.typemapping.DebugBufferDecoder batched decoding, and full
+samples with delta encoded samples (TRACE_DELTA) on a synthetic
+program with mostly static variables.
+
+Usage: python tests/tools/bench_trace_decoder.py [variables] [samples]
+"""
+
+import os
+import sys
+import random
+import struct
+import timeit
+from ctypes import cast, c_char_p, c_void_p, POINTER, sizeof
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from runtime.typemapping import \
+    TypeTranslator, DebugBufferDecoder, ValueToIECBytes  # noqa: E402
+
+
+def LegacyUnpackDebugBuffer(buff, indexes):
+    """ Former implementation of UnpackDebugBuffer, for reference """
+    res = []
+    buffoffset = 0
+    buffsize = len(buff)
+    buffptr = cast(cast(buff, c_char_p), c_void_p).value
+    for iectype in indexes:
+        c_type, unpack_func, _pack_func = TypeTranslator.get(iectype,
+                                                             (None, None, None))
+
+        cursor = c_void_p(buffptr + buffoffset)
+        if iectype == "STRING":
+            if (buffoffset + 1) <= buffsize:
+                size = 1 + cast(cursor, POINTER(c_type)).contents.len
+            else:
+                return None
+        else:
+            size = sizeof(c_type)
+
+        if c_type is not None and (buffoffset + size) <= buffsize:
+            ptr = cast(cursor, POINTER(c_type))
+            value = unpack_func(ptr.contents)
+            buffoffset += size
+            res.append(value)
+        else:
+            return None
+    if buffoffset and buffoffset == buffsize:
+        return res
+    return None
+
+
+SampleValues = {
+    "BOOL": lambda: random.random() > 0.5,
+    "INT": lambda: random.randint(-32768, 32767),
+    "DINT": lambda: random.randint(-2**31, 2**31 - 1),
+    "UDINT": lambda: random.randint(0, 2**32 - 1),
+    "LREAL": random.random,
+    "REAL": lambda: 0.5,
+}
+
+
+def StringSample(size=10):
+    return "".join(random.choice("abcdef") for _i in range(size))
+
+
+def EncodeValue(iectype, value):
+    if iectype == "STRING":
+        return bytes([len(value)]) + value.encode()
+    return ValueToIECBytes(iectype, value)
+
+
+def RandomValue(iectype):
+    if iectype == "STRING":
+        return StringSample()
+    return SampleValues[iectype]()
+
+
+def MakeSamples(iectypes, samples):
+    buffers = []
+    for _i in range(samples):
+        buffers.append(b"".join([
+            EncodeValue(iectype, RandomValue(iectype))
+            for iectype in iectypes]))
+    return buffers
+
+
+def MakeDeltaSamples(iectypes, samples, change_ratio, keyframe_period=128):
+    """
+    Emulate __publish_debug in full and in delta mode
+    on values where only change_ratio of variables change on each tick
+    """
+    values = [RandomValue(iectype) for iectype in iectypes]
+    full_buffers = []
+    delta_buffers = []
+    for sequence in range(samples):
+        changed = set(random.sample(range(len(iectypes)),
+                                    int(len(iectypes) * change_ratio)))
+        for index in changed:
+            values[index] = RandomValue(iectypes[index])
+        encoded = [EncodeValue(iectype, value)
+                   for iectype, value in zip(iectypes, values)]
+        full_buffers.append(b"".join(encoded))
+
+        keyframe = sequence % keyframe_period == 0
+        present = range(len(iectypes)) if keyframe else sorted(changed)
+        bitmap = 0
+        for index in present:
+            bitmap |= 1 << index
+        delta_buffers.append(
+            struct.pack("=IB", sequence, 1 if keyframe else 0) +
+            bitmap.to_bytes((len(iectypes) + 7) // 8, "little") +
+            b"".join([encoded[index] for index in present]))
+    return full_buffers, delta_buffers
+
+
+def Bench(label, iectypes, samples):
+    buffers = MakeSamples(iectypes, samples)
+
+    def legacy():
+        return [LegacyUnpackDebugBuffer(buff, iectypes) for buff in buffers]
+
+    decoder = DebugBufferDecoder(iectypes)
+
+    def batched():
+        return decoder.DecodeSamples(buffers)
+
+    # check both implementations agree
+    _valid, columns, _errors = batched()
+    assert [list(sample) for sample in zip(*columns)] == legacy()
+
+    for name, func in [("legacy", legacy), ("batched", batched)]:
+        duration = min(timeit.repeat(func, number=3, repeat=3)) / 3
+        print("%-24s %-8s %12.0f samples/s" % (label, name, samples / duration))
+
+
+def BenchDelta(variables, samples, change_ratio=0.01):
+    iectypes = [random.choice(list(SampleValues.keys())) for _i in range(variables)]
+    full_buffers, delta_buffers = MakeDeltaSamples(iectypes, samples, change_ratio)
+
+    full_decoder = DebugBufferDecoder(iectypes)
+    _valid, full_columns, _errors = full_decoder.DecodeSamples(full_buffers)
+    _valid, delta_columns, _errors = \
+        DebugBufferDecoder(iectypes, delta=True).DecodeSamples(delta_buffers)
+    assert full_columns == delta_columns
+
+    label = "%d vars, %g%% changes" % (variables, change_ratio * 100)
+    for name, buffers in [("full", full_buffers), ("delta", delta_buffers)]:
+        size = sum(map(len, buffers))
+        duration = min(timeit.repeat(
+            lambda: DebugBufferDecoder(iectypes, delta=(name == "delta")).DecodeSamples(buffers),
+            number=3, repeat=3)) / 3
+        print("%-24s %-8s %12.0f samples/s %10.0f bytes/sample" % (
+            label, name, samples / duration, size / samples))
+
+
+def main():
+    variables = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    samples = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    fixed_types = [random.choice(list(SampleValues.keys())) for _i in range(variables)]
+    Bench("%d vars" % variables, fixed_types, samples)
+    string_types = fixed_types[:]
+    for i in range(0, variables, 50):
+        string_types[i] = "STRING"
+    Bench("%d vars with STRINGs" % variables, string_types, samples)
+    BenchDelta(1000, samples)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of Beremiz.
+#
+# See COPYING file for copyrights details.
+
+"""
+Benchmark xmlclass generated accessors on a project load-and-generate cycle.
+
+Loads a real project with PLCControler, collects POU instances infos as
+graphical editors do, and generates ST program, several times. Then
+runs the cycle once more with accessors profiling enabled and shows the
+most called accessors.
+
+Usage: python tests/tools/bench_xmlclass_accessors.py [plc.xml] [cycles]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+# as in IDE, controls must be imported before graphics, that PLCControler uses
+import controls  # noqa: E402, F401
+from xmlclass import EnableAccessorsProfiling, GetAccessorsProfile  # noqa: E402
+from plcopen.types_enums import ComputePouName  # noqa: E402
+from PLCControler import PLCControler  # noqa: E402
+
+
+def LoadAndGenerate(project_path):
+    controler = PLCControler()
+    error = controler.OpenXMLFile(project_path)
+    if error:
+        raise Exception(error)
+    for pou in controler.Project.getpous():
+        tagname = ComputePouName(pou.getname())
+        controler.GetEditedElementInterfaceVars(tagname)
+        controler.GetEditedElementInstancesInfos(tagname)
+    # blocks from confnodes libraries are unknown here, so that errors
+    # are expected with some projects, generation is still done until then
+    controler.GenerateProgram()
+
+
+def main():
+    project_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        os.path.dirname(__file__), "..", "..", "exemples", "first_steps",
+        "plc.xml")
+    cycles = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    # first cycle also generates accessors, not timed
+    LoadAndGenerate(project_path)
+    duration = timeit.timeit(lambda: LoadAndGenerate(project_path),
+                             number=cycles)
+    print("%s : %.1f ms per load-and-generate cycle" % (
+        project_path, duration * 1000 / cycles))
+
+    EnableAccessorsProfiling()
+    LoadAndGenerate(project_path)
+    profile = GetAccessorsProfile()
+    EnableAccessorsProfiling(False)
+
+    print("%d accessor calls per cycle, most called :" % sum(profile.values()))
+    for (class_name, name), count in profile.most_common(20):
+        print("%8d %s.%s" % (count, class_name, name))
+
+
+if __name__ == '__main__':
+    main()
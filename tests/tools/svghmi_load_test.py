@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of Beremiz.
+#
+# See COPYING file for copyrights details.
+
+"""
+Load test for SVGHMI WebSocket server send pipeline.
+
+Runs svghmi/svghmi_server.py against a simulated PLC (small C library
+built with gcc, mimicking svghmi.c collect semantics) and connects many
+WebSocket clients. Some of the clients stop reading from their socket,
+to check that they don't slow down other clients nor make server
+buffer unbounded amount of data.
+
+For each class of clients, reports frames received per second and
+staleness of received values, in PLC ticks.
+
+Usage: python tests/tools/svghmi_load_test.py [clients] [slow clients]
+                                              [variables] [duration]
+"""
+
+import os
+import sys
+import ctypes
+import resource
+import socket
+import subprocess
+import tempfile
+from threading import Thread
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from twisted.internet import reactor  # noqa: E402
+from twisted.web.server import Site  # noqa: E402
+from twisted.web.resource import Resource  # noqa: E402
+from autobahn.twisted.resource import WebSocketResource  # noqa: E402
+from autobahn.twisted.websocket import \
+    WebSocketClientFactory, WebSocketClientProtocol  # noqa: E402
+
+SIMULATED_PLC = r"""
+#include <errno.h>
+#include <stdint.h>
+#include <string.h>
+#include <pthread.h>
+#include <unistd.h>
+
+#define MAX_SESSIONS 64
+
+static uint32_t values[VARS];
+static uint8_t dirty[MAX_SESSIONS][VARS];
+static uint8_t active[MAX_SESSIONS];
+static uint32_t sbuf[2 + 2 * VARS];
+static pthread_mutex_t lock = PTHREAD_MUTEX_INITIALIZER;
+static pthread_cond_t cond = PTHREAD_COND_INITIALIZER;
+static int wakeup;
+static pthread_t plc_thread;
+static unsigned int period_us, changes;
+
+int svghmi_continue_collect = 1;
+volatile uint32_t sim_tick;
+
+int svghmi_wait(void){
+    pthread_mutex_lock(&lock);
+    while(!wakeup && svghmi_continue_collect)
+        pthread_cond_wait(&cond, &lock);
+    wakeup = 0;
+    pthread_mutex_unlock(&lock);
+    return 0;
+}
+
+int svghmi_send_collect(uint32_t session_index, uint32_t *size, char **ptr){
+    uint32_t i, n = 2;
+    if(!svghmi_continue_collect) return EINTR;
+    pthread_mutex_lock(&lock);
+    for(i = 0; i < VARS; i++){
+        if(dirty[session_index][i]){
+            dirty[session_index][i] = 0;
+            sbuf[n++] = i;
+            sbuf[n++] = values[i];
+        }
+    }
+    pthread_mutex_unlock(&lock);
+    if(n == 2) return ENODATA;
+    *size = n * sizeof(uint32_t);
+    *ptr = (char*)sbuf;
+    return 0;
+}
+
+int svghmi_reset(uint32_t session_index){
+    pthread_mutex_lock(&lock);
+    active[session_index] = !active[session_index];
+    memset(dirty[session_index], 0, VARS);
+    pthread_mutex_unlock(&lock);
+    return 0;
+}
+
+int svghmi_recv_dispatch(uint32_t session_index, uint32_t size, const char *ptr){
+    return 0;
+}
+
+static void *plc_proc(void *arg){
+    uint32_t i, s, var;
+    while(svghmi_continue_collect){
+        usleep(period_us);
+        pthread_mutex_lock(&lock);
+        sim_tick++;
+        for(i = 0; i < changes; i++){
+            var = (sim_tick * 7919 + i * 104729) % VARS;
+            values[var] = sim_tick;
+            for(s = 0; s < MAX_SESSIONS; s++)
+                if(active[s]) dirty[s][var] = 1;
+        }
+        wakeup = 1;
+        pthread_cond_signal(&cond);
+        pthread_mutex_unlock(&lock);
+    }
+    return NULL;
+}
+
+void sim_start(unsigned int period, unsigned int nchanges){
+    period_us = period;
+    changes = nchanges;
+    pthread_create(&plc_thread, NULL, plc_proc, NULL);
+}
+
+void sim_stop(void){
+    pthread_mutex_lock(&lock);
+    svghmi_continue_collect = 0;
+    pthread_cond_broadcast(&cond);
+    pthread_mutex_unlock(&lock);
+    pthread_join(plc_thread, NULL);
+}
+"""
+
+
+# socket buffers at both ends of connections of clients that stop
+# reading, in bytes. Otherwise kernel autotuning lets megabytes go
+# before server transport gets congested
+SLOW_CLIENT_SOCKBUF = 4096
+
+
+def BuildSimulatedPLC(variables):
+    builddir = tempfile.mkdtemp()
+    src = os.path.join(builddir, "simplc.c")
+    lib = os.path.join(builddir, "simplc.so")
+    with open(src, "w") as f:
+        f.write("#define VARS %d\n" % variables)
+        f.write(SIMULATED_PLC)
+    subprocess.check_call(
+        ["gcc", "-O2", "-shared", "-fPIC", "-pthread", "-o", lib, src])
+    return ctypes.CDLL(lib)
+
+
+class Stats(object):
+    def __init__(self):
+        self.frames = 0
+        self.payload = 0
+        self.staleness = []
+
+
+class LoadClientProtocol(WebSocketClientProtocol):
+    def onConnect(self, response):
+        if self.factory.slow:
+            # small receive window, so that server's socket buffers
+            # fill up quickly once client stops reading
+            self.transport.getHandle().setsockopt(
+                socket.SOL_SOCKET, socket.SO_RCVBUF, SLOW_CLIENT_SOCKBUF)
+            self.factory.slow_ports.add(self.transport.getHost().port)
+
+    def onOpen(self):
+        if self.factory.slow:
+            # stop reading, socket buffers fill up and server must pause
+            self.transport.pauseProducing()
+
+    def onMessage(self, payload, isBinary):
+        stats = self.factory.stats
+        stats.frames += 1
+        stats.payload += len(payload)
+        tick = self.factory.plc.sim_tick
+        values = memoryview(payload)[8:].cast("I")
+        stats.staleness.append(tick - max(values[1::2]))
+
+
+def StartClient(port, plc, stats, slow, slow_ports):
+    factory = WebSocketClientFactory("ws://127.0.0.1:%d/ws" % port)
+    factory.protocol = LoadClientProtocol
+    factory.plc = plc
+    factory.stats = stats
+    factory.slow = slow
+    factory.slow_ports = slow_ports
+    reactor.connectTCP("127.0.0.1", port, factory)
+
+
+def Report(name, stats, clients, duration):
+    if not clients:
+        return
+    staleness = sorted(stats.staleness) or [0]
+    print("%-5s clients: %4d  frames/s per client: %8.1f  "
+          "KB/s per client: %8.1f  staleness (ticks) median: %d  max: %d" % (
+              name, clients,
+              stats.frames / duration / clients,
+              stats.payload / 1024. / duration / clients,
+              staleness[len(staleness) // 2], staleness[-1]))
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    slow_clients = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    variables = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+    duration = float(sys.argv[4]) if len(sys.argv) > 4 else 10.
+
+    plc = BuildSimulatedPLC(variables)
+    sim_tick = ctypes.c_uint32.in_dll(plc, "sim_tick")
+
+    class PLCView(object):
+        @property
+        def sim_tick(self):
+            return sim_tick.value
+
+    # svghmi_server.py is runtime code, executed in the context
+    # PLCObject gives to extensions python files
+    server_globals = {"PLCBinary": plc, "ctypes": ctypes, "Thread": Thread}
+    server_path = os.path.join(
+        os.path.dirname(__file__), "..", "..", "svghmi", "svghmi_server.py")
+    with open(server_path) as f:
+        exec(compile(f.read(), server_path, "exec"), server_globals)
+    server_globals["max_svghmi_sessions"] = 64
+
+    root = Resource()
+    wsfactory = server_globals["HMIWebSocketServerFactory"]()
+    root.putChild(b"ws", WebSocketResource(wsfactory))
+    port = reactor.listenTCP(0, Site(root), interface="127.0.0.1")
+    portnum = port.getHost().port
+
+    fast = Stats()
+    slow = Stats()
+    slow_ports = set()
+    for i in range(clients):
+        StartClient(portnum, PLCView(), slow if i < slow_clients else fast,
+                    i < slow_clients, slow_ports)
+
+    send_thread = Thread(target=server_globals["SendThreadProc"])
+    rss_start = []
+
+    def start():
+        for session in server_globals["svghmi_session_manager"].iter_sessions():
+            transport = session.protocol_instance.transport
+            if transport.getPeer().port in slow_ports:
+                transport.getHandle().setsockopt(
+                    socket.SOL_SOCKET, socket.SO_SNDBUF, SLOW_CLIENT_SOCKBUF)
+        rss_start.append(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+        fast.__init__()
+        slow.__init__()
+        plc.sim_start(10000, variables // 10)
+        send_thread.start()
+
+    paused = []
+
+    def stop():
+        paused.append(sum(
+            session.paused for session in
+            server_globals["svghmi_session_manager"].iter_sessions()))
+        plc.sim_stop()
+        send_thread.join()
+        reactor.stop()
+
+    # let clients connect before starting PLC
+    reactor.callLater(1, start)
+    reactor.callLater(1 + duration, stop)
+    reactor.run()
+
+    print("%d variables, %d changing every 10ms, %.1fs" % (
+        variables, variables // 10, duration))
+    Report("fast", fast, clients - slow_clients, duration)
+    Report("slow", slow, slow_clients, duration)
+    print("server sessions paused by backpressure: %d" % paused[0])
+    print("max RSS growth during run: %d KB" % (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_start[0]))
+
+
+if __name__ == '__main__':
+    main()
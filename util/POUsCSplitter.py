@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of Beremiz, a Integrated Development Environment for
+# programming IEC 61131-3 automates supporting plcopen standard and CanFestival.
+#
+# See COPYING file for copyrights details.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+Split POUS.c generated by matiec into one piece of code per POU, so that
+each POU can be compiled in its own translation unit, and only POUs whose
+code changed have to be compiled again.
+"""
+
+
+import re
+
+function_name_model = re.compile(r"(\w+)\s*$")
+
+# suffixes of functions generated for function blocks and programs
+POU_FUNCTION_SUFFIXES = ["_init__", "_body__"]
+
+
+def SplitTopLevelDefinitions(src):
+    """
+    Return list of (code, name, static) for each top level definition or
+    declaration of C source, code including comments and blank lines that
+    precede it. name is None if definition isn't a function.
+    Raise ValueError if source contains top level code that can't be moved
+    to another translation unit, like preprocessor directives.
+    """
+    definitions = []
+    start = 0
+    depth = 0
+    header = []
+    line_start = True
+    pos = 0
+    end = len(src)
+    while pos < end:
+        char = src[pos]
+        if char.isspace() or src.startswith("//", pos) or \
+           src.startswith("/*", pos):
+            if char == "\n":
+                line_start = True
+                pos += 1
+            elif char.isspace():
+                pos += 1
+            elif src[pos + 1] == "/":
+                pos = src.find("\n", pos)
+                pos = end if pos == -1 else pos
+            else:
+                pos = src.find("*/", pos + 2)
+                if pos == -1:
+                    raise ValueError("Unterminated comment")
+                pos += 2
+            # blanks and comments separate tokens
+            if depth == 0:
+                header.append(" ")
+            continue
+        if char == "#" and line_start and depth == 0:
+            raise ValueError("Top level preprocessor directive")
+        line_start = False
+        if char in "\"'":
+            # skip string or character literal
+            pos += 1
+            while pos < end and src[pos] != char:
+                pos += 2 if src[pos] == "\\" else 1
+            if pos >= end:
+                raise ValueError("Unterminated literal")
+            pos += 1
+            header.append(" ")
+            continue
+
+        if depth == 0:
+            header.append(char)
+        pos += 1
+        if char == "{":
+            depth += 1
+            continue
+        elif char == "}":
+            depth -= 1
+            if depth < 0:
+                raise ValueError("Unbalanced braces")
+            if depth > 0:
+                continue
+            # definition ends with line, unless followed by a declarator
+            eol = src.find("\n", pos)
+            eol = end if eol == -1 else eol
+            rest = src[pos:eol].strip()
+            if rest and not rest.startswith("//") and not rest.startswith("/*"):
+                continue
+        elif char == ";" and depth == 0:
+            eol = src.find("\n", pos)
+            eol = end if eol == -1 else eol
+        else:
+            continue
+
+        code = "".join(header)
+        name = None
+        static = False
+        declarator = code.split("{", 1)[0].split(";", 1)[0]
+        if "(" in declarator and "=" not in declarator.split("(", 1)[0]:
+            prefix = declarator.split("(", 1)[0]
+            match = function_name_model.search(prefix)
+            if match is not None:
+                name = match.group(1)
+                static = "static" in prefix.split()
+        pos = min(eol + 1, end)
+        definitions.append((src[start:pos], name, static))
+        start = pos
+        header = []
+        line_start = True
+
+    if depth != 0 or "".join(header).strip():
+        raise ValueError("Incomplete top level definition")
+    if definitions:
+        # trailing comments stay with last definition
+        code, name, static = definitions[-1]
+        definitions[-1] = (code + src[start:], name, static)
+    return definitions
+
+
+def GetPOUName(function_name):
+    for suffix in POU_FUNCTION_SUFFIXES:
+        if function_name.endswith(suffix):
+            return function_name[:-len(suffix)]
+    return function_name
+
+
+def SplitPOUsCode(src):
+    """
+    Return list of (POU name, code) for each POU defined in C source
+    generated by matiec, code including static functions generated for
+    POU, that precede it.
+    Raise ValueError if source can't be split safely.
+    """
+    pous = []
+    pending = []
+    for code, name, static in SplitTopLevelDefinitions(src):
+        # static functions and declarations are kept with following POU
+        if name is None or static:
+            pending.append(code)
+            continue
+        pou_name = GetPOUName(name)
+        if pous and pous[-1][0] == pou_name:
+            pous[-1][1].extend(pending)
+            pous[-1][1].append(code)
+        else:
+            pous.append((pou_name, pending + [code]))
+        pending = []
+    if not pous:
+        raise ValueError("No POU found")
+    pous[-1][1].extend(pending)
+
+    names = [pou_name for pou_name, _code in pous]
+    if len(set(names)) != len(names):
+        raise ValueError("POU code isn't contiguous")
+    return [(pou_name, "".join(code)) for pou_name, code in pous]
@@ -31,5 +31,7 @@ from .xmlclass import (ClassFactory,
                        time_model,
                        CreateNode,
                        NodeSetAttr,
-                       NodeRenameAttr)
+                       NodeRenameAttr,
+                       EnableAccessorsProfiling,
+                       GetAccessorsProfile)
 from .xsdschema import XSDClassFactory, GenerateParserFromXSD, GenerateParserFromXSDstring
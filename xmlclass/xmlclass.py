@@ -29,7 +29,7 @@ import datetime
 from functools import reduce
 from xml.dom import minidom
 from xml.sax.saxutils import unescape
-from collections import OrderedDict
+from collections import OrderedDict, Counter
 
 from lxml import etree
 
@@ -1280,49 +1280,121 @@ def generateClassCreateFunction(factory, class_definition):
     return classCreatefunction
 
 
+# Accessor calls count by (class name, attribute name), None when disabled
+AccessorsProfile = None
+
+
+def EnableAccessorsProfiling(enable=True):
+    """
+    Start counting calls to generated classes accessors, or stop it.
+    Counts are available from GetAccessorsProfile
+    """
+    global AccessorsProfile
+    AccessorsProfile = Counter() if enable else None
+
+
+def GetAccessorsProfile():
+    return AccessorsProfile
+
+
+# extracted values that can be shared by all elements
+IMMUTABLE_TYPES = (str, int, float, bool, datetime.date, datetime.time,
+                   datetime.datetime, datetime.timedelta)
+EXTRACTION_CACHE_SIZE = 4096
+
+
+def MemoizeExtraction(extract):
+    """
+    Wrap extract function so that immutable values extracted from a given
+    text are computed once. Since values are cached by text, cache doesn't
+    need to be invalidated when an element is modified.
+    """
+    cache = {}
+
+    def memoizedExtract(text):
+        value = cache.get(text)
+        if value is None:
+            value = extract(text, extract=False)
+            if isinstance(value, IMMUTABLE_TYPES):
+                if len(cache) >= EXTRACTION_CACHE_SIZE:
+                    cache.clear()
+                cache[text] = value
+        return value
+    return memoizedExtract
+
+
 def generateGetattrMethod(factory, class_definition, classinfos):
     attributes = dict([(attr["name"], attr) for attr in classinfos["attributes"] if attr["use"] != "prohibited"])
     elements = dict([(element["name"], element) for element in classinfos["elements"]])
+    class_name = class_definition.__name__
 
-    def getattrMethod(self, name):
-        if name in attributes:
-            attribute_infos = attributes[name]
-            attribute_infos["attr_type"] = FindTypeInfos(factory, attribute_infos["attr_type"])
+    # Accessor for each attribute or element name, generated on first
+    # access, when all types referred by class are known
+    accessors = {}
+
+    def generateAttributeAccessor(name):
+        attribute_infos = attributes[name]
+        attribute_infos["attr_type"] = FindTypeInfos(factory, attribute_infos["attr_type"])
+        extract = MemoizeExtraction(attribute_infos["attr_type"]["extract"])
+        default = attribute_infos.get("fixed", attribute_infos.get("default", None))
+
+        def getAttribute(self):
             value = self.get(name)
             if value is not None:
-                return attribute_infos["attr_type"]["extract"](value, extract=False)
-            elif "fixed" in attribute_infos:
-                return attribute_infos["attr_type"]["extract"](attribute_infos["fixed"], extract=False)
-            elif "default" in attribute_infos:
-                return attribute_infos["attr_type"]["extract"](attribute_infos["default"], extract=False)
+                return extract(value)
+            elif default is not None:
+                return extract(default)
             return None
-
-        elif name in elements:
-            element_infos = elements[name]
-            element_infos["elmt_type"] = FindTypeInfos(factory, element_infos["elmt_type"])
-            if element_infos["type"] == CHOICE:
-                content = element_infos["elmt_type"]["choices_xpath"](self)
-                if element_infos["maxOccurs"] == "unbounded" or element_infos["maxOccurs"] > 1:
-                    return content
-                elif len(content) > 0:
+        return getAttribute
+
+    def generateElementAccessor(name):
+        element_infos = elements[name]
+        element_infos["elmt_type"] = FindTypeInfos(factory, element_infos["elmt_type"])
+        elmt_type = element_infos["elmt_type"]
+        multiple = element_infos["maxOccurs"] == "unbounded" or element_infos["maxOccurs"] > 1
+        if element_infos["type"] == CHOICE:
+            choices_xpath = elmt_type["choices_xpath"]
+            if multiple:
+                return choices_xpath
+
+            def getChoice(self):
+                content = choices_xpath(self)
+                if len(content) > 0:
                     return content[0]
                 return None
-            elif element_infos["type"] == ANY:
-                return element_infos["elmt_type"]["extract"](self)
-            elif name == "content" and element_infos["elmt_type"]["type"] == SIMPLETYPE:
-                return element_infos["elmt_type"]["extract"](self.text, extract=False)
-            else:
-                element_name = factory.etreeNamespaceFormat % name
-                if element_infos["maxOccurs"] == "unbounded" or element_infos["maxOccurs"] > 1:
-                    values = self.findall(element_name)
-                    if element_infos["elmt_type"]["type"] == SIMPLETYPE:
-                        return [element_infos["elmt_type"]["extract"](value.text, extract=False) for value in values]
-                    return values
-                else:
-                    value = self.find(element_name)
-                    if element_infos["elmt_type"]["type"] == SIMPLETYPE:
-                        return element_infos["elmt_type"]["extract"](value.text, extract=False)
-                    return value
+            return getChoice
+        elif element_infos["type"] == ANY:
+            return elmt_type["extract"]
+
+        simple = elmt_type["type"] == SIMPLETYPE
+        extract = elmt_type["extract"] if simple else None
+        if name == "content" and simple:
+            return lambda self: extract(self.text, extract=False)
+
+        element_name = factory.etreeNamespaceFormat % name
+        if multiple:
+            if simple:
+                return lambda self: [extract(value.text, extract=False)
+                                     for value in self.findall(element_name)]
+            return lambda self: self.findall(element_name)
+        if simple:
+            return lambda self: extract(self.find(element_name).text, extract=False)
+        return lambda self: self.find(element_name)
+
+    def getattrMethod(self, name):
+        if AccessorsProfile is not None:
+            AccessorsProfile[(class_name, name)] += 1
+        accessor = accessors.get(name)
+        if accessor is not None:
+            return accessor(self)
+
+        if name in attributes:
+            accessor = accessors[name] = generateAttributeAccessor(name)
+            return accessor(self)
+
+        elif name in elements:
+            accessor = accessors[name] = generateElementAccessor(name)
+            return accessor(self)
 
         elif "base" in classinfos:
             return classinfos["base"].__getattr__(self, name)
@@ -1592,7 +1664,12 @@ def generateSetMethod(attr):
 
 def generateGetMethod(attr):
     def getMethod(self):
-        return getattr(self, attr, None)
+        # attr is never a real python attribute, calling __getattr__
+        # directly saves a failed attribute lookup
+        try:
+            return self.__getattr__(attr)
+        except AttributeError:
+            return None
     return getMethod
 
 
@@ -1828,7 +1905,7 @@ class XMLClassParser(etree.XMLParser):
     def __init__(self, *args, **kwargs):
         etree.XMLParser.__init__(self, *args, **kwargs)
 
-    def initMembers(self, namespaces, default_namespace_format, base_class, xsd_schema):
+    def initMembers(self, namespaces, default_namespace_format, base_class, xsdstring):
         self.DefaultNamespaceFormat = default_namespace_format
         self.NSMAP = namespaces
         targetNamespace = etree.QName(default_namespace_format % "d").namespace
@@ -1839,7 +1916,16 @@ class XMLClassParser(etree.XMLParser):
         else:
             self.RootNSMAP = namespaces
         self.BaseClass = base_class
-        self.XSDSchema = xsd_schema
+        self.XSDString = xsdstring
+        self._XSDSchema = None
+
+    @property
+    def XSDSchema(self):
+        # only compiled when first needed to validate a loaded file
+        if self._XSDSchema is None:
+            self._XSDSchema = etree.XMLSchema(
+                etree.fromstring(self.XSDString.encode()))
+        return self._XSDSchema
 
     def set_element_class_lookup(self, class_lookup):
         etree.XMLParser.set_element_class_lookup(self, class_lookup)
@@ -1944,7 +2030,7 @@ def GenerateParser(factory, xsdstring):
         factory.NSMAP,
         factory.etreeNamespaceFormat,
         BaseClass[0] if len(BaseClass) == 1 else None,
-        etree.XMLSchema(etree.fromstring(xsdstring.encode())))
+        xsdstring)
 
     class_lookup = XMLElementClassLookUp(factory.ComputedClassesLookUp)
     parser.set_element_class_lookup(class_lookup)
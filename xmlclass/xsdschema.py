@@ -25,7 +25,11 @@
 
 import os
 import re
+import sys
 import datetime
+import hashlib
+import marshal
+import tempfile
 from types import FunctionType
 from xml.dom import minidom
 
@@ -935,7 +939,7 @@ def ReduceInclude(factory, attributes, elements):
         if not os.path.exists(filepath):
             raise ValueError("No file '%s' found for include" % attributes["schemaLocation"])
     xsdfile = open(filepath, 'r')
-    include_factory = XSDClassFactory(minidom.parse(xsdfile), filepath)
+    include_factory = CreateXSDClassFactory(xsdfile.read(), filepath)
     xsdfile.close()
     include_factory.CreateClasses()
 
@@ -1016,6 +1020,10 @@ class XSDClassFactory(ClassFactory):
 
     def __init__(self, document, filepath=None, debug=False):
         ClassFactory.__init__(self, document, filepath, debug)
+        # schema syntax tree already extracted from document, and key to
+        # store it in parsed schema cache once extracted
+        self.ParsedSchema = None
+        self.ParsedSchemaKey = None
         self.Namespaces["xml"] = {
             "lang": {
                 "type": SYNTAXATTRIBUTE,
@@ -1052,6 +1060,15 @@ class XSDClassFactory(ClassFactory):
         }
 
     def ParseSchema(self):
+        if self.ParsedSchema is not None:
+            self.SchemaNamespace, self.NSMAP, self.DefinedNamespaces, \
+                self.Schema = self.ParsedSchema
+            self.Namespaces[self.SchemaNamespace] = XSD_NAMESPACE
+        else:
+            self.ExtractSchema()
+        ReduceSchema(self, self.Schema[1], self.Schema[2])
+
+    def ExtractSchema(self):
         for child in self.Document.childNodes:
             if child.nodeType == self.Document.ELEMENT_NODE:
                 schema = child
@@ -1066,7 +1083,10 @@ class XSDClassFactory(ClassFactory):
                     self.SchemaNamespace = name
                     self.Namespaces[self.SchemaNamespace] = XSD_NAMESPACE
         self.Schema = XSD_NAMESPACE["schema"]["extract"]["default"](self, schema)
-        ReduceSchema(self, self.Schema[1], self.Schema[2])
+        if self.ParsedSchemaKey is not None:
+            StoreParsedSchema(self.ParsedSchemaKey, (
+                self.SchemaNamespace, self.NSMAP, self.DefinedNamespaces,
+                self.Schema))
 
     def FindSchemaElement(self, element_name, element_type=None):
         namespace, name = DecomposeQualifiedName(element_name)
@@ -1110,6 +1130,94 @@ class XSDClassFactory(ClassFactory):
         return None
 
 
+# Directory of parsed schema cache, shared by processes. Syntax tree
+# extracted from XSD is stored there, so that XSD isn't parsed again by
+# next processes. Set BEREMIZ_XSD_CACHE to an empty string to disable.
+ParsedSchemaCacheDir = os.environ.get(
+    "BEREMIZ_XSD_CACHE",
+    os.path.join(os.environ.get("XDG_CACHE_HOME",
+                                os.path.join(os.path.expanduser("~"), ".cache")),
+                 "beremiz", "xsd"))
+
+# digest of modules defining syntax tree format, computed once
+_ParsedSchemaFormat = None
+
+
+def GetParsedSchemaKey(xsdstring):
+    """
+    Return key of syntax tree extracted from xsdstring in parsed schema cache.
+    Tree is stored with marshal, whose format depends on python version,
+    and its content depends on extraction functions defined here.
+    """
+    global _ParsedSchemaFormat
+    if _ParsedSchemaFormat is None:
+        digest = hashlib.md5(sys.version.encode())
+        for module in (sys.modules[ClassFactory.__module__], sys.modules[__name__]):
+            with open(module.__file__, 'rb') as f:
+                digest.update(f.read())
+        _ParsedSchemaFormat = digest.hexdigest()
+    return hashlib.md5(
+        (_ParsedSchemaFormat + xsdstring).encode()).hexdigest()
+
+
+def LoadParsedSchema(key):
+    """
+    Return syntax tree stored in parsed schema cache, None if not found
+    """
+    try:
+        with open(os.path.join(ParsedSchemaCacheDir, key), 'rb') as f:
+            return marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+
+def StoreParsedSchema(key, parsed):
+    """
+    Store syntax tree in parsed schema cache. Cache is only an optimization,
+    schema is just parsed again if it can't be stored.
+    """
+    try:
+        data = marshal.dumps(parsed)
+        os.makedirs(ParsedSchemaCacheDir, exist_ok=True)
+        # write to temporary file first, concurrent readers never see
+        # a partially written file
+        fd, tmppath = tempfile.mkstemp(dir=ParsedSchemaCacheDir)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmppath, os.path.join(ParsedSchemaCacheDir, key))
+    except (OSError, ValueError):
+        pass
+
+
+def CreateXSDClassFactory(xsdstring, filepath=None):
+    """
+    Create class factory for xsdstring, with syntax tree from parsed schema
+    cache if available. XSD is only parsed on cache miss.
+    """
+    if not ParsedSchemaCacheDir:
+        return XSDClassFactory(minidom.parseString(xsdstring), filepath)
+    key = GetParsedSchemaKey(xsdstring)
+    parsed = LoadParsedSchema(key)
+    if parsed is None:
+        factory = XSDClassFactory(minidom.parseString(xsdstring), filepath)
+        factory.ParsedSchemaKey = key
+    else:
+        factory = XSDClassFactory(None, filepath)
+        factory.ParsedSchema = parsed
+    return factory
+
+
+# Parsers already generated in this process, by XSD path and content hash.
+# Generated classes are made of closures and can't be stored on disk, but
+# they can be shared by all users of a schema, for example every instance
+# of a confnode type, instead of being generated again.
+GeneratedParsers = {}
+
+
+def GetParserKey(xsdstring, filepath=None):
+    return filepath, hashlib.md5(xsdstring.encode()).hexdigest()
+
+
 def GenerateParserFromXSD(filepath):
     """
     This function opens the xsd file and generate a xml parser with class lookup from
@@ -1118,10 +1226,14 @@ def GenerateParserFromXSD(filepath):
     xsdfile = open(filepath, 'r')
     xsdstring = xsdfile.read()
     xsdfile.close()
-    cwd = os.getcwd()
-    os.chdir(os.path.dirname(filepath))
-    parser = GenerateParser(XSDClassFactory(minidom.parseString(xsdstring), filepath), xsdstring)
-    os.chdir(cwd)
+    key = GetParserKey(xsdstring, os.path.abspath(filepath))
+    parser = GeneratedParsers.get(key)
+    if parser is None:
+        cwd = os.getcwd()
+        os.chdir(os.path.dirname(filepath))
+        parser = GenerateParser(CreateXSDClassFactory(xsdstring, filepath), xsdstring)
+        os.chdir(cwd)
+        GeneratedParsers[key] = parser
     return parser
 
 
@@ -1129,7 +1241,12 @@ def GenerateParserFromXSDstring(xsdstring):
     """
     This function generate a xml from the xsd given as a string
     """
-    return GenerateParser(XSDClassFactory(minidom.parseString(xsdstring)), xsdstring)
+    key = GetParserKey(xsdstring)
+    parser = GeneratedParsers.get(key)
+    if parser is None:
+        parser = GenerateParser(CreateXSDClassFactory(xsdstring), xsdstring)
+        GeneratedParsers[key] = parser
+    return parser
 
 
 # -------------------------------------------------------------------------------